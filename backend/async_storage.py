@@ -0,0 +1,188 @@
+"""Awaitable versions of the storage functions, run on a dedicated I/O thread pool."""
+
+import asyncio
+import functools
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Optional
+
+from . import storage
+from .config import STORAGE_IO_THREADS
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+# One lock per conversation, held while its writes are queued and running: writes
+# to a conversation land in the order they were awaited, different
+# conversations write in parallel
+_conversation_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+_counters: Dict[str, Any] = {
+    "calls":      0,
+    "in_flight":  0,
+    "errors":     0,
+    "busy_ms":    0.0,
+    "lock_waits": 0,
+}
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=STORAGE_IO_THREADS, thread_name_prefix="storage-io")
+    return _executor
+
+
+def _timed(fn: Callable, *args: Any, **kwargs: Any) -> Any:
+    started = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    except Exception:
+        _counters["errors"] += 1
+        raise
+    finally:
+        _counters["busy_ms"] += (time.perf_counter() - started) * 1000
+
+
+async def run(fn: Callable, *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking storage call on the I/O pool and await its result."""
+    _counters["calls"] += 1
+    _counters["in_flight"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            _pool(), functools.partial(_timed, fn, *args, **kwargs)
+        )
+    finally:
+        _counters["in_flight"] -= 1
+
+
+def submit(fn: Callable, *args: Any, **kwargs: Any) -> Future:
+    """Start a storage write on the I/O pool from synchronous code (e.g. a task callback) without waiting."""
+    _counters["calls"] += 1
+
+    def report(future: Future) -> None:
+        if future.exception() is not None:
+            print(f"Storage: background {fn.__name__} failed: {future.exception()}")
+
+    future = _pool().submit(_timed, fn, *args, **kwargs)
+    future.add_done_callback(report)
+    return future
+
+
+def conversation_lock(conversation_id: str) -> asyncio.Lock:
+    """The write lock of a conversation."""
+    lock = _conversation_locks.get(conversation_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        _conversation_locks[conversation_id] = lock
+    return lock
+
+
+async def _write(conversation_id: str, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+    lock = conversation_lock(conversation_id)
+    if lock.locked():
+        _counters["lock_waits"] += 1
+    async with lock:
+        return await run(fn, conversation_id, *args, **kwargs)
+
+
+def shutdown() -> None:
+    """Wait for queued writes and stop the pool."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def get_io_stats() -> Dict[str, Any]:
+    return {**_counters, "busy_ms": round(_counters["busy_ms"], 1), "threads": STORAGE_IO_THREADS}
+
+
+#  Conversations
+
+async def get_conversation(conversation_id: str) -> Optional[Dict[str, Any]]:
+    return await run(storage.get_conversation, conversation_id)
+
+
+async def create_conversation(conversation_id: str, system_prompt: str = "") -> Dict[str, Any]:
+    return await run(storage.create_conversation, conversation_id, system_prompt)
+
+
+async def list_conversations(limit: Optional[int] = None, before: Optional[str] = None) -> List[Dict[str, Any]]:
+    return await run(storage.list_conversations, limit, before)
+
+
+async def add_user_message(conversation_id: str, content: str):
+    await _write(conversation_id, storage.add_user_message, content)
+
+
+async def add_assistant_message(
+    conversation_id: str,
+    stage1: List[Dict[str, Any]],
+    stage2: List[Dict[str, Any]],
+    stage3: Optional[Dict[str, Any]],
+    metadata: Optional[Dict[str, Any]] = None,
+):
+    """The write runs on the pool; the turn listeners (in-memory indexes) run back on the event loop."""
+    turn = await _write(
+        conversation_id, storage.add_assistant_message, stage1, stage2, stage3, metadata, notify=False
+    )
+    if turn is not None:
+        storage.notify_turn(turn)
+
+
+async def commit_turn(
+    conversation_id: str,
+    content: str,
+    stage1: List[Dict[str, Any]],
+    stage2: List[Dict[str, Any]],
+    stage3: Optional[Dict[str, Any]],
+    metadata: Optional[Dict[str, Any]] = None,
+    title: Optional[str] = None,
+):
+    """See storage.commit_turn; listeners run on the event loop as for add_assistant_message."""
+    turn = await _write(
+        conversation_id, storage.commit_turn, content, stage1, stage2, stage3, metadata, title, notify=False
+    )
+    if turn is not None:
+        storage.notify_turn(turn)
+
+
+async def update_conversation_title(conversation_id: str, title: str):
+    await _write(conversation_id, storage.update_conversation_title, title)
+
+
+async def update_context_summary(conversation_id: str, summary: Dict[str, Any]):
+    await _write(conversation_id, storage.update_context_summary, summary)
+
+
+#  Batches and jobs
+
+async def create_batch(batch_id: str, items: List[Dict[str, str]], use_cache: bool = True) -> Dict[str, Any]:
+    return await run(storage.create_batch, batch_id, items, use_cache)
+
+
+async def get_batch(batch_id: str) -> Optional[Dict[str, Any]]:
+    return await run(storage.get_batch, batch_id)
+
+
+async def update_batch_item(
+    batch_id: str,
+    index: int,
+    status: str,
+    result: Optional[Dict[str, Any]] = None,
+    error: Optional[str] = None,
+):
+    await run(storage.update_batch_item, batch_id, index, status, result=result, error=error)
+
+
+async def get_job(conversation_id: str, job_id: str) -> Optional[Dict[str, Any]]:
+    return await run(storage.get_job, conversation_id, job_id)
+
+
+async def list_jobs(conversation_id: str) -> List[Dict[str, Any]]:
+    return await run(storage.list_jobs, conversation_id)
+
+
+async def read_job_events(conversation_id: str, job_id: str, after: int = 0) -> List[Dict[str, Any]]:
+    return await run(storage.read_job_events, conversation_id, job_id, after)
@@ -0,0 +1,109 @@
+"""Batch council runs: many (query, template) items under one global concurrency budget."""
+
+import asyncio
+from typing import Dict, Any, Optional, Tuple
+
+from . import async_storage
+from .config import BATCH_MAX_CONCURRENT_ITEMS
+from .council import join_council_run
+from .openrouter import traffic
+from .prompt_templates import get_template_prompt
+from .singleflight import Flight, EventCallback, join_flight
+
+# Shared by every batch, so concurrent batches split the budget instead of adding to it
+_item_slots: Optional[asyncio.Semaphore] = None
+
+_counters: Dict[str, int] = {
+    "items_running": 0,
+    "items_done":    0,
+    "items_failed":  0,
+}
+
+
+def _slots() -> asyncio.Semaphore:
+    global _item_slots
+    if _item_slots is None:
+        _item_slots = asyncio.Semaphore(BATCH_MAX_CONCURRENT_ITEMS)
+    return _item_slots
+
+
+def _item_event(index: int, item: Dict[str, Any], resumed: bool = False) -> Dict[str, Any]:
+    event = {
+        "type":        "item",
+        "index":       index,
+        "query":       item["query"],
+        "template_id": item["template_id"],
+        "status":      item["status"],
+    }
+    if item.get("result") is not None:
+        event["result"] = item["result"]
+    if item.get("error"):
+        event["error"] = item["error"]
+    if resumed:
+        event["resumed"] = True
+    return event
+
+
+async def _run_item(batch_id: str, index: int, item: Dict[str, Any], use_cache: bool, publish: EventCallback) -> None:
+    async with _slots():
+        _counters["items_running"] += 1
+        try:
+            flight, _ = join_council_run(
+                item["query"], system_prompt=get_template_prompt(item["template_id"]) or "", use_cache=use_cache
+            )
+            stage1, stage2, stage3, metadata = await flight.result()
+            item = {
+                **item,
+                "status": "done",
+                "result": {"stage1": stage1, "stage2": stage2, "stage3": stage3, "metadata": metadata},
+            }
+            await async_storage.update_batch_item(batch_id, index, "done", result=item["result"])
+            _counters["items_done"] += 1
+        except Exception as e:
+            item = {**item, "status": "error", "error": str(e)}
+            await async_storage.update_batch_item(batch_id, index, "error", error=str(e))
+            _counters["items_failed"] += 1
+        finally:
+            _counters["items_running"] -= 1
+    publish(_item_event(index, item))
+
+
+async def _run_batch(batch_id: str, publish: EventCallback) -> Dict[str, int]:
+    """Replay finished items, then run every pending or failed one."""
+    batch = await async_storage.get_batch(batch_id)
+    todo = [(index, item) for index, item in enumerate(batch["items"]) if item["status"] != "done"]
+    publish({"type": "batch", "batch_id": batch_id, "total": len(batch["items"]), "pending": len(todo)})
+
+    for index, item in enumerate(batch["items"]):
+        if item["status"] == "done":
+            publish(_item_event(index, item, resumed=True))
+
+    await asyncio.gather(*(
+        _run_item(batch_id, index, item, batch.get("use_cache", True), publish) for index, item in todo
+    ))
+
+    summary = batch_summary(await async_storage.get_batch(batch_id))
+    publish({"type": "batch_complete", **summary})
+    return summary
+
+
+def run_batch(batch_id: str) -> Tuple[Flight, bool]:
+    """
+    Attach to the batch's running execution, or (re)start it. Items are
+    persisted as they finish, so a restarted batch only runs what is left.
+    """
+    # Every item's model calls queue as one low-weight flow per batch
+    with traffic("batch", f"batch:{batch_id}"):
+        return join_flight(f"batch:{batch_id}", lambda publish: _run_batch(batch_id, publish))
+
+
+def batch_summary(batch: Dict[str, Any]) -> Dict[str, Any]:
+    """Counts of items per status."""
+    counts = {"pending": 0, "done": 0, "error": 0}
+    for item in batch["items"]:
+        counts[item["status"]] = counts.get(item["status"], 0) + 1
+    return {"batch_id": batch["id"], "total": len(batch["items"]), **counts}
+
+
+def get_batch_stats() -> Dict[str, Any]:
+    return {**_counters, "max_concurrent_items": BATCH_MAX_CONCURRENT_ITEMS}
@@ -0,0 +1,125 @@
+"""Event-loop stall benchmark: storage calls made inline vs. through async_storage.
+
+Usage: python -m backend.bench_storage [--streams N] [--turns N] [--rounds N]
+
+Builds throw-away conversations in a temporary DATA_DIR (the configured one
+is never touched), then runs N concurrent "streams", each repeatedly loading
+its conversation and appending a full council turn, while a probe coroutine
+that should wake every millisecond records how late it runs. Every stretch
+in which the loop could not run the probe is a stall that any other SSE
+stream on the worker would also have seen.
+"""
+
+import os
+import tempfile
+
+# Before the backend modules read DATA_DIR
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="council-bench-")
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import time  # noqa: E402
+from typing import List, Dict, Any  # noqa: E402
+
+from . import async_storage, storage  # noqa: E402
+from .config import DATA_DIR, STORAGE_BACKEND, STORAGE_IO_THREADS  # noqa: E402
+
+_PROBE_INTERVAL = 0.001
+
+
+def _turn(index: int, body_chars: int) -> Dict[str, Any]:
+    text = ("lorem ipsum dolor sit amet " * (body_chars // 27 + 1))[:body_chars]
+    return {
+        "stage1": [{"model": f"m{m}", "response": f"{index} {text}"} for m in range(5)],
+        "stage2": [{"model": f"m{m}", "ranking": text[:body_chars // 4]} for m in range(5)],
+        "stage3": {"model": "chairman", "response": text},
+        "metadata": {"bench": index},
+    }
+
+
+def _build(streams: int, turns: int, body_chars: int) -> List[str]:
+    ids = []
+    for stream in range(streams):
+        conversation_id = f"bench-{stream}"
+        storage.create_conversation(conversation_id)
+        for index in range(turns):
+            storage.add_user_message(conversation_id, f"question {index}")
+            turn = _turn(index, body_chars)
+            storage.add_assistant_message(
+                conversation_id, turn["stage1"], turn["stage2"], turn["stage3"], turn["metadata"]
+            )
+        ids.append(conversation_id)
+    return ids
+
+
+async def _stream(conversation_id: str, rounds: int, body_chars: int, use_async: bool) -> None:
+    """What one council job does to storage: read the conversation, commit the question and the verdict."""
+    for index in range(rounds):
+        turn = _turn(index, body_chars)
+        if use_async:
+            await async_storage.get_conversation(conversation_id)
+            await async_storage.commit_turn(
+                conversation_id, f"follow-up {index}", turn["stage1"], turn["stage2"], turn["stage3"], turn["metadata"]
+            )
+            await async_storage.list_conversations(limit=50)
+        else:
+            storage.get_conversation(conversation_id)
+            storage.commit_turn(
+                conversation_id, f"follow-up {index}", turn["stage1"], turn["stage2"], turn["stage3"], turn["metadata"]
+            )
+            storage.list_conversations(limit=50)
+        await asyncio.sleep(0)
+
+
+async def _probe(stalls: List[float], done: asyncio.Event) -> None:
+    """Sleep _PROBE_INTERVAL at a time and record how late each wake-up was."""
+    while not done.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(_PROBE_INTERVAL)
+        stalls.append(max(time.perf_counter() - started - _PROBE_INTERVAL, 0.0))
+
+
+async def _run(ids: List[str], rounds: int, body_chars: int, use_async: bool) -> Dict[str, float]:
+    stalls: List[float] = []
+    done = asyncio.Event()
+    probe = asyncio.create_task(_probe(stalls, done))
+    started = time.perf_counter()
+    await asyncio.gather(*(_stream(conversation_id, rounds, body_chars, use_async) for conversation_id in ids))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await probe
+
+    ordered = sorted(stalls) or [0.0]
+    return {
+        "wall_s":       elapsed,
+        "stalled_ms":   sum(s for s in stalls if s > 0.005) * 1000,
+        "p99_ms":       ordered[min(int(len(ordered) * 0.99), len(ordered) - 1)] * 1000,
+        "max_ms":       ordered[-1] * 1000,
+        "probe_wakeups": len(stalls),
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--streams", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=30, help="turns already in each conversation")
+    parser.add_argument("--rounds", type=int, default=10, help="turns each stream stores during the run")
+    parser.add_argument("--body-chars", type=int, default=4000, help="length of each stage body")
+    args = parser.parse_args(argv)
+
+    print(f"Storage backend {STORAGE_BACKEND}, {STORAGE_IO_THREADS} I/O threads, data in {DATA_DIR}")
+    ids = _build(args.streams, args.turns, args.body_chars)
+    print(f"{args.streams} streams x {args.rounds} turns over conversations of {args.turns} turns\n")
+    print(f"{'path':<8} {'wall s':>8} {'stalled ms':>11} {'p99 ms':>8} {'max ms':>8} {'wake-ups':>9}")
+    for label, use_async in (("inline", False), ("async", True)):
+        result = asyncio.run(_run(ids, args.rounds, args.body_chars, use_async))
+        print(
+            f"{label:<8} {result['wall_s']:>8.2f} {result['stalled_ms']:>11.0f} "
+            f"{result['p99_ms']:>8.1f} {result['max_ms']:>8.1f} {result['probe_wakeups']:>9}"
+        )
+    async_storage.shutdown()
+    print("\nstalled ms: total time the loop was more than 5 ms late; other streams froze for that long.")
+
+
+if __name__ == "__main__":
+    main()
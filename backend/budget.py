@@ -0,0 +1,119 @@
+"""Offline token estimation and prompt-body compaction for the TOKEN_CAPS input budgets."""
+
+import re
+from typing import List, Dict, Any, Tuple
+
+# One match ~ one BPE token: short letter runs, up to three digits, or a single
+# other character. Close to (and mostly above) real tokenizer counts for English.
+_TOKEN_RE = re.compile(r"[A-Za-z]{1,6}|\d{1,3}|[^\sA-Za-z\d]")
+
+# Chat-format framing charged per message, and once per request
+_MESSAGE_OVERHEAD = 4
+_REQUEST_OVERHEAD = 3
+
+# No body is cut below this, even when the fixed parts alone exceed the budget
+MIN_BODY_TOKENS = 40
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimated token count of a piece of text."""
+    return sum(1 for _ in _TOKEN_RE.finditer(text or ""))
+
+
+def estimate_messages(messages: List[Dict[str, Any]]) -> int:
+    """Estimated input tokens of a chat request (string or content-part messages)."""
+    total = _REQUEST_OVERHEAD
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, list):
+            content = "\n".join(part.get("text", "") for part in content)
+        total += _MESSAGE_OVERHEAD + estimate_tokens(content)
+    return total
+
+
+def compact(text: str) -> str:
+    """Lossless-enough whitespace compaction: trailing spaces and runs of blank lines."""
+    text = re.sub(r"[ \t]+\n", "\n", text)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def _cut_offset(text: str, tokens: int, from_end: bool = False) -> int:
+    """Character offset that keeps about `tokens` tokens from the start (or end), on a whitespace boundary."""
+    matches = list(_TOKEN_RE.finditer(text))
+    if tokens <= 0:
+        return len(text) if from_end else 0
+    if tokens >= len(matches):
+        return 0 if from_end else len(text)
+    if from_end:
+        offset = matches[-tokens].start()
+        if text[offset - 1].isspace():
+            return offset
+        space = text.find(" ", offset)
+        return space + 1 if space >= 0 else offset
+    offset = matches[tokens - 1].end()
+    newline = text.rfind("\n", 0, offset)
+    if newline > offset - 120 and newline > 0:
+        return newline
+    space = text.rfind(" ", 0, offset)
+    return space if space > 0 else offset
+
+
+def excerpt(text: str, max_tokens: int) -> str:
+    """
+    Shorten text to about max_tokens, keeping its opening two thirds and its
+    closing third around an omission marker.
+    """
+    total = estimate_tokens(text)
+    if total <= max_tokens:
+        return text
+    marker_tokens = estimate_tokens(f"[... ~{total} tokens omitted ...]")
+    keep = max(max_tokens - marker_tokens, 2)
+    head_end = _cut_offset(text, keep * 2 // 3)
+    tail_start = max(_cut_offset(text, keep - keep * 2 // 3, from_end=True), head_end)
+    head, tail = text[:head_end].rstrip(), text[tail_start:].lstrip()
+    omitted = total - estimate_tokens(head) - estimate_tokens(tail)
+    return f"{head}\n[... ~{omitted} tokens omitted ...]\n{tail}"
+
+
+def allocate(sizes: List[int], budget: int) -> List[int]:
+    """
+    Water-filling: bodies that fit under an equal share keep everything and
+    their unused share is split among the rest. Every allowance is at least
+    MIN_BODY_TOKENS (or the body's own size).
+    """
+    allowances = list(sizes)
+    if sum(sizes) <= budget:
+        return allowances
+    remaining, left = budget, len(sizes)
+    for index in sorted(range(len(sizes)), key=lambda i: sizes[i]):
+        share = max(remaining // left, MIN_BODY_TOKENS)
+        allowances[index] = min(sizes[index], share)
+        remaining -= allowances[index]
+        left -= 1
+    return allowances
+
+
+def fit_bodies(bodies: List[str], budget: int) -> Tuple[List[str], List[Dict[str, int]]]:
+    """
+    Compact and, where needed, excerpt bodies so together they fit in budget tokens.
+
+    Returns:
+        Tuple of (fitted bodies, one decision per body that was excerpted:
+        {'index', 'original_tokens', 'kept_tokens', 'action'})
+    """
+    compacted = [compact(body) for body in bodies]
+    sizes = [estimate_tokens(body) for body in compacted]
+    allowances = allocate(sizes, max(budget, 0))
+
+    fitted, decisions = [], []
+    for index, (body, size, allowance) in enumerate(zip(compacted, sizes, allowances)):
+        if size > allowance:
+            body = excerpt(body, allowance)
+            decisions.append({
+                "index":           index,
+                "original_tokens": size,
+                "kept_tokens":     estimate_tokens(body),
+                "action":          "excerpt",
+            })
+        fitted.append(body)
+    return fitted, decisions
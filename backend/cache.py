@@ -0,0 +1,206 @@
+"""Content-addressed cache for model responses (in-memory LRU + on-disk tier)."""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+from .config import (
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_TTL,
+    RESPONSE_CACHE_DIR,
+    RESPONSE_CACHE_DISK_MAX_BYTES,
+)
+from . import async_storage
+
+# Temp files older than this are leftovers of an interrupted write
+_STALE_TMP_SECONDS = 3600
+
+
+def cache_key(model: str, messages: List[Dict[str, Any]], max_tokens: Optional[int]) -> str:
+    """SHA-256 over the canonical JSON of everything that determines a response."""
+    canonical = json.dumps(
+        {"model": model, "messages": messages, "max_tokens": max_tokens},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier response cache keyed by cache_key().
+
+    The memory tier is an LRU bounded by entry count and total bytes; both
+    tiers expire entries after `ttl` seconds. Disk entries live in
+    `<directory>/<key[:2]>/<key>.json`, are read and written on the storage
+    I/O pool and promoted to memory on a hit. The disk tier is pruned of
+    expired entries, then the oldest ones, whenever it grows past
+    `max_disk_bytes`.
+    """
+
+    def __init__(self, directory: str, max_entries: int, max_bytes: int, ttl: float, max_disk_bytes: int):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        # key -> (expires_at, size_bytes, response)
+        self._memory: "OrderedDict[str, Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+        self._bytes = 0
+        # Size of the disk tier; unknown until the first prune scans it
+        self._disk_bytes: Optional[int] = None
+        self._disk_lock = threading.Lock()
+        self.counters: Dict[str, int] = {
+            "hits_memory":    0,
+            "hits_disk":      0,
+            "misses":         0,
+            "stores":         0,
+            "evictions_lru":  0,
+            "evictions_ttl":  0,
+            "evictions_disk": 0,
+        }
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _remember(self, key: str, expires_at: float, response: Dict[str, Any]) -> None:
+        size = len(json.dumps(response, ensure_ascii=False).encode("utf-8"))
+        if key in self._memory:
+            self._bytes -= self._memory.pop(key)[1]
+        self._memory[key] = (expires_at, size, response)
+        self._bytes += size
+        while self._memory and (len(self._memory) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, evicted_size, _) = self._memory.popitem(last=False)
+            self._bytes -= evicted_size
+            self.counters["evictions_lru"] += 1
+
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        """Read a disk entry (on the I/O pool); expired entries are removed."""
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if record.get("expires_at", 0) <= time.time():
+            self.counters["evictions_ttl"] += 1
+            self._remove(path)
+            return None
+        return record
+
+    def _write(self, key: str, record: Dict[str, Any]) -> None:
+        """Write a disk entry (on the I/O pool), pruning the tier if it is over its bound."""
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+            with open(tmp, "w") as f:
+                json.dump(record, f)
+            size = tmp.stat().st_size
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Response cache: could not write {path}: {e}")
+            return
+        with self._disk_lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += size
+            if self._disk_bytes is None or self._disk_bytes > self.max_disk_bytes:
+                self._prune()
+
+    def _remove(self, path: Path) -> int:
+        try:
+            size = path.stat().st_size
+            os.remove(path)
+            return size
+        except OSError:
+            return 0
+
+    def _prune(self) -> None:
+        """Drop expired entries, then the oldest, until the disk tier is within its bound."""
+        now = time.time()
+        entries = []
+        for path in self.directory.glob("*/*"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if path.suffix == ".tmp":
+                if now - stat.st_mtime > _STALE_TMP_SECONDS:
+                    self._remove(path)
+                continue
+            # Entries are written once with the configured ttl, so age stands in for expires_at
+            if now - stat.st_mtime > self.ttl:
+                self.counters["evictions_ttl"] += 1
+                self._remove(path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        # Prune to 90% so a full tier does not rescan on every store
+        target = self.max_disk_bytes * 0.9 if total > self.max_disk_bytes else total
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            total -= self._remove(path)
+            self.counters["evictions_disk"] += 1
+        self._disk_bytes = total
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached response for key, or None on a miss or expiry."""
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, size, response = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self.counters["hits_memory"] += 1
+                return response
+            del self._memory[key]
+            self._bytes -= size
+            self.counters["evictions_ttl"] += 1
+
+        record = await async_storage.run(self._read, key)
+        if record is None:
+            self.counters["misses"] += 1
+            return None
+
+        self._remember(key, record["expires_at"], record["response"])
+        self.counters["hits_disk"] += 1
+        return record["response"]
+
+    def put(self, key: str, response: Dict[str, Any]) -> None:
+        """Store a response in memory now and on disk in the background."""
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, response)
+        self.counters["stores"] += 1
+        async_storage.submit(self._write, key, {"expires_at": expires_at, "response": response})
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits_memory"] + self.counters["hits_disk"] + self.counters["misses"]
+        hits = self.counters["hits_memory"] + self.counters["hits_disk"]
+        return {
+            **self.counters,
+            "enabled":        RESPONSE_CACHE_ENABLED,
+            "hit_rate":       round(hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_bytes":   self._bytes,
+            "disk_bytes":     self._disk_bytes,
+        }
+
+
+response_cache = ResponseCache(
+    RESPONSE_CACHE_DIR,
+    max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=RESPONSE_CACHE_MAX_BYTES,
+    ttl=RESPONSE_CACHE_TTL,
+    max_disk_bytes=RESPONSE_CACHE_DISK_MAX_BYTES,
+)
@@ -21,3 +21,209 @@ CHAIRMAN_MODEL = CHAIRMAN["slug"]
 
 # Data directory for conversation storage
 DATA_DIR = os.getenv("DATA_DIR", "data/conversations")
+
+# Shared OpenRouter connection pool (created/closed in the FastAPI lifespan)
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "1").lower() not in ("0", "false", "no")
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "90"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "30"))
+
+# Upstream retry/backoff and adaptive (AIMD) concurrency limits
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "4"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "20"))
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv("UPSTREAM_MAX_CONCURRENCY", "32"))
+UPSTREAM_PER_MODEL_CONCURRENCY = int(os.getenv("UPSTREAM_PER_MODEL_CONCURRENCY", "8"))
+
+# Fair-share scheduling of the global slots: callers queue per flow (a
+# conversation, or a batch) and flows are served by weighted fair queueing.
+# A flow's weight is its class weight, so interactive turns get most of the
+# capacity under contention while batch and background work (titles, context
+# summaries, health probes) still progress.
+SCHEDULER_WEIGHTS = {
+    "interactive": float(os.getenv("SCHEDULER_WEIGHT_INTERACTIVE", "8")),
+    "batch":       float(os.getenv("SCHEDULER_WEIGHT_BATCH", "2")),
+    "background":  float(os.getenv("SCHEDULER_WEIGHT_BACKGROUND", "1")),
+}
+
+# Wall-clock budget (seconds) per stage, shared by all attempts and backoff waits
+STAGE_DEADLINES = {
+    "stage1": float(os.getenv("STAGE1_DEADLINE", "150")),
+    "stage2": float(os.getenv("STAGE2_DEADLINE", "150")),
+    "stage3": float(os.getenv("STAGE3_DEADLINE", "180")),
+    "title":  float(os.getenv("TITLE_DEADLINE", "30")),
+    "context": float(os.getenv("CONTEXT_DEADLINE", "30")),
+}
+
+# Quorum policy for the parallel stages: continue once `quorum` members have
+# answered (0 = all), or once `soft_deadline` seconds passed (0 = never) with
+# at least `min_responses` answers. Stragglers are cancelled, or with
+# late_policy="record" left to finish and counted as late arrivals.
+STAGE_QUORUM = {
+    "stage1": {
+        "quorum":        int(os.getenv("STAGE1_QUORUM", "0")) or None,
+        "min_responses": int(os.getenv("STAGE1_MIN_RESPONSES", "3")),
+        "soft_deadline": float(os.getenv("STAGE1_SOFT_DEADLINE", "60")),
+        "late_policy":   os.getenv("STAGE1_LATE_POLICY", "cancel"),
+    },
+    "stage2": {
+        "quorum":        int(os.getenv("STAGE2_QUORUM", "0")) or None,
+        "min_responses": int(os.getenv("STAGE2_MIN_RESPONSES", "2")),
+        "soft_deadline": float(os.getenv("STAGE2_SOFT_DEADLINE", "45")),
+        "late_policy":   os.getenv("STAGE2_LATE_POLICY", "cancel"),
+    },
+}
+
+# Hedged requests: members with a "backup_slug" in COUNCIL_MODELS get a duplicate
+# request to the backup once the primary is slower than its tracked latency
+# percentile (HEDGE_DEFAULT_DELAY seconds until HEDGE_MIN_SAMPLES are seen).
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "1").lower() not in ("0", "false", "no")
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.9"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "10"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "20"))
+
+# Per-model circuit breaker: open after N consecutive failed calls, then
+# re-admit via background half-open health probes (cool-down doubles per trip)
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+CIRCUIT_MAX_OPEN_SECONDS = float(os.getenv("CIRCUIT_MAX_OPEN_SECONDS", "600"))
+CIRCUIT_PROBE_INTERVAL = float(os.getenv("CIRCUIT_PROBE_INTERVAL", "10"))
+
+# Content-addressed response cache in front of query_model: in-memory LRU
+# (entry/byte bounded, TTL) backed by a size-bounded on-disk tier. Only the
+# stages listed in RESPONSE_CACHE_STAGES consult it (stage1, stage2, stage3,
+# title, context); by default just the title, since a cached council stage
+# gives every repeat of a question the same answers. Clients can bypass it
+# per request with the `X-Cache-Bypass: 1` header.
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+RESPONSE_CACHE_STAGES = {
+    s.strip() for s in os.getenv("RESPONSE_CACHE_STAGES", "title").split(",") if s.strip()
+}
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))
+RESPONSE_CACHE_DISK_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024)))
+RESPONSE_CACHE_DIR = os.getenv("RESPONSE_CACHE_DIR", os.path.join(DATA_DIR, ".response_cache"))
+
+# Whole-council answer cache: near-duplicate questions (MinHash/LSH over
+# character shingles, same system prompt) get a previous verdict "offer"ed
+# alongside a fresh run. Shingle similarity cannot tell "with alcohol" from
+# "without alcohol" (~0.8), so "reuse" answers outright only a question that
+# is the same after normalization (case, punctuation, whitespace) and offers
+# the rest. "off" disables it.
+ANSWER_CACHE_MODE = os.getenv("ANSWER_CACHE_MODE", "offer").lower()
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.75"))
+
+# Provider prompt caching: stage prompts are laid out as a stable prefix
+# (system prompt, instructions, responses block) followed by a small variable
+# suffix, and the prefix parts carry `cache_control` breakpoints for providers
+# that need explicit markers (Anthropic, Gemini). Others cache prefixes
+# automatically; cached input tokens are reported in /api/metrics.
+PROMPT_CACHE_CONTROL = os.getenv("PROMPT_CACHE_CONTROL", "1").lower() not in ("0", "false", "no")
+
+# Consensus short-circuit (opt-in): when every pair of stage-1 answers is at
+# least CONSENSUS_THRESHOLD similar (Jaccard over character shingles) and no
+# pair differs in negation or in the numbers it cites, peer review is skipped.
+# "skip_review" still gives the chairman every answer; "representative" hands
+# it only the most central one with a shorter prompt.
+# Requests may choose a mode with the `consensus` field.
+CONSENSUS_MODE = os.getenv("CONSENSUS_MODE", "off").lower()
+CONSENSUS_THRESHOLD = float(os.getenv("CONSENSUS_THRESHOLD", "0.6"))
+
+# Stage 2 review design. "full": every reviewer ranks every stage-1 answer.
+# "sharded": each reviewer ranks STAGE2_SHARD_SIZE answers other than its own,
+# assigned round-robin so every answer is seen equally often; stage 2 input
+# then grows linearly with council size instead of quadratically.
+STAGE2_REVIEW_MODE = os.getenv("STAGE2_REVIEW_MODE", "full").lower()
+STAGE2_SHARD_SIZE = int(os.getenv("STAGE2_SHARD_SIZE", "3"))
+
+# Speculative chairman: start the stage-3 draft from stage-1 answers (with a
+# provisional ranking by answer centrality) while stage 2 runs. If peer review
+# crowns the same leader the draft is kept; otherwise it is "revise"d with a
+# short delta prompt or "rerun" from scratch. "off" disables speculation.
+SPECULATIVE_CHAIRMAN = os.getenv("SPECULATIVE_CHAIRMAN", "off").lower()
+
+# Multi-turn context: prior stage-3 verdicts are fed into stage 1 and stage 3
+# within CONTEXT_TOKEN_BUDGET. Recent turns go in verbatim; turns that no
+# longer fit are folded into a rolling summary (at most CONTEXT_SUMMARY_TOKENS)
+# kept in the conversation record and extended only by the turns that fell out.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "600"))
+CONTEXT_SUMMARY_TOKENS = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "200"))
+
+# Batch runs (POST /api/batch): at most this many council runs from all
+# batches execute at once; their model calls also go through the upstream
+# limiters above, so interactive turns keep getting slots.
+BATCH_MAX_CONCURRENT_ITEMS = int(os.getenv("BATCH_MAX_CONCURRENT_ITEMS", "4"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+
+# Detached council jobs: every turn runs as a server-side job whose events
+# carry SSE ids. The newest JOB_MEMORY_EVENTS events of a job are kept in
+# memory and older ones spilled to DATA_DIR/jobs; a finished job stays in
+# memory for JOB_RETENTION seconds and is replayed from disk after that.
+JOB_MEMORY_EVENTS = int(os.getenv("JOB_MEMORY_EVENTS", "2000"))
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", "600"))
+
+# Cancellation: a job whose last client disconnected is cancelled after
+# JOB_DETACH_GRACE seconds unless a client reattaches (a negative value lets
+# jobs always run to completion). DELETE /api/conversations/{id}/run cancels
+# at once. Cancelled turns are stored with what finished, marked `cancelled`
+# (turns that fail likewise, marked `failed`).
+JOB_DETACH_GRACE = float(os.getenv("JOB_DETACH_GRACE", "15"))
+
+# Dynamic council selection. Each member's stage-1 latency and peer-review
+# Borda score are tracked per system prompt (template) over the last
+# ROUTER_WINDOW turns. A profile keeps the best-reviewed members whose p75
+# latency is within its latency target, up to max_members (stage 1 calls and
+# stage 2 input grow with every member, so this is also the cost knob).
+# Requests pick a profile with the `mode` field; COUNCIL_MODE is the default.
+COUNCIL_MODE = os.getenv("COUNCIL_MODE", "full").lower()
+COUNCIL_PROFILES = {
+    "fast": {
+        "max_members":    int(os.getenv("FAST_MAX_MEMBERS", "2")),
+        "latency_target": float(os.getenv("FAST_LATENCY_TARGET", "20")),
+    },
+    "balanced": {
+        "max_members":    int(os.getenv("BALANCED_MAX_MEMBERS", "3")),
+        "latency_target": float(os.getenv("BALANCED_LATENCY_TARGET", "45")),
+    },
+    "full": {
+        "max_members":    None,
+        "latency_target": None,
+    },
+}
+ROUTER_WINDOW = int(os.getenv("ROUTER_WINDOW", "50"))
+ROUTER_MIN_SAMPLES = int(os.getenv("ROUTER_MIN_SAMPLES", "3"))
+
+# Conversation storage: each conversation is a JSON snapshot plus an
+# append-only JSONL log of changes (messages, title, context summary) that
+# reads fold in. After STORAGE_COMPACT_RECORDS log records the conversation
+# is compacted into a fresh snapshot.
+STORAGE_COMPACT_RECORDS = int(os.getenv("STORAGE_COMPACT_RECORDS", "64"))
+
+# Metadata index behind the conversation list (JSON store): updated in memory
+# on every write, persisted to DATA_DIR/.conversations_index.json at most
+# every STORAGE_INDEX_FLUSH_INTERVAL seconds and on shutdown. Entries whose
+# files changed since are re-read when it is loaded.
+STORAGE_INDEX_FLUSH_INTERVAL = float(os.getenv("STORAGE_INDEX_FLUSH_INTERVAL", "5"))
+
+# Conversation store: "json" (the snapshot + log files above) or "sqlite"
+# (one WAL-mode database at STORAGE_SQLITE_PATH). Existing JSON conversations
+# are imported with `python -m backend.migrate_storage`. Batches and jobs stay
+# on files under DATA_DIR either way.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json").lower()
+STORAGE_SQLITE_PATH = os.getenv("STORAGE_SQLITE_PATH", os.path.join(DATA_DIR, "conversations.db"))
+
+# Durability of conversation writes: "turn" fsyncs committed turns and
+# replaced snapshots (a crash loses at most an unfinished turn's title or
+# summary update), "always" fsyncs every write, "off" leaves it to the OS.
+# The SQLite store runs the writes that would be fsynced with synchronous=FULL
+# and the others with NORMAL (OFF for "off").
+STORAGE_FSYNC = os.getenv("STORAGE_FSYNC", "turn").lower()
+
+# Storage calls made from request handlers and council jobs run on a
+# dedicated thread pool of this size, off the event loop. JSON encoding
+# still holds the GIL, so more threads mostly contend with the loop; measure
+# with `python -m backend.bench_storage` before raising it.
+STORAGE_IO_THREADS = int(os.getenv("STORAGE_IO_THREADS", "2"))
@@ -0,0 +1,126 @@
+"""Bounded multi-turn context: recent verdicts verbatim, older turns in a rolling summary."""
+
+import time
+from typing import List, Dict, Any, Tuple
+
+from . import async_storage
+from .budget import estimate_tokens, excerpt, fit_bodies
+from .config import (
+    COUNCIL_MODELS,
+    STAGE_DEADLINES,
+    RESPONSE_CACHE_STAGES,
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_SUMMARY_TOKENS,
+)
+from .openrouter import query_model, circuit_allows, traffic
+
+
+def completed_turns(conversation: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """(question, stage-3 verdict) for every finished turn, oldest first."""
+    messages = conversation["messages"]
+    turns = []
+    for index, message in enumerate(messages):
+        if message.get("role") != "assistant" or index == 0 or messages[index - 1].get("role") != "user":
+            continue
+        if (message.get("metadata") or {}).get("cancelled") or (message.get("metadata") or {}).get("failed"):
+            continue
+        verdict = (message.get("stage3") or {}).get("response") or ""
+        if verdict and not verdict.startswith("Error:"):
+            turns.append((messages[index - 1]["content"], verdict))
+    return turns
+
+
+def _render_turn(question: str, verdict: str) -> str:
+    return f"User: {question}\nCouncil verdict: {verdict}"
+
+
+def render_context(summary: str, recent: List[str]) -> str:
+    """The context block handed to stage 1 and stage 3."""
+    sections = []
+    if summary:
+        sections.append(f"Summary of earlier turns:\n{summary}")
+    if recent:
+        sections.append("Most recent turns:\n" + "\n\n".join(recent))
+    return "\n\n".join(sections)
+
+
+async def _extend_summary(summary: str, turns: List[str], use_cache: bool) -> str:
+    """
+    Fold turns into the running summary with one model call that sees only
+    the current summary and the new turns. Falls back to an excerpt of both.
+    """
+    turns, _ = fit_bodies(turns, 4 * CONTEXT_TOKEN_BUDGET)
+    new_turns = "\n\n".join(turns)
+    prompt = (
+        "Update the running summary of a conversation between a user and an LLM council. "
+        "Keep the facts, decisions and open questions the user may refer back to. "
+        f"At most {CONTEXT_SUMMARY_TOKENS * 3 // 4} words, no preamble.\n\n"
+        f"Current summary:\n{summary or '(none)'}\n\n"
+        f"New turns:\n{new_turns}\n\n"
+        "Updated summary:"
+    )
+    slug = next((m["slug"] for m in COUNCIL_MODELS if circuit_allows(m["slug"])), COUNCIL_MODELS[0]["slug"])
+    with traffic("background"):
+        response = await query_model(
+            slug, [{"role": "user", "content": prompt}],
+            timeout=30.0, max_tokens=CONTEXT_SUMMARY_TOKENS + 50,
+            deadline=time.monotonic() + STAGE_DEADLINES["context"],
+            cache=use_cache and "context" in RESPONSE_CACHE_STAGES,
+        )
+    extended = ((response or {}).get("content") or "").strip()
+    if not extended:
+        extended = "\n\n".join(part for part in (summary, new_turns) if part)
+    return excerpt(extended, CONTEXT_SUMMARY_TOKENS)
+
+
+async def build_context(conversation_id: str, use_cache: bool = True) -> Tuple[str, Dict[str, Any]]:
+    """
+    Context for the next turn of a conversation, within CONTEXT_TOKEN_BUDGET.
+
+    The newest turns are kept verbatim while they fit next to the summary
+    allowance (the newest one is excerpted if it alone does not). Older
+    turns not yet in the stored summary are folded into it and the record
+    is updated, so each turn is summarised once.
+
+    Returns:
+        Tuple of (context text, info dict for the turn metadata); ("", {})
+        for a conversation without earlier turns
+    """
+    conversation = await async_storage.get_conversation(conversation_id)
+    turns = completed_turns(conversation) if conversation else []
+    if not turns or CONTEXT_TOKEN_BUDGET <= 0:
+        return "", {}
+
+    stored = conversation.get("context_summary") or {}
+    summary = stored.get("text", "")
+    covered = min(stored.get("turns", 0), len(turns))
+
+    window = CONTEXT_TOKEN_BUDGET - CONTEXT_SUMMARY_TOKENS
+    recent: List[str] = []
+    used = 0
+    for question, verdict in reversed(turns[covered:]):
+        text = _render_turn(question, verdict)
+        tokens = estimate_tokens(text)
+        if used + tokens > window:
+            break
+        recent.insert(0, text)
+        used += tokens
+    if not recent and covered < len(turns):
+        recent = [excerpt(_render_turn(*turns[-1]), window)]
+
+    first_recent = len(turns) - len(recent)
+    extended = first_recent > covered
+    if extended:
+        summary = await _extend_summary(
+            summary, [_render_turn(*turn) for turn in turns[covered:first_recent]], use_cache
+        )
+        await async_storage.update_context_summary(conversation_id, {"text": summary, "turns": first_recent})
+
+    context = render_context(summary, recent)
+    return context, {
+        "turns":            len(turns),
+        "summarized_turns": first_recent,
+        "verbatim_turns":   len(recent),
+        "summary_extended": extended,
+        "estimated_tokens": estimate_tokens(context),
+    }
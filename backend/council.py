@@ -1,10 +1,39 @@
 ﻿"""3-stage LLM Council orchestration with alias mapping and token cap enforcement."""
 
 import asyncio
-from typing import List, Dict, Any, Tuple
+import hashlib
+import json
+import time
+from typing import List, Dict, Any, Tuple, Awaitable, Callable, Optional
 
-from .openrouter import query_models_parallel, query_model, health_check_model
-from .config import COUNCIL_MODELS, CHAIRMAN, TOKEN_CAPS
+from .openrouter import (
+    query_models_quorum,
+    query_model,
+    query_model_streaming,
+    health_check_model,
+    circuit_allows,
+    traffic,
+)
+from .config import (
+    COUNCIL_MODELS,
+    CHAIRMAN,
+    TOKEN_CAPS,
+    STAGE_DEADLINES,
+    STAGE_QUORUM,
+    RESPONSE_CACHE_STAGES,
+    ANSWER_CACHE_MODE,
+    PROMPT_CACHE_CONTROL,
+    CONSENSUS_MODE,
+    CONSENSUS_THRESHOLD,
+    STAGE2_REVIEW_MODE,
+    STAGE2_SHARD_SIZE,
+    SPECULATIVE_CHAIRMAN,
+    COUNCIL_MODE,
+)
+from .budget import estimate_messages, fit_bodies
+from .roster import select_council
+from .similarity import find_similar_verdict, normalize, pairwise_agreement, centrality_order, disagreement
+from .singleflight import Flight, EventCallback, join_flight
 
 
 #  Helpers 
@@ -31,6 +60,178 @@ def _phase2_caps() -> Dict[str, int]:
     return {m["slug"]: m["max_tokens_phase2"] for m in COUNCIL_MODELS}
 
 
+def _backups() -> Dict[str, str]:
+    return {m["slug"]: m["backup_slug"] for m in COUNCIL_MODELS if m.get("backup_slug")}
+
+
+def _available_slugs(stage: str, metadata: Optional[Dict[str, Any]] = None) -> List[str]:
+    """
+    Members of the turn's roster (see roster.select_council; default: the
+    whole council) whose circuit (or their backup's) is closed. Skipped
+    members are noted in metadata. If every circuit is open, everyone is
+    tried anyway.
+    """
+    members = ((metadata or {}).get("roster") or {}).get("members") or _slugs()
+    backups = _backups()
+    available, skipped = [], []
+    for slug in members:
+        if circuit_allows(slug) or (slug in backups and circuit_allows(backups[slug])):
+            available.append(slug)
+        else:
+            skipped.append(slug)
+    if not available:
+        return members
+    if metadata is not None:
+        metadata.setdefault("skipped_members", {})[stage] = [
+            {"model": _alias(slug), "slug": slug, "reason": "circuit_open"} for slug in skipped
+        ]
+    return available
+
+
+def _deadline(stage: str) -> float:
+    """Absolute monotonic deadline for a stage, shared by all its retries."""
+    return time.monotonic() + STAGE_DEADLINES[stage]
+
+
+def _cache_for(stage: str, use_cache: bool) -> bool:
+    """Whether this stage's calls may use the response cache (per-stage opt-in)."""
+    return use_cache and stage in RESPONSE_CACHE_STAGES
+
+
+def _record_cut(metadata: Optional[Dict[str, Any]], stage: str, cut: Dict[str, str]) -> None:
+    """Note in the turn metadata which members a stage stopped waiting for."""
+    if metadata is None:
+        return
+    metadata.setdefault("cut_members", {})[stage] = [
+        {"model": _alias(slug), "slug": slug, "reason": reason}
+        for slug, reason in cut.items()
+    ]
+
+
+def _record_member_latency(
+    metadata: Optional[Dict[str, Any]],
+    stage: str,
+    responses: Dict[str, Optional[Dict[str, Any]]],
+    cut: Dict[str, str],
+    started: float,
+) -> None:
+    """
+    Note each member's latency in the turn metadata (cache hits left out).
+    Members the stage stopped waiting for get the time it gave up, a lower bound.
+    """
+    if metadata is None:
+        return
+    latencies = {slug: r["latency"] for slug, r in responses.items() if r is not None and "latency" in r}
+    for slug in cut:
+        latencies[slug] = round(time.monotonic() - started, 3)
+    metadata.setdefault("member_latency", {})[stage] = latencies
+
+
+def _record_usage(metadata: Optional[Dict[str, Any]], stage: str, responses: List[Optional[Dict[str, Any]]]) -> None:
+    """Sum the provider-reported token usage of a stage into the turn metadata."""
+    if metadata is None:
+        return
+    totals = {"prompt_tokens": 0, "cached_tokens": 0, "uncached_tokens": 0, "completion_tokens": 0}
+    for response in responses:
+        for field, value in ((response or {}).get("usage") or {}).items():
+            totals[field] = totals.get(field, 0) + value
+    metadata.setdefault("usage", {})[stage] = totals
+
+
+def _text_part(text: str, cache: bool = False) -> Dict[str, Any]:
+    """A text content part; cache=True marks the end of a cacheable prefix."""
+    part: Dict[str, Any] = {"type": "text", "text": text}
+    if cache and PROMPT_CACHE_CONTROL:
+        part["cache_control"] = {"type": "ephemeral"}
+    return part
+
+
+def _system_message(*texts: str) -> Dict[str, Any]:
+    """One system message from the non-empty texts, cacheable up to its end."""
+    parts = [_text_part(text) for text in texts if text]
+    parts[-1] = _text_part(parts[-1]["text"], cache=True)
+    return {"role": "system", "content": parts}
+
+
+def _record_budget(
+    metadata: Optional[Dict[str, Any]],
+    stage: str,
+    budget: int,
+    messages: List[Dict[str, Any]],
+    decisions: List[Dict[str, int]],
+    names: List[str],
+) -> None:
+    """Note a stage's input budget, the prompt's estimated size and any truncations."""
+    if metadata is None:
+        return
+    estimated = estimate_messages(messages)
+    metadata.setdefault("input_budget", {})[stage] = {
+        "budget":           budget,
+        "estimated_tokens": estimated,
+        "over_budget":      estimated > budget,
+        "truncated":        [
+            {"model": names[d["index"]], **{k: v for k, v in d.items() if k != "index"}}
+            for d in decisions
+        ],
+    }
+
+
+def _fit_to_budget(
+    stage: str,
+    budget: int,
+    build: Callable[[List[str]], List[Dict[str, Any]]],
+    bodies: List[str],
+    names: List[str],
+    metadata: Optional[Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    """
+    Build a stage prompt whose variable bodies are compacted/excerpted so the
+    whole prompt fits the phase input budget. build(bodies) assembles the
+    messages; whatever it adds around the bodies is charged first.
+    """
+    fixed = estimate_messages(build([""] * len(bodies)))
+    fitted, decisions = fit_bodies(bodies, budget - fixed)
+    messages = build(fitted)
+    _record_budget(metadata, stage, budget, messages, decisions, names)
+    return messages
+
+
+def _context_parts(context: str) -> List[Dict[str, Any]]:
+    """Content parts carrying the conversation so far (none for a first turn)."""
+    if not context:
+        return []
+    return [_text_part(f"Conversation so far (for context):\n{context}")]
+
+
+def _split_ranking(text: str) -> Tuple[str, str]:
+    """Split a review into (evaluation, "FINAL RANKING:" block)."""
+    index = text.find("FINAL RANKING:")
+    if index < 0:
+        return text, ""
+    return text[:index].rstrip(), text[index:].strip()
+
+
+# Receives ready-to-send SSE payloads: {"type": "token", "stage", "model", "delta", "done"}
+TokenCallback = Callable[[Dict[str, Any]], None]
+
+
+def _token_relay(stage: str, on_token: Optional[TokenCallback]) -> Optional[Callable[[str, str, bool], None]]:
+    """Adapt a TokenCallback to the (slug, delta, done) callback used by openrouter."""
+    if on_token is None:
+        return None
+
+    def relay(slug: str, delta: str, done: bool) -> None:
+        on_token({
+            "type":  "token",
+            "stage": stage,
+            "model": _alias(slug),
+            "delta": delta,
+            "done":  done,
+        })
+
+    return relay
+
+
 #  Bootstrap 
 
 async def bootstrap_council() -> Dict[str, bool]:
@@ -56,39 +257,127 @@ async def bootstrap_council() -> Dict[str, bool]:
 
 #  Stage 1 
 
-async def stage1_collect_responses(user_query: str, system_prompt: str = "") -> List[Dict[str, Any]]:
+async def stage1_collect_responses(
+    user_query: str,
+    system_prompt: str = "",
+    on_token: Optional[TokenCallback] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+    context: str = "",
+) -> List[Dict[str, Any]]:
     """
     Phase 1: Send user prompt to all COUNCIL_MODELS in parallel.
     Token cap: max_tokens_phase1 per model.
     If system_prompt is provided, it is prepended as a system message.
+    If context (earlier turns, see context.build_context) is provided, it
+    precedes the question in the user message.
+    If on_token is provided, members are streamed and every delta is forwarded.
+    Completes per STAGE_QUORUM["stage1"]; members cut are noted in metadata.
+    use_cache=False bypasses the response cache for this turn.
     """
     messages = []
     if system_prompt:
-        messages.append({"role": "system", "content": system_prompt})
-    messages.append({"role": "user", "content": user_query})
+        messages.append(_system_message(system_prompt))
+    if context:
+        messages.append({"role": "user", "content": [*_context_parts(context), _text_part(user_query)]})
+    else:
+        messages.append({"role": "user", "content": user_query})
+    _record_budget(metadata, "stage1", TOKEN_CAPS["phase1_input"], messages, [], [])
     caps = _phase1_caps()
-    responses = await query_models_parallel(_slugs(), messages, max_tokens_per_model=caps)
+    started = time.monotonic()
+    responses, cut = await query_models_quorum(
+        _available_slugs("stage1", metadata), messages, max_tokens_per_model=caps,
+        on_delta=_token_relay("stage1", on_token), deadline=_deadline("stage1"),
+        quorum=STAGE_QUORUM["stage1"], backups=_backups(), cache=_cache_for("stage1", use_cache),
+    )
+    _record_cut(metadata, "stage1", cut)
+    _record_member_latency(metadata, "stage1", responses, cut, started)
+    _record_usage(metadata, "stage1", list(responses.values()))
 
     results = []
     for slug, response in responses.items():
         if response is not None:
-            results.append({
+            result = {
                 "model":    _alias(slug),
                 "slug":     slug,
                 "response": response.get("content", ""),
-            })
+            }
+            if response.get("served_by"):
+                result["served_by"] = response["served_by"]
+            if response.get("cached"):
+                result["cached"] = True
+            results.append(result)
     return results
 
 
 #  Stage 2 
 
+# Static, so it sits in the cached prefix of every reviewer's prompt
+RANKING_INSTRUCTIONS = """You are evaluating anonymized responses from different models to a user's question. The responses come first, then the question.
+
+Your task:
+1. Evaluate each response individually  what it does well and what it misses.
+2. At the very end, provide a FINAL RANKING.
+
+IMPORTANT: Your final ranking MUST be formatted EXACTLY as follows:
+- Start with the line "FINAL RANKING:" (all caps, with colon)
+- List responses from best to worst as a numbered list
+- Each line: number, period, space, then ONLY the label (e.g. "1. Response A")
+
+FINAL RANKING:
+1. Response A
+2. Response B"""
+
+def _review_shards(reviewers: List[str], stage1_results: List[Dict[str, Any]], size: int) -> Dict[str, List[int]]:
+    """
+    Round-robin review design: reviewer i takes the `size` responses after
+    its own (cyclically), never its own. When every reviewer also answered,
+    each response is reviewed exactly `size` times.
+    """
+    n = len(stage1_results)
+    own = {result["slug"]: index for index, result in enumerate(stage1_results)}
+    shards = {}
+    for position, slug in enumerate(reviewers):
+        start = own.get(slug, position)
+        others = [(start + step) % n for step in range(1, n + 1) if (start + step) % n != own.get(slug)]
+        shards[slug] = sorted(others[:size])
+    return shards
+
+
+def _merge_shard_budgets(metadata: Optional[Dict[str, Any]], budgets: List[Dict[str, Any]]) -> None:
+    """Summarise per-reviewer stage-2 budget records: the largest prompt and every excerpt."""
+    if metadata is None or not budgets:
+        return
+    truncated: Dict[str, Dict[str, Any]] = {}
+    for budget in budgets:
+        for decision in budget["truncated"]:
+            truncated.setdefault(decision["model"], decision)
+    metadata.setdefault("input_budget", {})["stage2"] = {
+        "budget":           budgets[0]["budget"],
+        "estimated_tokens": max(budget["estimated_tokens"] for budget in budgets),
+        "over_budget":      any(budget["over_budget"] for budget in budgets),
+        "truncated":        list(truncated.values()),
+        "reviewers":        len(budgets),
+    }
+
+
 async def stage2_collect_rankings(
     user_query: str,
     stage1_results: List[Dict[str, Any]],
+    system_prompt: str = "",
+    on_token: Optional[TokenCallback] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
 ) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
     """
     Phase 2: Each council member ranks the anonymised Phase-1 responses.
     Token cap: max_tokens_phase2 per model.
+    Every reviewer receives the same prefix (system prompt, instructions,
+    responses block) so providers can serve it from their prompt cache;
+    only the question follows it.
+    With STAGE2_REVIEW_MODE="sharded" each reviewer instead ranks its own
+    shard of other members' responses, listed in the result's 'reviewed'.
+    Completes per STAGE_QUORUM["stage2"]; members cut are noted in metadata.
     """
     labels = [chr(65 + i) for i in range(len(stage1_results))]
 
@@ -97,92 +386,255 @@ async def stage2_collect_rankings(
         for label, result in zip(labels, stage1_results)
     }
 
-    responses_text = "\n\n".join([
-        f"Response {label}:\n{result['response']}"
-        for label, result in zip(labels, stage1_results)
-    ])
-
-    ranking_prompt = f"""You are evaluating different responses to the following question:
-
-Question: {user_query}
-
-Here are the responses from different models (anonymized):
+    def prompt_for(indices: List[int], budget_metadata: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        def build(bodies: List[str]) -> List[Dict[str, Any]]:
+            responses_text = "\n\n".join([
+                f"Response {labels[i]}:\n{body}" for i, body in zip(indices, bodies)
+            ])
+            return [
+                _system_message(system_prompt, RANKING_INSTRUCTIONS),
+                {"role": "user", "content": [
+                    _text_part(f"Here are the responses from different models (anonymized):\n\n{responses_text}", cache=True),
+                    _text_part(f"Question: {user_query}\n\nNow provide your evaluation and ranking:"),
+                ]},
+            ]
 
-{responses_text}
+        return _fit_to_budget(
+            "stage2", TOKEN_CAPS["phase2_input"], build,
+            [stage1_results[i]["response"] for i in indices],
+            [stage1_results[i]["model"] for i in indices],
+            budget_metadata,
+        )
 
-Your task:
-1. Evaluate each response individually  what it does well and what it misses.
-2. At the very end, provide a FINAL RANKING.
-
-IMPORTANT: Your final ranking MUST be formatted EXACTLY as follows:
-- Start with the line "FINAL RANKING:" (all caps, with colon)
-- List responses from best to worst as a numbered list
-- Each line: number, period, space, then ONLY the label (e.g. "1. Response A")
-
-FINAL RANKING:
-1. Response A
-2. Response B
-
-Now provide your evaluation and ranking:"""
+    reviewers = _available_slugs("stage2", metadata)
+    shards: Dict[str, List[int]] = {}
+    per_reviewer: Dict[str, List[Dict[str, Any]]] = {}
+    if STAGE2_REVIEW_MODE == "sharded":
+        shards = _review_shards(reviewers, stage1_results, STAGE2_SHARD_SIZE)
+        reviewers = [slug for slug in reviewers if shards[slug]]
+        budgets: Dict[str, Any] = {}
+        for slug in reviewers:
+            scratch: Dict[str, Any] = {}
+            per_reviewer[slug] = prompt_for(shards[slug], scratch)
+            budgets[slug] = scratch["input_budget"]["stage2"]
+        _merge_shard_budgets(metadata, list(budgets.values()))
+        messages: List[Dict[str, Any]] = []
+    else:
+        messages = prompt_for(list(range(len(stage1_results))), metadata)
 
-    messages = [{"role": "user", "content": ranking_prompt}]
     caps = _phase2_caps()
-    responses = await query_models_parallel(_slugs(), messages, max_tokens_per_model=caps)
+    responses, cut = await query_models_quorum(
+        reviewers, messages, max_tokens_per_model=caps,
+        on_delta=_token_relay("stage2", on_token), deadline=_deadline("stage2"),
+        quorum=STAGE_QUORUM["stage2"], backups=_backups(), cache=_cache_for("stage2", use_cache),
+        messages_per_model=per_reviewer,
+    )
+    _record_cut(metadata, "stage2", cut)
+    _record_usage(metadata, "stage2", list(responses.values()))
 
     results = []
     for slug, response in responses.items():
         if response is not None:
             full_text = response.get("content", "")
-            results.append({
+            result = {
                 "model":          _alias(slug),
                 "slug":           slug,
                 "ranking":        full_text,
                 "parsed_ranking": parse_ranking_from_text(full_text),
-            })
+            }
+            if slug in shards:
+                result["reviewed"] = [f"Response {labels[i]}" for i in shards[slug]]
+            if response.get("served_by"):
+                result["served_by"] = response["served_by"]
+            if response.get("cached"):
+                result["cached"] = True
+            results.append(result)
 
     return results, label_to_model
 
 
 #  Stage 3 
 
+CHAIRMAN_INSTRUCTIONS = f"""You are {CHAIRMAN['alias']}, Chairman of the LLM Council. Multiple AI models have responded to a user question, then ranked each other. You will be given their individual responses (Phase 1), their peer rankings (Phase 2) and the original question.
+
+Synthesise all of this into a single, comprehensive, accurate final answer. Consider the individual responses, peer rankings, and patterns of agreement."""
+
+CONSENSUS_INSTRUCTIONS = f"""You are {CHAIRMAN['alias']}, Chairman of the LLM Council. The council members answered a user question independently and reached essentially the same answer, so peer review was skipped. You will be given the most representative of their answers and the original question.
+
+Check that answer, correct or complete it where needed, and deliver it as the council's final answer."""
+
 async def stage3_synthesize_final(
     user_query: str,
     stage1_results: List[Dict[str, Any]],
     stage2_results: List[Dict[str, Any]],
     system_prompt: str = "",
+    on_token: Optional[TokenCallback] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+    provisional_ranking: Optional[List[str]] = None,
+    context: str = "",
 ) -> Dict[str, Any]:
-    """Phase 3: CHAIRMAN synthesises the final answer."""
-    stage1_text = "\n\n".join([
-        f"{r['model']}:\n{r['response']}" for r in stage1_results
-    ])
-    stage2_text = "\n\n".join([
-        f"{r['model']} ranking:\n{r['ranking']}" for r in stage2_results
-    ])
+    """
+    Phase 3: CHAIRMAN synthesises the final answer.
+    The prompt runs from most to least stable (system prompt and chairman
+    instructions, Phase-1 responses, Phase-2 rankings, question).
+    With provisional_ranking (and no stage2_results) this is a speculative
+    draft written while peer review is still running; it is accounted as
+    stage "stage3_draft".
+    """
+    stage = "stage3_draft" if provisional_ranking else "stage3"
+    # The FINAL RANKING blocks are kept whole; only the reviews around them may be excerpted
+    reviews, ranking_blocks = zip(*[_split_ranking(r["ranking"]) for r in stage2_results]) if stage2_results else ((), ())
+    split = len(stage1_results)
+    if (metadata or {}).get("consensus"):
+        pending = "(skipped: the Phase 1 responses agree)"
+    else:
+        pending = "(none: the peer review produced no rankings, so the responses were not compared)"
+    if provisional_ranking:
+        pending = "(still running) Provisional ranking by agreement between the responses:\n" + "\n".join(
+            f"{position}. {model}" for position, model in enumerate(provisional_ranking, start=1)
+        )
 
-    chairman_prompt = f"""You are {CHAIRMAN['alias']}, Chairman of the LLM Council. Multiple AI models have responded to a user question, then ranked each other.
+    def build(bodies: List[str]) -> List[Dict[str, Any]]:
+        stage1_text = "\n\n".join([
+            f"{r['model']}:\n{body}" for r, body in zip(stage1_results, bodies[:split])
+        ])
+        stage2_text = "\n\n".join([
+            f"{r['model']} ranking:\n" + "\n\n".join(part for part in (review, block) if part)
+            for r, review, block in zip(stage2_results, bodies[split:], ranking_blocks)
+        ])
+        return [
+            _system_message(system_prompt, CHAIRMAN_INSTRUCTIONS),
+            {"role": "user", "content": [
+                *_context_parts(context),
+                _text_part(f"PHASE 1  Individual Responses:\n{stage1_text}", cache=True),
+                _text_part(f"PHASE 2  Peer Rankings:\n{stage2_text or pending}"),
+                _text_part(f"Original Question: {user_query}\n\nDeliver the council verdict:"),
+            ]},
+        ]
 
-Original Question: {user_query}
+    messages = _fit_to_budget(
+        stage, TOKEN_CAPS["phase3_input"], build,
+        [r["response"] for r in stage1_results] + list(reviews),
+        [r["model"] for r in stage1_results] + [f"{r['model']} ranking" for r in stage2_results],
+        metadata,
+    )
+    return await _ask_chairman(messages, on_token, metadata, use_cache, stage) or _chairman_failed()
 
-PHASE 1  Individual Responses:
-{stage1_text}
 
-PHASE 2  Peer Rankings:
-{stage2_text}
+async def stage3_revise_draft(
+    user_query: str,
+    stage1_results: List[Dict[str, Any]],
+    draft: str,
+    aggregate_rankings: List[Dict[str, Any]],
+    system_prompt: str = "",
+    on_token: Optional[TokenCallback] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+    context: str = "",
+) -> Optional[Dict[str, Any]]:
+    """
+    Phase 3 delta: the speculative draft assumed a ranking that peer review
+    did not confirm, so the chairman revises it against the aggregate
+    ranking (not the full reviews). Returns None if the chairman failed.
+    """
+    ranking_text = "\n".join(
+        f"{position}. {entry['model']} (average rank {entry['average_rank']})"
+        for position, entry in enumerate(aggregate_rankings, start=1)
+    )
+    split = len(stage1_results)
 
-Synthesise all of this into a single, comprehensive, accurate final answer. Consider the individual responses, peer rankings, and patterns of agreement. Deliver the council verdict:"""
+    def build(bodies: List[str]) -> List[Dict[str, Any]]:
+        stage1_text = "\n\n".join([
+            f"{r['model']}:\n{body}" for r, body in zip(stage1_results, bodies[:split])
+        ])
+        return [
+            _system_message(system_prompt, CHAIRMAN_INSTRUCTIONS),
+            {"role": "user", "content": [
+                *_context_parts(context),
+                _text_part(f"PHASE 1  Individual Responses:\n{stage1_text}", cache=True),
+                _text_part(f"Your draft verdict, written before peer review finished:\n{bodies[split]}"),
+                _text_part(f"PHASE 2  Aggregate Peer Ranking:\n{ranking_text}"),
+                _text_part(
+                    f"Original Question: {user_query}\n\n"
+                    "Peer review ranked the responses differently from the provisional ranking your draft "
+                    "assumed. Revise the draft accordingly and deliver the council verdict:"
+                ),
+            ]},
+        ]
 
-    messages = []
-    if system_prompt:
-        messages.append({"role": "system", "content": system_prompt})
-    messages.append({"role": "user", "content": chairman_prompt})
-    response = await query_model(CHAIRMAN["slug"], messages, max_tokens=CHAIRMAN["max_tokens"])
+    messages = _fit_to_budget(
+        "stage3", TOKEN_CAPS["phase3_input"], build,
+        [r["response"] for r in stage1_results] + [draft],
+        [r["model"] for r in stage1_results] + ["draft"],
+        metadata,
+    )
+    return await _ask_chairman(messages, on_token, metadata, use_cache)
+
+
+async def stage3_confirm_consensus(
+    user_query: str,
+    representative: Dict[str, Any],
+    agreement: float,
+    system_prompt: str = "",
+    on_token: Optional[TokenCallback] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+    context: str = "",
+) -> Dict[str, Any]:
+    """
+    Reduced Phase 3 for a council in consensus: the chairman checks and
+    finalises one representative Phase-1 answer instead of synthesising all.
+    """
+    def build(bodies: List[str]) -> List[Dict[str, Any]]:
+        return [
+            _system_message(system_prompt, CONSENSUS_INSTRUCTIONS),
+            {"role": "user", "content": [
+                *_context_parts(context),
+                _text_part(
+                    f"Representative answer ({representative['model']}, agreement {agreement:.2f}):\n{bodies[0]}",
+                    cache=True,
+                ),
+                _text_part(f"Original Question: {user_query}\n\nDeliver the council verdict:"),
+            ]},
+        ]
+
+    messages = _fit_to_budget(
+        "stage3", TOKEN_CAPS["phase3_input"], build,
+        [representative["response"]], [representative["model"]], metadata,
+    )
+    return await _ask_chairman(messages, on_token, metadata, use_cache) or _chairman_failed()
+
+
+async def _ask_chairman(
+    messages: List[Dict[str, Any]],
+    on_token: Optional[TokenCallback],
+    metadata: Optional[Dict[str, Any]],
+    use_cache: bool,
+    stage: str = "stage3",
+) -> Optional[Dict[str, Any]]:
+    """Send a Phase-3 prompt to the CHAIRMAN (streamed if on_token is given). None if it failed."""
+    relay = _token_relay("stage3", on_token)
+    deadline = _deadline("stage3")
+    cache = _cache_for("stage3", use_cache)
+    if relay is None:
+        response = await query_model(
+            CHAIRMAN["slug"], messages, max_tokens=CHAIRMAN["max_tokens"], deadline=deadline, cache=cache
+        )
+    else:
+        response = await query_model_streaming(
+            CHAIRMAN["slug"],
+            messages,
+            on_delta=lambda delta: relay(CHAIRMAN["slug"], delta, False),
+            max_tokens=CHAIRMAN["max_tokens"],
+            deadline=deadline,
+            cache=cache,
+        )
+        relay(CHAIRMAN["slug"], "", True)
+    _record_usage(metadata, stage, [response])
 
     if response is None:
-        return {
-            "model":    CHAIRMAN["alias"],
-            "slug":     CHAIRMAN["slug"],
-            "response": "Error: Chairman was unable to generate a synthesis.",
-        }
+        return None
 
     return {
         "model":    CHAIRMAN["alias"],
@@ -191,6 +643,14 @@ Synthesise all of this into a single, comprehensive, accurate final answer. Cons
     }
 
 
+def _chairman_failed() -> Dict[str, Any]:
+    return {
+        "model":    CHAIRMAN["alias"],
+        "slug":     CHAIRMAN["slug"],
+        "response": "Error: Chairman was unable to generate a synthesis.",
+    }
+
+
 #  Ranking helpers 
 
 def parse_ranking_from_text(ranking_text: str) -> List[str]:
@@ -208,58 +668,394 @@ def calculate_aggregate_rankings(
     stage2_results: List[Dict[str, Any]],
     label_to_model: Dict[str, str],
 ) -> List[Dict[str, Any]]:
+    """
+    Combine the reviewers' (possibly partial) rankings into one ordering.
+
+    Each review gives the m responses it ranked a normalised Borda score
+    (1.0 for first down to 0.0 for last), and a model's borda_score is the
+    mean over the reviews that ranked it. Models shown to fewer reviewers
+    under sharded review are therefore not penalised for lower exposure.
+    Ties fall back to average_rank.
+    """
     from collections import defaultdict
     model_positions: Dict[str, List[int]] = defaultdict(list)
+    model_scores: Dict[str, List[float]] = defaultdict(list)
+    exposures: Dict[str, int] = defaultdict(int)
 
     for ranking in stage2_results:
-        for position, label in enumerate(parse_ranking_from_text(ranking["ranking"]), start=1):
+        shown = ranking.get("reviewed") or list(label_to_model)
+        for label in shown:
             if label in label_to_model:
-                model_positions[label_to_model[label]].append(position)
+                exposures[label_to_model[label]] += 1
+        ranked: List[str] = []
+        for label in parse_ranking_from_text(ranking["ranking"]):
+            if label in label_to_model and label in shown and label not in ranked:
+                ranked.append(label)
+        for position, label in enumerate(ranked, start=1):
+            model = label_to_model[label]
+            model_positions[model].append(position)
+            model_scores[model].append((len(ranked) - position) / (len(ranked) - 1) if len(ranked) > 1 else 0.5)
 
     aggregate = [
         {
             "model":          model,
             "average_rank":   round(sum(pos) / len(pos), 2),
+            "borda_score":    round(sum(model_scores[model]) / len(model_scores[model]), 3),
             "rankings_count": len(pos),
+            "exposures":      exposures[model],
         }
         for model, pos in model_positions.items() if pos
     ]
-    aggregate.sort(key=lambda x: x["average_rank"])
+    aggregate.sort(key=lambda x: (-x["borda_score"], x["average_rank"]))
     return aggregate
 
 
 #  Title generation 
 
-async def generate_conversation_title(user_query: str) -> str:
+async def generate_conversation_title(user_query: str, use_cache: bool = True) -> str:
     prompt = (
         "Generate a very short title (3-5 words max) summarising the question. "
         "No quotes or punctuation.\n\n"
         f"Question: {user_query}\n\nTitle:"
     )
-    slug = COUNCIL_MODELS[0]["slug"]
-    response = await query_model(slug, [{"role": "user", "content": prompt}], timeout=30.0, max_tokens=20)
+    # First member whose circuit is closed; open members are skipped instantly
+    slug = next((s for s in _slugs() if circuit_allows(s)), COUNCIL_MODELS[0]["slug"])
+    with traffic("background"):
+        response = await query_model(
+            slug, [{"role": "user", "content": prompt}],
+            timeout=30.0, max_tokens=20, deadline=_deadline("title"), cache=_cache_for("title", use_cache),
+        )
     if response is None:
         return "New Conversation"
     title = response.get("content", "New Conversation").strip().strip("\"'")
     return title[:47] + "..." if len(title) > 50 else title
 
 
+#  Answer cache 
+
+async def lookup_similar_verdict(user_query: str, system_prompt: str = "", use_cache: bool = True) -> Optional[Dict[str, Any]]:
+    """Previous verdict for a near-duplicate question, unless the answer cache is off/bypassed."""
+    if not use_cache or ANSWER_CACHE_MODE not in ("offer", "reuse"):
+        return None
+    return await find_similar_verdict(user_query, system_prompt)
+
+
+def answer_cache_info(match: Dict[str, Any], reused: bool) -> Dict[str, Any]:
+    """Metadata entry describing a reused or offered previous verdict."""
+    info = {
+        "reused":                 reused,
+        "similarity":             match["similarity"],
+        "matched_query":          match["query"],
+        "source_conversation_id": match["conversation_id"],
+        "source_message_index":   match["message_index"],
+    }
+    if not reused:
+        info["stage3"] = match["stage3"]
+    return info
+
+
+#  Consensus short-circuit 
+
+CONSENSUS_MODES = ("off", "skip_review", "representative")
+
+
+def check_consensus(stage1_results: List[Dict[str, Any]], mode: str) -> Optional[Dict[str, Any]]:
+    """
+    Decide whether stage 1 agrees closely enough to skip peer review.
+
+    Returns:
+        Dict with 'mode', 'agreement', 'threshold' and 'representative'
+        (alias of the most central answer), or None to run the full council
+    """
+    if mode not in CONSENSUS_MODES[1:] or len(stage1_results) < 2:
+        return None
+    texts = [r["response"] for r in stage1_results]
+    agreement, central = pairwise_agreement(texts)
+    if agreement < CONSENSUS_THRESHOLD:
+        return None
+    # Shingle overlap cannot tell a paraphrase from a contradiction
+    if any(disagreement(a, b) for i, a in enumerate(texts) for b in texts[i + 1:]):
+        return None
+    return {
+        "mode":           mode,
+        "agreement":      round(agreement, 3),
+        "threshold":      CONSENSUS_THRESHOLD,
+        "representative": stage1_results[central]["model"],
+    }
+
+
+#  Speculative chairman 
+
+_speculation_counters: Dict[str, Any] = {
+    "drafts":                0,
+    "hits":                  0,
+    "revised":               0,
+    "rerun":                 0,
+    "latency_saved_seconds": 0.0,
+}
+
+
+def provisional_ranking(stage1_results: List[Dict[str, Any]]) -> List[str]:
+    """Stage-1 models ordered by how central their answer is, as a stand-in for peer review."""
+    order = centrality_order([r["response"] for r in stage1_results])
+    return [stage1_results[i]["model"] for i in order]
+
+
+class SpeculativeDraft:
+    """A chairman draft started from stage 1 while stage 2 is still running."""
+
+    def __init__(self, stage1_results: List[Dict[str, Any]], start: Callable[[List[str]], Awaitable[Dict[str, Any]]]):
+        self.provisional = provisional_ranking(stage1_results)
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+        self.task = asyncio.ensure_future(start(self.provisional))
+        self.task.add_done_callback(self._mark_finished)
+        _speculation_counters["drafts"] += 1
+
+    def _mark_finished(self, _task: asyncio.Task) -> None:
+        self.finished = time.monotonic()
+
+    def cancel(self) -> None:
+        if not self.task.done():
+            self.task.cancel()
+
+    async def settle(
+        self,
+        aggregate_rankings: List[Dict[str, Any]],
+        revise: Callable[[str], Awaitable[Optional[Dict[str, Any]]]],
+        rerun: Callable[[], Awaitable[Dict[str, Any]]],
+        mode: str,
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Keep, revise or replace the draft once peer review is in. The draft
+        is kept when the aggregate ranking has the same leader as the
+        provisional one (or there are no rankings to disagree with).
+
+        Returns:
+            Tuple of (stage-3 result, speculation report for the turn metadata)
+        """
+        review_done = time.monotonic()
+        final_leader = aggregate_rankings[0]["model"] if aggregate_rankings else None
+        hit = final_leader is None or final_leader == self.provisional[0]
+
+        draft = None
+        if hit or (mode == "revise" and self.task.done()):
+            draft = await self.task
+            if draft == _chairman_failed():
+                draft = None
+        else:
+            self.cancel()
+
+        report = {
+            "mode":               mode,
+            "provisional_leader": self.provisional[0],
+            "final_leader":       final_leader,
+            "hit":                hit and draft is not None,
+        }
+        if report["hit"]:
+            # Whatever part of the draft ran alongside stage 2 came off the turn's latency
+            saved = min(self.finished or review_done, review_done) - self.started
+            report.update({"action": "kept", "latency_saved_seconds": round(saved, 3)})
+            _speculation_counters["hits"] += 1
+            _speculation_counters["latency_saved_seconds"] += saved
+            return draft, report
+
+        result = None
+        if draft is not None and mode == "revise":
+            result = await revise(draft["response"])
+            report["action"] = "revised"
+        if result is None:
+            result = await rerun()
+            report["action"] = "rerun"
+        _speculation_counters[report["action"]] += 1
+        report["latency_saved_seconds"] = 0.0
+        return result, report
+
+
+def get_speculation_stats() -> Dict[str, Any]:
+    drafts = _speculation_counters["drafts"]
+    return {
+        **_speculation_counters,
+        "latency_saved_seconds": round(_speculation_counters["latency_saved_seconds"], 3),
+        "hit_rate":              round(_speculation_counters["hits"] / drafts, 3) if drafts else 0.0,
+    }
+
+
 #  Full pipeline 
 
-async def run_full_council(user_query: str, system_prompt: str = "") -> Tuple[List, List, Dict, Dict]:
-    stage1_results = await stage1_collect_responses(user_query, system_prompt=system_prompt)
+async def run_full_council(
+    user_query: str,
+    system_prompt: str = "",
+    use_cache: bool = True,
+    emit: Optional[EventCallback] = None,
+    consensus: Optional[str] = None,
+    context: str = "",
+    mode: Optional[str] = None,
+) -> Tuple[List, List, Dict, Dict]:
+    """
+    Run all three stages. If emit is given, progress is reported through it
+    as the SSE event dicts (stageN_start/complete, stage_skipped, token,
+    similar_answer) and members are streamed token by token.
+    consensus picks the short-circuit mode (default CONSENSUS_MODE).
+    context carries earlier turns into stage 1 and stage 3; follow-ups are
+    not matched against the answer cache, since they depend on it.
+    mode picks the council profile (default COUNCIL_MODE); the chosen
+    roster and the reason are reported in metadata['roster'].
+    """
+    def _emit(event: Dict[str, Any]) -> None:
+        if emit is not None:
+            emit(event)
+
+    metadata: Dict[str, Any] = {}
+    match = None if context else await lookup_similar_verdict(user_query, system_prompt, use_cache)
+    if match is not None:
+        # Near-duplicates can still differ in meaning ("with" / "without"), so
+        # only a question that normalizes to the same text is answered outright
+        if ANSWER_CACHE_MODE == "reuse" and normalize(match["query"]) == normalize(user_query):
+            metadata = {**match["metadata"], "answer_cache": answer_cache_info(match, reused=True)}
+            _emit({"type": "stage1_complete", "data": match["stage1"], "metadata": dict(metadata)})
+            _emit({"type": "stage2_complete", "data": match["stage2"], "metadata": dict(metadata)})
+            _emit({"type": "stage3_complete", "data": match["stage3"]})
+            return match["stage1"], match["stage2"], match["stage3"], metadata
+        metadata["answer_cache"] = answer_cache_info(match, reused=False)
+        _emit({"type": "similar_answer", "data": metadata["answer_cache"]})
+
+    metadata["roster"] = select_council(system_prompt, mode or COUNCIL_MODE)
+    _emit({"type": "roster", "data": metadata["roster"]})
+
+    _emit({"type": "stage1_start"})
+    stage1_results = await stage1_collect_responses(
+        user_query, system_prompt=system_prompt, on_token=emit, metadata=metadata,
+        use_cache=use_cache, context=context,
+    )
+    _emit({"type": "stage1_complete", "data": stage1_results, "metadata": dict(metadata)})
 
     if not stage1_results:
-        return [], [], {
+        stage3_result = {
             "model":    CHAIRMAN["alias"],
             "response": "All council members failed to respond. Please try again.",
-        }, {}
+        }
+        _emit({"type": "stage3_complete", "data": stage3_result})
+        return [], [], stage3_result, metadata
 
-    stage2_results, label_to_model = await stage2_collect_rankings(user_query, stage1_results)
-    aggregate_rankings = calculate_aggregate_rankings(stage2_results, label_to_model)
-    stage3_result = await stage3_synthesize_final(user_query, stage1_results, stage2_results, system_prompt=system_prompt)
+    agreed = check_consensus(stage1_results, consensus or CONSENSUS_MODE)
+    if agreed is not None:
+        skipped = {"reason": "consensus", "agreement": agreed["agreement"], "threshold": agreed["threshold"]}
+        metadata.update({"consensus": agreed, "skipped_stages": {"stage2": skipped}})
+        _emit({"type": "stage_skipped", "stage": "stage2", **skipped})
+        _emit({"type": "stage2_complete", "data": [], "metadata": dict(metadata)})
+
+        _emit({"type": "stage3_start"})
+        if agreed["mode"] == "representative":
+            representative = next(r for r in stage1_results if r["model"] == agreed["representative"])
+            stage3_result = await stage3_confirm_consensus(
+                user_query, representative, agreed["agreement"],
+                system_prompt=system_prompt, on_token=emit, metadata=metadata, use_cache=use_cache, context=context,
+            )
+        else:
+            stage3_result = await stage3_synthesize_final(
+                user_query, stage1_results, [],
+                system_prompt=system_prompt, on_token=emit, metadata=metadata, use_cache=use_cache, context=context,
+            )
+        _emit({"type": "stage3_complete", "data": stage3_result})
+        return stage1_results, [], stage3_result, metadata
 
-    return stage1_results, stage2_results, stage3_result, {
+    speculative = None
+    if SPECULATIVE_CHAIRMAN in ("revise", "rerun"):
+        speculative = SpeculativeDraft(stage1_results, lambda provisional: stage3_synthesize_final(
+            user_query, stage1_results, [], system_prompt=system_prompt,
+            metadata=metadata, use_cache=use_cache, provisional_ranking=provisional, context=context,
+        ))
+
+    _emit({"type": "stage2_start"})
+    try:
+        stage2_results, label_to_model = await stage2_collect_rankings(
+            user_query, stage1_results, system_prompt=system_prompt,
+            on_token=emit, metadata=metadata, use_cache=use_cache,
+        )
+    except BaseException:
+        if speculative is not None:
+            speculative.cancel()
+        raise
+    aggregate_rankings = calculate_aggregate_rankings(stage2_results, label_to_model)
+    metadata.update({
         "label_to_model":     label_to_model,
         "aggregate_rankings": aggregate_rankings,
+    })
+    _emit({"type": "stage2_complete", "data": stage2_results, "metadata": dict(metadata)})
+
+    _emit({"type": "stage3_start"})
+
+    def full_synthesis() -> Awaitable[Dict[str, Any]]:
+        return stage3_synthesize_final(
+            user_query, stage1_results, stage2_results,
+            system_prompt=system_prompt, on_token=emit, metadata=metadata, use_cache=use_cache, context=context,
+        )
+
+    if speculative is None:
+        stage3_result = await full_synthesis()
+    else:
+        stage3_result, metadata["speculation"] = await speculative.settle(
+            aggregate_rankings,
+            revise=lambda draft: stage3_revise_draft(
+                user_query, stage1_results, draft, aggregate_rankings,
+                system_prompt=system_prompt, on_token=emit, metadata=metadata, use_cache=use_cache, context=context,
+            ),
+            rerun=full_synthesis,
+            mode=SPECULATIVE_CHAIRMAN,
+        )
+        relay = _token_relay("stage3", emit)
+        if relay is not None and metadata["speculation"].get("action") == "kept":
+            # The draft ran unstreamed; replay it so the client sees stage 3 arrive like a fresh synthesis
+            relay(CHAIRMAN["slug"], stage3_result["response"], False)
+            relay(CHAIRMAN["slug"], "", True)
+        _emit({"type": "speculation", "data": metadata["speculation"]})
+    _emit({"type": "stage3_complete", "data": stage3_result})
+
+    return stage1_results, stage2_results, stage3_result, metadata
+
+
+#  Single-flight 
+
+def _flight_key(
+    user_query: str,
+    system_prompt: str,
+    use_cache: bool,
+    consensus: Optional[str],
+    context: str,
+    mode: Optional[str],
+) -> str:
+    """Identity of a council run: prompt, question, context, council composition and run options."""
+    composition = {
+        "system_prompt": system_prompt,
+        "query":         user_query,
+        "context":       context,
+        "members":       [(m["slug"], m.get("backup_slug")) for m in COUNCIL_MODELS],
+        "chairman":      CHAIRMAN["slug"],
+        "use_cache":     use_cache,
+        "consensus":     consensus or CONSENSUS_MODE,
+        "mode":          mode or COUNCIL_MODE,
     }
+    return hashlib.sha256(json.dumps(composition, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def join_council_run(
+    user_query: str,
+    system_prompt: str = "",
+    use_cache: bool = True,
+    consensus: Optional[str] = None,
+    context: str = "",
+    mode: Optional[str] = None,
+) -> Tuple[Flight, bool]:
+    """
+    Attach to an identical in-flight council run, or start one.
+    Follow the returned flight for events; its result() is the
+    (stage1, stage2, stage3, metadata) tuple of run_full_council.
+    """
+    return join_flight(
+        _flight_key(user_query, system_prompt, use_cache, consensus, context, mode),
+        lambda publish: run_full_council(
+            user_query, system_prompt, use_cache=use_cache, emit=publish,
+            consensus=consensus, context=context, mode=mode,
+        ),
+    )
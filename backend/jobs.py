@@ -0,0 +1,462 @@
+"""Detached council jobs: a turn runs server-side and clients (re)attach to its event log."""
+
+import asyncio
+import uuid
+from datetime import datetime
+from typing import List, Dict, Any, Optional, AsyncIterator, Callable, Set, Tuple
+
+from . import async_storage, storage
+from .config import JOB_MEMORY_EVENTS, JOB_RETENTION, JOB_DETACH_GRACE
+from .context import build_context
+from .council import generate_conversation_title, join_council_run
+from .openrouter import traffic
+
+# (event id, event); ids start at 1 and increase by one per event
+LogEntry = Tuple[int, Dict[str, Any]]
+
+
+class Job:
+    """
+    One conversation turn running as a background task.
+
+    Every published event gets a sequential id. The newest JOB_MEMORY_EVENTS
+    stay in memory; older ones are spilled to the job's on-disk log, and the
+    rest follow when the job finishes, so a client can resume from any id
+    for as long as the log exists. Its storage writes run on the I/O pool,
+    one at a time and in order.
+
+    A job nobody is attached to (following its events or awaiting its
+    result) is cancelled after JOB_DETACH_GRACE seconds.
+    """
+
+    def __init__(self, job_id: str, conversation_id: str, query: str):
+        self.id = job_id
+        self.conversation_id = conversation_id
+        self.record: Dict[str, Any] = {
+            "id":              job_id,
+            "conversation_id": conversation_id,
+            "query":           query,
+            "status":          "running",
+            "created_at":      datetime.utcnow().isoformat(),
+            "finished_at":     None,
+            "last_event_id":   0,
+        }
+        self.events: List[LogEntry] = []
+        self.spilled = 0  # highest event id written to disk
+        self.task: Optional[asyncio.Task] = None
+        self.attached = 0
+        self.cancel_reason: Optional[str] = None
+        self._subscribers: List[asyncio.Queue] = []
+        self._detach_timer: Optional[asyncio.TimerHandle] = None
+        self._io: Optional[asyncio.Task] = None  # the job's latest queued storage write
+
+    def _write(self, fn: Callable, *args: Any) -> None:
+        """Queue a storage write on the I/O pool, after the job's earlier ones."""
+        previous = self._io
+
+        async def write() -> None:
+            if previous is not None:
+                await asyncio.wait([previous])  # its order, not its outcome
+            try:
+                await async_storage.run(fn, *args)
+            except Exception as e:
+                print(f"Jobs: {fn.__name__} failed for job {self.id}: {e}")
+
+        self._io = asyncio.ensure_future(write())
+        _pending_writes.add(self._io)
+        self._io.add_done_callback(_pending_writes.discard)
+
+    async def _drain(self) -> None:
+        """Wait until every queued write of the job is on disk."""
+        while self._io is not None and not self._io.done():
+            await asyncio.shield(self._io)
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        self.record["last_event_id"] += 1
+        entry = (self.record["last_event_id"], event)
+        self.events.append(entry)
+        if len(self.events) > JOB_MEMORY_EVENTS:
+            self._spill(len(self.events) - JOB_MEMORY_EVENTS // 2)
+        for queue in self._subscribers:
+            queue.put_nowait(entry)
+
+    def _spill(self, count: int) -> None:
+        """Move the oldest `count` in-memory events to the on-disk log."""
+        spill, self.events = self.events[:count], self.events[count:]
+        self._write(
+            storage.append_job_events,
+            self.conversation_id, self.id, [{"id": i, "event": e} for i, e in spill if i > self.spilled],
+        )
+        if spill:
+            self.spilled = max(self.spilled, spill[-1][0])
+            _counters["events_spilled"] += len(spill)
+
+    def attach(self) -> None:
+        self.attached += 1
+        if self._detach_timer is not None:
+            self._detach_timer.cancel()
+            self._detach_timer = None
+
+    def detach(self) -> None:
+        """Drop a client; the last one leaving starts the grace period."""
+        self.attached = max(self.attached - 1, 0)
+        if self.attached or self.task.done() or JOB_DETACH_GRACE < 0:
+            return
+        self._detach_timer = asyncio.get_running_loop().call_later(JOB_DETACH_GRACE, self._abandon)
+
+    def _abandon(self) -> None:
+        self._detach_timer = None
+        if not self.attached and self.cancel("client_disconnected"):
+            _counters["abandoned"] += 1
+
+    def cancel(self, reason: str) -> bool:
+        """
+        Cancel the job: its share of the council run (and with it the
+        in-flight model requests, unless another turn is waiting on the same
+        run) stops, and what finished is stored with a `cancelled` marker.
+
+        Returns:
+            True if the job was still running
+        """
+        if self.task.done():
+            return False
+        self.cancel_reason = reason
+        self.task.cancel()
+        return True
+
+    def _finish(self, task: asyncio.Task) -> None:
+        if task.cancelled():
+            self.record["status"] = "cancelled"
+            self.record["cancel_reason"] = self.cancel_reason
+        else:
+            self.record["status"] = "error" if task.exception() else "done"
+        self.record["finished_at"] = datetime.utcnow().isoformat()
+        # Persist the whole log so the job can be replayed once it leaves memory
+        self._write(
+            _persist_job, dict(self.record), [{"id": i, "event": e} for i, e in self.events if i > self.spilled]
+        )
+        if self.events:
+            self.spilled = self.events[-1][0]
+        _counters["running"] -= 1
+        _counters[self.record["status"]] += 1
+        for queue in self._subscribers:
+            queue.put_nowait(None)
+        asyncio.get_running_loop().call_later(JOB_RETENTION, _jobs.pop, self.id, None)
+
+    async def _replay(self, after: int) -> List[LogEntry]:
+        """Events with an id greater than `after`: spilled ones from disk, then memory."""
+        # Spilled events leave memory before their write lands
+        await self._drain()
+        first_in_memory = self.events[0][0] if self.events else self.record["last_event_id"] + 1
+        in_memory = [entry for entry in self.events if entry[0] > after]
+        history: List[LogEntry] = []
+        if after + 1 < first_in_memory:
+            history = [
+                (entry["id"], entry["event"])
+                for entry in await async_storage.read_job_events(self.conversation_id, self.id, after)
+                if entry["id"] < first_in_memory
+            ]
+        return history + in_memory
+
+    async def follow(self, after: int = 0) -> AsyncIterator[LogEntry]:
+        """Yield (id, event) for every event after id `after`, until the job finishes."""
+        queue: asyncio.Queue = asyncio.Queue()
+        finished = self.task.done()
+        if not finished:
+            self._subscribers.append(queue)
+        self.attach()
+        try:
+            # Events published while the replay waited on storage are both
+            # in the replay and on the queue; yield each id once
+            last = after
+            for entry in await self._replay(after):
+                yield entry
+                last = entry[0]
+            if finished:
+                return
+            while True:
+                entry = await queue.get()
+                if entry is None:
+                    return
+                if entry[0] > last:
+                    yield entry
+                    last = entry[0]
+        finally:
+            if queue in self._subscribers:
+                self._subscribers.remove(queue)
+            self.detach()
+
+    async def result(self) -> Any:
+        """The turn's result. A client going away does not cancel the job."""
+        return await asyncio.shield(self.task)
+
+
+_jobs: Dict[str, Job] = {}
+
+# Storage writes of every job not yet on disk
+_pending_writes: Set[asyncio.Task] = set()
+
+
+def _persist_job(record: Dict[str, Any], entries: List[Dict[str, Any]]) -> None:
+    """Write a finished job's remaining events and its final record (runs on the storage I/O pool)."""
+    storage.append_job_events(record["conversation_id"], record["id"], entries)
+    storage.save_job(record)
+
+
+async def drain_job_writes() -> None:
+    """Wait for the jobs' queued storage writes (called on shutdown)."""
+    while _pending_writes:
+        await asyncio.wait(list(_pending_writes))
+
+
+_counters: Dict[str, int] = {
+    "started":        0,
+    "running":        0,
+    "done":           0,
+    "error":          0,
+    "cancelled":      0,
+    "abandoned":      0,
+    "reattached":     0,
+    "events_spilled": 0,
+}
+
+
+def _track(partial: Dict[str, Any], event: Dict[str, Any]) -> None:
+    """Keep what a turn has produced so far, for storing it if the turn is cancelled."""
+    kind = event.get("type", "")
+    if kind.endswith("_start"):
+        partial["stage"] = kind[:-len("_start")]
+    elif kind.endswith("_complete") and kind[:-len("_complete")] in ("stage1", "stage2", "stage3"):
+        partial[kind[:-len("_complete")]] = event["data"]
+        if event.get("metadata"):
+            partial["metadata"] = event["metadata"]
+    elif kind == "token" and event["delta"]:
+        drafts = partial["drafts"].setdefault(event["stage"], {})
+        drafts[event["model"]] = drafts.get(event["model"], "") + event["delta"]
+
+
+async def _store_unfinished(
+    conversation_id: str, content: str, partial: Dict[str, Any], key: str, marker: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Commit a cancelled or failed turn, so the question is kept: finished
+    stages as they are, an unfinished stage 1 or stage 3 from the tokens
+    streamed so far (no stage 3 if the chairman had not started writing).
+    The turn metadata gets `key` ('cancelled' or 'failed') set to the
+    marker plus the stage the turn stopped in.
+
+    Returns:
+        The stored marker
+    """
+    stage1 = partial.get("stage1")
+    if stage1 is None:
+        stage1 = [{"model": model, "response": text} for model, text in partial["drafts"].get("stage1", {}).items()]
+    stage3 = partial.get("stage3")
+    if stage3 is None and partial["drafts"].get("stage3"):
+        model, text = next(iter(partial["drafts"]["stage3"].items()))
+        stage3 = {"model": model, "response": text}
+    marker = {**marker, "stage": partial["stage"]}
+    await async_storage.commit_turn(
+        conversation_id,
+        content,
+        stage1,
+        partial.get("stage2") or [],
+        stage3,
+        {**partial.get("metadata", {}), key: marker},
+    )
+    return marker
+
+
+async def _run_turn(
+    job: Job,
+    conversation: Dict[str, Any],
+    content: str,
+    consensus: Optional[str],
+    use_cache: bool,
+    mode: Optional[str],
+) -> Dict[str, Any]:
+    """
+    One full turn: run (or join) the council, title a new conversation and
+    commit the question, verdict and title in one write. A cancelled or
+    failed turn commits the question with what finished and a `cancelled`
+    or `failed` marker instead. Publishes the council's events plus
+    `title_complete` and `complete` (or `error`, or `cancelled`).
+    """
+    conversation_id = conversation["id"]
+    publish = job.publish
+    flight = None
+    title_task = None
+    commit: Optional[asyncio.Future] = None
+    partial: Dict[str, Any] = {"stage": "context", "drafts": {}}
+
+    def completed(title: Optional[str], result: Dict[str, Any]) -> Dict[str, Any]:
+        if title is not None:
+            publish({"type": "title_complete", "data": {"title": title}})
+        publish({"type": "complete"})
+        return result
+
+    try:
+        is_first_message = len(conversation["messages"]) == 0
+
+        # Get per-conversation system prompt
+        system_prompt = conversation.get("system_prompt", "")
+
+        # Start title generation in parallel (don't await yet)
+        if is_first_message:
+            title_task = asyncio.create_task(generate_conversation_title(content, use_cache=use_cache))
+
+        # Earlier turns, bounded (older ones folded into the stored rolling summary)
+        context, context_info = await build_context(conversation_id, use_cache=use_cache)
+
+        # Run the council (or attach to an identical run already in flight) and
+        # relay its events; every waiter gets the same stream, including tokens
+        flight, leader = join_council_run(
+            content, system_prompt=system_prompt, use_cache=use_cache,
+            consensus=consensus, context=context, mode=mode,
+        )
+        async for event in flight.follow():
+            _track(partial, event)
+            publish(event)
+        stage1_results, stage2_results, stage3_result, metadata = await flight.result()
+        metadata = {**metadata, "single_flight": {"leader": leader, "waiters": flight.waiters}}
+        if context_info:
+            metadata["context"] = context_info
+
+        # Wait for title generation if it was started
+        title = await title_task if title_task else None
+        result = {
+            "stage1": stage1_results,
+            "stage2": stage2_results,
+            "stage3": stage3_result,
+            "metadata": metadata
+        }
+
+        # Commit the question, the assistant message and the title together.
+        # Shielded: once the write has started it runs to the end anyway
+        commit = asyncio.ensure_future(async_storage.commit_turn(
+            conversation_id,
+            content,
+            stage1_results,
+            stage2_results,
+            stage3_result,
+            metadata,
+            title=title,
+        ))
+        await asyncio.shield(commit)
+        return completed(title, result)
+
+    except asyncio.CancelledError:
+        if commit is not None:
+            # Too late to cancel: the whole turn is being committed
+            await asyncio.shield(commit)
+            return completed(title, result)
+        if title_task:
+            title_task.cancel()
+        # Stops the council run (and its model requests) unless another turn shares it
+        if flight is not None:
+            flight.leave()
+        # Shielded: a second cancel must not cut the write short
+        marker = await asyncio.shield(_store_unfinished(
+            conversation_id, content, partial, "cancelled", {"reason": job.cancel_reason or "cancelled"}
+        ))
+        publish({"type": "cancelled", **marker})
+        raise
+
+    except Exception as e:
+        if title_task:
+            title_task.cancel()
+        if commit is None:
+            # Keep the question; a failure of the commit itself is not retried
+            try:
+                await asyncio.shield(_store_unfinished(conversation_id, content, partial, "failed", {"error": str(e)}))
+            except Exception as store_error:
+                print(f"Jobs: could not store failed turn of {conversation_id}: {store_error}")
+        publish({"type": "error", "message": str(e)})
+        raise
+
+
+def start_job(
+    conversation: Dict[str, Any],
+    content: str,
+    consensus: Optional[str] = None,
+    use_cache: bool = True,
+    mode: Optional[str] = None,
+) -> Job:
+    """
+    Run a conversation turn as a background job. Its first event is
+    {'type': 'job', 'job_id', 'conversation_id'}.
+    """
+    job = Job(str(uuid.uuid4()), conversation["id"], content)
+    job._write(storage.save_job, dict(job.record))
+    job.publish({"type": "job", "job_id": job.id, "conversation_id": job.conversation_id})
+    # The turn's model calls (and the council run it starts) queue as this conversation's
+    with traffic("interactive", conversation["id"]):
+        job.task = asyncio.ensure_future(_run_turn(job, conversation, content, consensus, use_cache, mode))
+    job.task.add_done_callback(job._finish)
+    _jobs[job.id] = job
+    _counters["started"] += 1
+    _counters["running"] += 1
+    return job
+
+
+def cancel_conversation_jobs(conversation_id: str, reason: str = "user_request") -> List[Job]:
+    """Cancel every running job of a conversation. Returns the jobs cancelled."""
+    return [
+        job for job in list(_jobs.values())
+        if job.conversation_id == conversation_id and job.cancel(reason)
+    ]
+
+
+def get_job(job_id: str) -> Optional[Job]:
+    """A job still held in memory (running, or finished within JOB_RETENTION)."""
+    return _jobs.get(job_id)
+
+
+async def follow_job(conversation_id: str, job_id: str, after: int = 0) -> Optional[AsyncIterator[LogEntry]]:
+    """
+    Events of a job after id `after`: live if the job is in memory, otherwise
+    replayed from its on-disk log.
+
+    Returns:
+        Async iterator of (id, event), or None if the job does not exist
+    """
+    job = _jobs.get(job_id)
+    if job is not None and job.conversation_id == conversation_id:
+        _counters["reattached"] += 1
+        return job.follow(after)
+    if await async_storage.get_job(conversation_id, job_id) is None:
+        return None
+    _counters["reattached"] += 1
+
+    async def replay():
+        for entry in await async_storage.read_job_events(conversation_id, job_id, after):
+            yield entry["id"], entry["event"]
+
+    return replay()
+
+
+async def list_jobs(conversation_id: str) -> List[Dict[str, Any]]:
+    """
+    Running and finished jobs of a conversation, newest first. A job stored as
+    running that this process does not know about was cut off by a restart.
+    """
+    jobs = []
+    for record in await async_storage.list_jobs(conversation_id):
+        live = _jobs.get(record["id"])
+        if live is not None:
+            record = dict(live.record)
+        elif record["status"] == "running":
+            record = {**record, "status": "interrupted"}
+        jobs.append(record)
+    # Jobs whose first record is still queued for the disk
+    listed = {record["id"] for record in jobs}
+    jobs += [
+        dict(job.record) for job in _jobs.values()
+        if job.conversation_id == conversation_id and job.id not in listed
+    ]
+    jobs.sort(key=lambda record: record["created_at"], reverse=True)
+    return jobs
+
+
+def get_job_stats() -> Dict[str, Any]:
+    return {**_counters, "in_memory": len(_jobs)}
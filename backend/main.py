@@ -1,27 +1,39 @@
 """FastAPI backend for LLM Council."""
 
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Literal, Optional
 import uuid
 import json
 import asyncio
 import os
 
-from . import storage
+from . import async_storage, storage
 from .council import (
-    run_full_council,
-    generate_conversation_title,
-    stage1_collect_responses,
-    stage2_collect_rankings,
-    stage3_synthesize_final,
-    calculate_aggregate_rankings,
     bootstrap_council,
+    get_speculation_stats,
 )
-from .config import COUNCIL_MODELS, CHAIRMAN
+from .batch import run_batch, batch_summary, get_batch_stats
+from .jobs import start_job, follow_job, list_jobs, cancel_conversation_jobs, get_job_stats, drain_job_writes
+from .similarity import build_answer_index
+from .roster import build_roster_history, get_roster_stats
+from .singleflight import get_flight_stats
+from .openrouter import (
+    open_http_client,
+    close_http_client,
+    get_pool_stats,
+    get_upstream_stats,
+    get_hedge_stats,
+    get_circuit_stats,
+    get_usage_stats,
+    seed_circuits,
+    run_circuit_probes,
+)
+from .cache import response_cache
+from .config import COUNCIL_MODELS, CHAIRMAN, BATCH_MAX_ITEMS
 from .prompt_templates import get_template_list, get_template_prompt, get_starter_questions, get_starter_question_prompt
 
 
@@ -31,8 +43,19 @@ async def lifespan(app: FastAPI):
     print("\n🚀 LLM Council bootstrapping...")
     print(f"   API key: {'✅ set' if os.getenv('OPENROUTER_API_KEY') else '⚠️  using fallback from council_config.py'}")
     print("   Council manifest:")
-    await bootstrap_council()
+    await open_http_client()
+    # Offline members start with an open circuit; background probes re-admit them
+    seed_circuits(await bootstrap_council())
+    probe_task = asyncio.create_task(run_circuit_probes())
+    print(f"   Storage: {storage.get_storage_stats()['backend']}")
+    print(f"   Answer index: {build_answer_index()} stored verdicts")
+    print(f"   Council selection: {build_roster_history()} stored turns")
     yield  # app runs here
+    probe_task.cancel()
+    await close_http_client()
+    await drain_job_writes()
+    storage.flush_storage()
+    async_storage.shutdown()
 
 
 app = FastAPI(title="LLM Council API", lifespan=lifespan)
@@ -50,6 +73,7 @@ app.add_middleware(
     allow_credentials=_cors_origins != ["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Before"],
 )
 
 
@@ -62,6 +86,26 @@ class CreateConversationRequest(BaseModel):
 class SendMessageRequest(BaseModel):
     """Request to send a message in a conversation."""
     content: str
+    # Consensus short-circuit: "off", "skip_review" or "representative" (default: CONSENSUS_MODE)
+    consensus: Optional[Literal["off", "skip_review", "representative"]] = None
+    # Council profile: "fast", "balanced" or "full" (default: COUNCIL_MODE)
+    mode: Optional[Literal["fast", "balanced", "full"]] = None
+
+
+class BatchItem(BaseModel):
+    """One council run in a batch."""
+    query: str
+    template_id: str = "blank"
+
+
+class BatchRequest(BaseModel):
+    """Request to run many council questions as one batch."""
+    items: List[BatchItem]
+
+
+def _use_cache(x_cache_bypass: Optional[str]) -> bool:
+    """`X-Cache-Bypass: 1` (or true/yes) skips the response cache for a request."""
+    return (x_cache_bypass or "").strip().lower() not in ("1", "true", "yes")
 
 
 class ConversationMetadata(BaseModel):
@@ -87,6 +131,25 @@ async def root():
     return {"status": "ok", "service": "LLM Council API", "version": "3.0"}
 
 
+@app.get("/api/metrics")
+async def metrics():
+    """Runtime counters for the upstream OpenRouter client."""
+    return {
+        "http_pool": get_pool_stats(),
+        "upstream":  get_upstream_stats(),
+        "hedging":   get_hedge_stats(),
+        "circuits":  get_circuit_stats(),
+        "token_usage":    get_usage_stats(),
+        "response_cache": response_cache.stats(),
+        "single_flight":  get_flight_stats(),
+        "speculation":    get_speculation_stats(),
+        "batch":          get_batch_stats(),
+        "jobs":           get_job_stats(),
+        "council_selection": get_roster_stats(),
+        "storage":        {**storage.get_storage_stats(), "io": async_storage.get_io_stats()},
+    }
+
+
 @app.get("/api/starter-questions")
 async def list_starter_questions():
     """Return the 5 pre-written Fanvue council starter questions."""
@@ -118,9 +181,19 @@ async def get_template(template_id: str):
 
 
 @app.get("/api/conversations", response_model=List[ConversationMetadata])
-async def list_conversations():
-    """List all conversations (metadata only)."""
-    return storage.list_conversations()
+async def list_conversations(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    before: Optional[str] = None,
+):
+    """
+    List conversations (metadata only), newest first. With `limit`, a full
+    page sets X-Next-Before to the cursor (created_at and id) for the next page.
+    """
+    conversations = await async_storage.list_conversations(limit=limit, before=before)
+    if limit is not None and len(conversations) == limit:
+        response.headers["X-Next-Before"] = storage.page_cursor(conversations[-1])
+    return conversations
 
 
 @app.post("/api/conversations", response_model=Conversation)
@@ -131,129 +204,91 @@ async def create_conversation(request: CreateConversationRequest):
     system_prompt = request.system_prompt
     if request.template_id and request.template_id != "blank" and not system_prompt:
         system_prompt = get_template_prompt(request.template_id) or ""
-    conversation = storage.create_conversation(conversation_id, system_prompt=system_prompt)
+    conversation = await async_storage.create_conversation(conversation_id, system_prompt=system_prompt)
     return conversation
 
 
 @app.get("/api/conversations/{conversation_id}", response_model=Conversation)
 async def get_conversation(conversation_id: str):
     """Get a specific conversation with all its messages."""
-    conversation = storage.get_conversation(conversation_id)
+    conversation = await async_storage.get_conversation(conversation_id)
     if conversation is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
     return conversation
 
 
 @app.post("/api/conversations/{conversation_id}/message")
-async def send_message(conversation_id: str, request: SendMessageRequest):
+async def send_message(
+    conversation_id: str,
+    request: SendMessageRequest,
+    http_request: Request,
+    x_cache_bypass: Optional[str] = Header(default=None),
+):
     """
     Send a message and run the 3-stage council process.
-    Returns the complete response with all stages.
+    Returns the complete response with all stages. If the client
+    disconnects, the turn is cancelled after JOB_DETACH_GRACE seconds.
     """
     # Check if conversation exists
-    conversation = storage.get_conversation(conversation_id)
+    conversation = await async_storage.get_conversation(conversation_id)
     if conversation is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    # Check if this is the first message
-    is_first_message = len(conversation["messages"]) == 0
-
-    # Add user message
-    storage.add_user_message(conversation_id, request.content)
-
-    # If this is the first message, generate a title
-    if is_first_message:
-        title = await generate_conversation_title(request.content)
-        storage.update_conversation_title(conversation_id, title)
-
-    # Get per-conversation system prompt
-    system_prompt = conversation.get("system_prompt", "")
-
-    # Run the 3-stage council process
-    stage1_results, stage2_results, stage3_result, metadata = await run_full_council(
-        request.content, system_prompt=system_prompt
-    )
-
-    # Add assistant message with all stages
-    storage.add_assistant_message(
-        conversation_id,
-        stage1_results,
-        stage2_results,
-        stage3_result
+    # Run the turn as a background job, attached to this request until the
+    # client goes away (the job then gets the usual reattach grace period)
+    job = start_job(
+        conversation, request.content, consensus=request.consensus, use_cache=_use_cache(x_cache_bypass),
+        mode=request.mode,
     )
+    job.attach()
+    try:
+        while not job.task.done():
+            if await http_request.is_disconnected():
+                return None
+            await asyncio.wait({job.task}, timeout=1.0)
+    finally:
+        job.detach()
+
+    if job.task.cancelled():
+        raise HTTPException(status_code=409, detail="Council run was cancelled")
 
     # Return the complete response with metadata
-    return {
-        "stage1": stage1_results,
-        "stage2": stage2_results,
-        "stage3": stage3_result,
-        "metadata": metadata
-    }
+    return await job.result()
 
 
 @app.post("/api/conversations/{conversation_id}/message/stream")
-async def send_message_stream(conversation_id: str, request: SendMessageRequest):
+async def send_message_stream(
+    conversation_id: str,
+    request: SendMessageRequest,
+    x_cache_bypass: Optional[str] = Header(default=None),
+):
     """
     Send a message and stream the 3-stage council process.
-    Returns Server-Sent Events as each stage completes.
+    Returns Server-Sent Events as each stage completes, plus per-model
+    `token` events ({stage, model, delta, done}) while each stage runs.
+
+    The turn runs as a detached job that finishes even if the client goes
+    away. The first event is `job` (with the job id), every event carries an
+    SSE `id:`, and a client that lost the stream resumes it from
+    /jobs/{job_id}/events with `Last-Event-ID`.
     """
     # Check if conversation exists
-    conversation = storage.get_conversation(conversation_id)
+    conversation = await async_storage.get_conversation(conversation_id)
     if conversation is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    # Check if this is the first message
-    is_first_message = len(conversation["messages"]) == 0
+    job = start_job(
+        conversation, request.content, consensus=request.consensus, use_cache=_use_cache(x_cache_bypass),
+        mode=request.mode,
+    )
+    return _stream_job(job.follow(), job.id)
 
+
+def _stream_job(entries, job_id: str) -> StreamingResponse:
+    """Relay a job's (id, event) log as Server-Sent Events with `id:` lines."""
     async def event_generator():
-        try:
-            # Add user message
-            storage.add_user_message(conversation_id, request.content)
-
-            # Get per-conversation system prompt
-            system_prompt = conversation.get("system_prompt", "")
-
-            # Start title generation in parallel (don't await yet)
-            title_task = None
-            if is_first_message:
-                title_task = asyncio.create_task(generate_conversation_title(request.content))
-
-            # Stage 1: Collect responses
-            yield f"data: {json.dumps({'type': 'stage1_start'})}\n\n"
-            stage1_results = await stage1_collect_responses(request.content, system_prompt=system_prompt)
-            yield f"data: {json.dumps({'type': 'stage1_complete', 'data': stage1_results})}\n\n"
-
-            # Stage 2: Collect rankings
-            yield f"data: {json.dumps({'type': 'stage2_start'})}\n\n"
-            stage2_results, label_to_model = await stage2_collect_rankings(request.content, stage1_results)
-            aggregate_rankings = calculate_aggregate_rankings(stage2_results, label_to_model)
-            yield f"data: {json.dumps({'type': 'stage2_complete', 'data': stage2_results, 'metadata': {'label_to_model': label_to_model, 'aggregate_rankings': aggregate_rankings}})}\n\n"
-
-            # Stage 3: Synthesize final answer
-            yield f"data: {json.dumps({'type': 'stage3_start'})}\n\n"
-            stage3_result = await stage3_synthesize_final(request.content, stage1_results, stage2_results)
-            yield f"data: {json.dumps({'type': 'stage3_complete', 'data': stage3_result})}\n\n"
-
-            # Wait for title generation if it was started
-            if title_task:
-                title = await title_task
-                storage.update_conversation_title(conversation_id, title)
-                yield f"data: {json.dumps({'type': 'title_complete', 'data': {'title': title}})}\n\n"
-
-            # Save complete assistant message
-            storage.add_assistant_message(
-                conversation_id,
-                stage1_results,
-                stage2_results,
-                stage3_result
-            )
-
-            # Send completion event
-            yield f"data: {json.dumps({'type': 'complete'})}\n\n"
-
-        except Exception as e:
-            # Send error event
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+        async for event_id, event in entries:
+            yield f"id: {event_id}\ndata: {json.dumps(event)}\n\n"
 
     return StreamingResponse(
         event_generator(),
@@ -261,10 +296,111 @@ async def send_message_stream(conversation_id: str, request: SendMessageRequest)
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
+            "X-Job-Id": job_id,
         }
     )
 
 
+@app.delete("/api/conversations/{conversation_id}/run")
+async def cancel_run(conversation_id: str):
+    """
+    Cancel the conversation's running council turn. In-flight model
+    requests are aborted (unless an identical turn elsewhere shares the
+    run) and the partial result is stored with a `cancelled` marker.
+    """
+    if await async_storage.get_conversation(conversation_id) is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    jobs = cancel_conversation_jobs(conversation_id)
+    if not jobs:
+        raise HTTPException(status_code=404, detail="No council run in progress")
+    # Let the jobs store their partial results before answering
+    await asyncio.wait({job.task for job in jobs})
+    return {"cancelled": [job.record for job in jobs]}
+
+
+@app.get("/api/conversations/{conversation_id}/jobs")
+async def get_conversation_jobs(conversation_id: str):
+    """Running and finished council jobs of a conversation, newest first."""
+    if await async_storage.get_conversation(conversation_id) is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return await list_jobs(conversation_id)
+
+
+@app.get("/api/conversations/{conversation_id}/jobs/{job_id}/events")
+async def reattach_job(
+    conversation_id: str,
+    job_id: str,
+    last_event_id: Optional[str] = Header(default=None),
+    after: int = Query(default=0, ge=0),
+):
+    """
+    Reattach to a job's event stream. Events after the `Last-Event-ID` header
+    (or the `after` query parameter) are replayed, then live events follow
+    until the job finishes. Finished jobs are replayed from their stored log.
+    """
+    if last_event_id and last_event_id.strip().isdigit():
+        after = int(last_event_id)
+    entries = await follow_job(conversation_id, job_id, after=after)
+    if entries is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _stream_job(entries, job_id)
+
+
+def _stream_batch(batch_id: str) -> StreamingResponse:
+    """Stream a batch's events as NDJSON, attaching to (or restarting) its run."""
+    flight, _ = run_batch(batch_id)
+
+    async def lines():
+        async for event in flight.follow():
+            yield json.dumps(event) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.post("/api/batch")
+async def create_batch(
+    request: BatchRequest,
+    x_cache_bypass: Optional[str] = Header(default=None),
+):
+    """
+    Run a list of (query, template_id) items through the council.
+    Streams NDJSON: a `batch` line with the batch id, one `item` line per
+    finished item (with its result), then `batch_complete`. Items run under
+    the global BATCH_MAX_CONCURRENT_ITEMS budget and keep running if the
+    client disconnects; results are persisted as they finish.
+    """
+    if not request.items:
+        raise HTTPException(status_code=422, detail="Batch has no items")
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"Batch exceeds {BATCH_MAX_ITEMS} items")
+    for item in request.items:
+        if get_template_prompt(item.template_id) is None:
+            raise HTTPException(status_code=404, detail=f"Template not found: {item.template_id}")
+
+    batch_id = str(uuid.uuid4())
+    await async_storage.create_batch(batch_id, [item.model_dump() for item in request.items], use_cache=_use_cache(x_cache_bypass))
+    return _stream_batch(batch_id)
+
+
+@app.post("/api/batch/{batch_id}/resume")
+async def resume_batch(batch_id: str):
+    """
+    Resume a batch: finished items are replayed from storage and only the
+    pending or failed ones run again. Attaches to the run if it is still going.
+    """
+    if await async_storage.get_batch(batch_id) is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return _stream_batch(batch_id)
+
+
+@app.get("/api/batch/{batch_id}")
+async def get_batch(batch_id: str):
+    """Status counts and stored items (with results) of a batch."""
+    batch = await async_storage.get_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return {**batch_summary(batch), "created_at": batch["created_at"], "items": batch["items"]}
+
 # Serve the built React frontend (production) — must be LAST
 import pathlib
 
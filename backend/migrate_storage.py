@@ -0,0 +1,55 @@
+"""One-shot import of the JSON conversation files under DATA_DIR into the SQLite store.
+
+Usage: python -m backend.migrate_storage [--overwrite]
+
+Conversations already in the database are skipped unless --overwrite is
+given, so the import can be re-run after an interruption. The JSON files
+are left in place.
+"""
+
+import sys
+from typing import Dict
+
+from .config import DATA_DIR, STORAGE_SQLITE_PATH
+from .storage import ConversationStore, JsonLogStore
+from .sqlite_store import SqliteStore
+
+
+def migrate(source: ConversationStore, target: ConversationStore, overwrite: bool = False) -> Dict[str, int]:
+    """
+    Copy every conversation of `source` into `target`.
+
+    Returns:
+        Dict with the number of conversations 'imported', 'skipped' (already
+        present) and 'failed' (unreadable)
+    """
+    counts = {"imported": 0, "skipped": 0, "failed": 0}
+    existing = set(target.list_ids())
+    for conversation_id in source.list_ids():
+        if conversation_id in existing and not overwrite:
+            counts["skipped"] += 1
+            continue
+        try:
+            conversation = source.load(conversation_id)
+        except (ValueError, KeyError) as e:
+            print(f"  {conversation_id}: unreadable ({e})")
+            counts["failed"] += 1
+            continue
+        if conversation is None:
+            continue
+        target.save(conversation)
+        counts["imported"] += 1
+    return counts
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    print(f"Importing conversations from {DATA_DIR} into {STORAGE_SQLITE_PATH}")
+    counts = migrate(JsonLogStore(), SqliteStore(STORAGE_SQLITE_PATH), overwrite="--overwrite" in argv)
+    print(f"  {counts['imported']} imported, {counts['skipped']} already present, {counts['failed']} failed")
+    print("Set STORAGE_BACKEND=sqlite to use the database.")
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
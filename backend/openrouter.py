@@ -1,32 +1,791 @@
 """OpenRouter API client for making LLM requests."""
 
+import asyncio
+import contextvars
+import heapq
+import importlib.util
+import json
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
 import httpx
-from typing import List, Dict, Any, Optional
-from .config import OPENROUTER_API_KEY, OPENROUTER_API_URL
+from typing import List, Dict, Any, Optional, AsyncIterator, Awaitable, Callable, Tuple
+from .config import (
+    OPENROUTER_API_KEY,
+    OPENROUTER_API_URL,
+    HTTP2_ENABLED,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_POOL_TIMEOUT,
+    RETRY_MAX_ATTEMPTS,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    UPSTREAM_MAX_CONCURRENCY,
+    UPSTREAM_PER_MODEL_CONCURRENCY,
+    SCHEDULER_WEIGHTS,
+    HEDGE_ENABLED,
+    HEDGE_PERCENTILE,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_DEFAULT_DELAY,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_OPEN_SECONDS,
+    CIRCUIT_MAX_OPEN_SECONDS,
+    CIRCUIT_PROBE_INTERVAL,
+    RESPONSE_CACHE_ENABLED,
+)
+from .cache import response_cache, cache_key
+
+
+#  Shared connection pool
+
+_client: Optional[httpx.AsyncClient] = None
+_transport: Optional[httpx.AsyncHTTPTransport] = None
+
+_pool_counters: Dict[str, int] = {
+    "requests":           0,
+    "connections_opened": 0,
+    "tls_handshakes":     0,
+}
+
+
+async def _trace(event_name: str, info: Dict[str, Any]) -> None:
+    """httpcore trace hook: count new TCP connections and TLS handshakes."""
+    if event_name == "connection.connect_tcp.complete":
+        _pool_counters["connections_opened"] += 1
+    elif event_name == "connection.start_tls.complete":
+        _pool_counters["tls_handshakes"] += 1
+
+
+def _build_client() -> httpx.AsyncClient:
+    global _transport
+    http2 = HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+    if HTTP2_ENABLED and not http2:
+        print("HTTP/2 requested but 'h2' is not installed; falling back to HTTP/1.1 keep-alive")
+
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    _transport = httpx.AsyncHTTPTransport(http2=http2, limits=limits)
+    return httpx.AsyncClient(
+        transport=_transport,
+        timeout=httpx.Timeout(120.0, connect=HTTP_CONNECT_TIMEOUT, pool=HTTP_POOL_TIMEOUT),
+        headers={"Authorization": f"Bearer {OPENROUTER_API_KEY}"},
+    )
+
+
+async def open_http_client() -> httpx.AsyncClient:
+    """Create the shared pooled client. Called from the FastAPI lifespan."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared client and release all pooled connections."""
+    global _client, _transport
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _transport = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it lazily outside the app lifespan."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """
+    Snapshot of the shared connection pool.
+
+    Returns:
+        Dict with in-use/idle connection counts, the number of connections
+        and TLS handshakes performed, and how many requests reused a
+        pooled connection instead of opening a new one.
+    """
+    connections = []
+    pool = getattr(_transport, "_pool", None)
+    if pool is not None:
+        connections = list(getattr(pool, "connections", []))
+
+    idle = sum(1 for c in connections if c.is_idle())
+    requests = _pool_counters["requests"]
+    opened = _pool_counters["connections_opened"]
+
+    return {
+        "open":               _client is not None and not _client.is_closed,
+        "http2":              bool(getattr(pool, "_http2", False)),
+        "connections":        len(connections),
+        "in_use":             len(connections) - idle,
+        "idle":               idle,
+        "requests":           requests,
+        "connections_opened": opened,
+        "tls_handshakes":     _pool_counters["tls_handshakes"],
+        "handshakes_avoided": max(requests - opened, 0),
+        "limits": {
+            "max_connections":           HTTP_MAX_CONNECTIONS,
+            "max_keepalive_connections": HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            "keepalive_expiry":          HTTP_KEEPALIVE_EXPIRY,
+        },
+    }
+
+
+#  Retry, backoff and adaptive concurrency
+
+# Statuses worth another attempt: rate limits, timeouts and upstream/provider hiccups
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that adapts to observed rate limiting (AIMD).
+
+    The limit grows by roughly one slot per window of successful calls and
+    is halved on a 429, so bursts queue here instead of failing upstream.
+    """
+
+    def __init__(self, name: str, max_limit: int, min_limit: int = 1):
+        self.name = name
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.successes = 0
+        self.throttled = 0
+        self._last_decrease = 0.0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            self.waiting += 1
+            try:
+                await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+
+    async def release(self) -> None:
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            await self.release()
+
+    def on_success(self) -> None:
+        self.successes += 1
+        self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+
+    def on_throttle(self) -> None:
+        self.throttled += 1
+        now = time.monotonic()
+        # One burst of 429s is one congestion signal, not many
+        if now - self._last_decrease >= 1.0:
+            self.limit = max(float(self.min_limit), self.limit / 2)
+            self._last_decrease = now
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit":     int(self.limit),
+            "in_flight": self.in_flight,
+            "waiting":   self.waiting,
+            "successes": self.successes,
+            "throttled": self.throttled,
+        }
+
+
+#  Fair-share scheduling
+
+# (class, flow) of the model calls made from the current task; tasks inherit
+# it from the task that created them (e.g. a council run from its turn)
+_traffic: contextvars.ContextVar = contextvars.ContextVar("upstream_traffic", default=("interactive", "default"))
+
+
+@contextmanager
+def traffic(kind: str, flow: Optional[str] = None):
+    """
+    Label the model calls made inside the block (and by tasks started from
+    it) with a scheduling class from SCHEDULER_WEIGHTS and a flow key, such
+    as a conversation or batch id. The flow defaults to the current one.
+    """
+    token = _traffic.set((kind, flow if flow is not None else _traffic.get()[1]))
+    try:
+        yield
+    finally:
+        _traffic.reset(token)
+
+
+class FairScheduler(AdaptiveLimiter):
+    """
+    The global adaptive limit, handed out by weighted fair queueing.
+
+    Waiters queue per (class, flow) and are served in order of their
+    start-time fair queueing tag: each call advances its flow's virtual
+    clock by 1/weight, so a busy flow cannot crowd out the others and a
+    flow of weight 8 gets eight slots for every one of a weight-1 flow.
+    """
+
+    def __init__(self, name: str, max_limit: int, weights: Dict[str, float]):
+        super().__init__(name, max_limit)
+        self.weights = weights
+        self._heap: List[Tuple[float, int, str, asyncio.Future]] = []
+        self._flow_finish: Dict[Tuple[str, str], float] = {}
+        self._virtual = 0.0
+        self._seq = 0
+        self._classes: Dict[str, Dict[str, float]] = {
+            kind: {"waiting": 0, "granted": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0} for kind in weights
+        }
+
+    def _class_of(self, kind: str) -> str:
+        return kind if kind in self.weights else "interactive"
+
+    def _granted(self, kind: str, waited: float) -> None:
+        counters = self._classes[kind]
+        counters["granted"] += 1
+        counters["wait_seconds"] += waited
+        counters["max_wait_seconds"] = max(counters["max_wait_seconds"], waited)
+
+    async def acquire(self) -> None:
+        kind, flow = _traffic.get()
+        kind = self._class_of(kind)
+        if not self._heap and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            self._granted(kind, 0.0)
+            return
+
+        start = max(self._virtual, self._flow_finish.get((kind, flow), 0.0))
+        self._flow_finish[(kind, flow)] = start + 1.0 / self.weights[kind]
+        future = asyncio.get_running_loop().create_future()
+        self._seq += 1
+        heapq.heappush(self._heap, (start, self._seq, kind, future))
+        self._classes[kind]["waiting"] += 1
+        self.waiting += 1
+        queued = time.monotonic()
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                await self.release()  # granted just as the caller gave up
+            else:
+                self._classes[kind]["waiting"] -= 1
+                self.waiting -= 1
+            raise
+        self._granted(kind, time.monotonic() - queued)
+
+    def _dispatch(self) -> None:
+        while self._heap and self.in_flight < int(self.limit):
+            start, _, kind, future = heapq.heappop(self._heap)
+            if future.cancelled():
+                continue
+            self._classes[kind]["waiting"] -= 1
+            self.waiting -= 1
+            self.in_flight += 1
+            self._virtual = start
+            future.set_result(None)
+        if not self._heap or len(self._flow_finish) > len(self._heap) + 256:
+            # Flows behind the virtual clock start from it anyway
+            self._flow_finish = {f: t for f, t in self._flow_finish.items() if t > self._virtual}
+
+    async def release(self) -> None:
+        self.in_flight -= 1
+        self._dispatch()
+
+    def on_success(self) -> None:
+        super().on_success()
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        classes = {}
+        for kind, counters in self._classes.items():
+            granted = counters["granted"]
+            classes[kind] = {
+                "weight":           self.weights[kind],
+                "queue_depth":      int(counters["waiting"]),
+                "granted":          int(granted),
+                "avg_wait_ms":      round(1000 * counters["wait_seconds"] / granted, 1) if granted else 0.0,
+                "max_wait_ms":      round(1000 * counters["max_wait_seconds"], 1),
+            }
+        return {**super().stats(), "active_flows": len(self._flow_finish), "classes": classes}
+
+
+_global_limiter = FairScheduler("global", UPSTREAM_MAX_CONCURRENCY, SCHEDULER_WEIGHTS)
+_model_limiters: Dict[str, AdaptiveLimiter] = {}
+
+_retry_counters: Dict[str, int] = {
+    "attempts":  0,
+    "retries":   0,
+    "throttled": 0,
+    "gave_up":   0,
+    "aborted":   0,  # requests abandoned mid-flight (cancelled runs, hedge losers, cut members)
+}
+
+
+_quorum_counters: Dict[str, int] = {
+    "cut_cancelled": 0,
+    "cut_late":      0,
+    "late_arrivals": 0,
+}
+
+
+def _model_limiter(model: str) -> AdaptiveLimiter:
+    if model not in _model_limiters:
+        _model_limiters[model] = AdaptiveLimiter(model, UPSTREAM_PER_MODEL_CONCURRENCY)
+    return _model_limiters[model]
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    """Parse a Retry-After header given either as seconds or as an HTTP date."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given (1-based) attempt."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+
+class _NotRetryable(Exception):
+    """Wraps a failure that must not be retried (e.g. a stream that already emitted tokens)."""
+
+
+def _is_provider_failure(error: Exception) -> bool:
+    """
+    Whether an error counts against the slug's circuit breaker. A 4xx that
+    is not worth retrying (400 context length, 401, 404...) is a problem with
+    the request, not with the provider.
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return not (400 <= status < 500 and status not in RETRYABLE_STATUSES)
+    return True
+
+
+async def _with_retries(
+    model: str,
+    attempt_fn: Callable[[float], Awaitable[Any]],
+    timeout: float,
+    deadline: Optional[float],
+) -> Any:
+    """
+    Run attempt_fn under the per-model and global limiters, retrying
+    transient failures with backoff until attempts or the deadline run out.
+
+    Args:
+        model: OpenRouter model slug (selects the per-model limiter)
+        attempt_fn: Performs one request; receives the per-attempt timeout
+        timeout: Upper bound for a single attempt, in seconds
+        deadline: Absolute time.monotonic() budget shared by all attempts
+            and waits; defaults to now + timeout
+
+    Returns:
+        Whatever attempt_fn returns. Raises the last error on failure.
+    """
+    if deadline is None:
+        deadline = time.monotonic() + timeout
+    model_limiter = _model_limiter(model)
+    attempt = 0
+
+    while True:
+        attempt += 1
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            _retry_counters["gave_up"] += 1
+            raise TimeoutError(f"deadline exceeded before attempt {attempt}")
+
+        _retry_counters["attempts"] += 1
+        wait: Optional[float] = None
+        try:
+            async def _in_slot():
+                # Per-model slot first: a flow queued on a saturated model must
+                # not sit on global slots that the fair queue owes to other flows
+                async with model_limiter.slot(), _global_limiter.slot():
+                    return await attempt_fn(min(timeout, deadline - time.monotonic()))
+
+            result = await asyncio.wait_for(_in_slot(), timeout=remaining)
+            _global_limiter.on_success()
+            model_limiter.on_success()
+            return result
+
+        except _NotRetryable as e:
+            raise e.__cause__ or e
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            if status not in RETRYABLE_STATUSES:
+                raise
+            if status == 429:
+                _retry_counters["throttled"] += 1
+                _global_limiter.on_throttle()
+                model_limiter.on_throttle()
+            wait = _retry_after(e.response)
+            error: Exception = e
+        except (httpx.TransportError, asyncio.TimeoutError) as e:
+            error = e
+        except asyncio.CancelledError:
+            # The caller gave up: leaving the client context aborts the request
+            _retry_counters["aborted"] += 1
+            raise
+
+        if wait is None:
+            wait = _backoff(attempt)
+        if attempt >= RETRY_MAX_ATTEMPTS or time.monotonic() + wait >= deadline:
+            _retry_counters["gave_up"] += 1
+            raise error
+        _retry_counters["retries"] += 1
+        print(f"Retrying {model} in {wait:.2f}s after attempt {attempt}: {error}")
+        await asyncio.sleep(wait)
+
+
+def get_upstream_stats() -> Dict[str, Any]:
+    """Retry/quorum counters and current adaptive limits (global and per model)."""
+    return {
+        **_retry_counters,
+        **_quorum_counters,
+        "global": _global_limiter.stats(),
+        "models": {slug: limiter.stats() for slug, limiter in _model_limiters.items()},
+    }
+
+
+#  Latency tracking and hedging
+
+# Rolling per-slug latency samples: "response" (full answer) and "first_token" (streams)
+_LATENCY_WINDOW = 200
+_latencies: Dict[Tuple[str, str], deque] = {}
+
+_hedge_counters: Dict[str, Dict[str, int]] = {}
+
+
+def _record_latency(model: str, kind: str, seconds: float) -> None:
+    key = (model, kind)
+    if key not in _latencies:
+        _latencies[key] = deque(maxlen=_LATENCY_WINDOW)
+    _latencies[key].append(seconds)
+
+
+def latency_percentile(model: str, kind: str, percentile: float) -> Optional[float]:
+    """Return the given percentile (0-1) of a slug's recent latencies, if sampled."""
+    samples = sorted(_latencies.get((model, kind), ()))
+    if not samples:
+        return None
+    index = min(int(percentile * len(samples)), len(samples) - 1)
+    return samples[index]
+
+
+def _hedge_delay(model: str, kind: str) -> float:
+    """How long to wait on a primary before hedging to its backup."""
+    if len(_latencies.get((model, kind), ())) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY
+    return latency_percentile(model, kind, HEDGE_PERCENTILE)
+
+
+def _hedge_count(model: str, counter: str) -> None:
+    counters = _hedge_counters.setdefault(model, {"eligible": 0, "hedged": 0, "backup_wins": 0, "failovers": 0})
+    counters[counter] += 1
+
+
+def get_hedge_stats() -> Dict[str, Any]:
+    """Per-slug hedge counters and recent latency percentiles."""
+    latency: Dict[str, Dict[str, Any]] = {}
+    for (model, kind), samples in _latencies.items():
+        latency.setdefault(model, {})[kind] = {
+            "samples": len(samples),
+            "p50":     latency_percentile(model, kind, 0.5),
+            "p90":     latency_percentile(model, kind, 0.9),
+        }
+    hedges = {}
+    for model, counters in _hedge_counters.items():
+        eligible = counters["eligible"] or 1
+        hedges[model] = {
+            **counters,
+            "hedge_rate":   round(counters["hedged"] / eligible, 3),
+            "win_rate":     round(counters["backup_wins"] / (counters["hedged"] or 1), 3),
+        }
+    return {"hedges": hedges, "latency": latency}
+
+
+async def _hedged_call(
+    model: str,
+    backup: Optional[str],
+    start: Callable[[str, Callable[[], bool]], Awaitable[Optional[Dict[str, Any]]]],
+    kind: str,
+) -> Optional[Dict[str, Any]]:
+    """
+    Run start(model) and, if it has not claimed the member within the slug's
+    tracked latency percentile (or fails outright), race start(backup).
+
+    start(slug, claim) must call claim() before emitting any output (e.g. on
+    its first streamed token); claim() returns False for the losing call.
+    Non-streaming calls are claimed when they return a response. The first
+    claimer wins and the other call is cancelled.
+    """
+    winner: Optional[str] = None
+    claimed = asyncio.Event()
+
+    def claim_for(slug: str) -> Callable[[], bool]:
+        def claim() -> bool:
+            nonlocal winner
+            if winner is None:
+                winner = slug
+                claimed.set()
+            return winner == slug
+        return claim
+
+    if backup and not circuit_allows(backup):
+        backup = None
+    if backup and not circuit_allows(model):
+        # Primary's breaker is open: the backup stands in directly
+        response = await start(backup, lambda: True)
+        return {**response, "served_by": backup} if response is not None else None
+
+    tasks: Dict[asyncio.Task, str] = {asyncio.ensure_future(start(model, claim_for(model))): model}
+    if not (HEDGE_ENABLED and backup):
+        return await next(iter(tasks))
+
+    _hedge_count(model, "eligible")
+    hedge_at: Optional[float] = time.monotonic() + _hedge_delay(model, kind)
+    pending = set(tasks)
+    results: Dict[str, Optional[Dict[str, Any]]] = {}
+
+    try:
+        while winner is None and (pending or hedge_at is not None):
+            wait_for = None if hedge_at is None else max(hedge_at - time.monotonic(), 0)
+            claim_wait = asyncio.ensure_future(claimed.wait())
+            done, _ = await asyncio.wait(pending | {claim_wait}, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+            claim_wait.cancel()
+
+            for task in done & pending:
+                pending.discard(task)
+                results[tasks[task]] = task.result()
+                if task.result() is not None:
+                    claim_for(tasks[task])()
+
+            primary_failed = model in results and results[model] is None
+            if winner is None and hedge_at is not None and (primary_failed or time.monotonic() >= hedge_at):
+                _hedge_count(model, "failovers" if primary_failed else "hedged")
+                secondary = asyncio.ensure_future(start(backup, claim_for(backup)))
+                tasks[secondary] = backup
+                pending.add(secondary)
+                hedge_at = None
+
+        if winner is None:
+            return None
+        for task, slug in tasks.items():
+            if slug != winner:
+                task.cancel()
+        if winner == backup:
+            _hedge_count(model, "backup_wins")
+        winning_task = next(task for task, slug in tasks.items() if slug == winner)
+        response = await winning_task
+        if response is not None and winner == backup:
+            response = {**response, "served_by": backup}
+        return response
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+#  Circuit breakers
+
+class CircuitBreaker:
+    """
+    Per-slug breaker: closed -> open after consecutive failures, open ->
+    half_open when a background probe is due, half_open -> closed/open on
+    the probe's outcome. Live traffic only flows while closed.
+    """
+
+    def __init__(self, slug: str):
+        self.slug = slug
+        self.state = "closed"
+        self.failures = 0
+        self.trips = 0
+        self.opened_at = 0.0
+        self.open_seconds = CIRCUIT_OPEN_SECONDS
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            print(f"Circuit closed for {self.slug}")
+        self.state = "closed"
+        self.failures = 0
+        self.open_seconds = CIRCUIT_OPEN_SECONDS
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open":
+            # Failed probe: stay out longer next time
+            self.open_seconds = min(self.open_seconds * 2, CIRCUIT_MAX_OPEN_SECONDS)
+            self.trip()
+        elif self.state == "closed" and self.failures >= CIRCUIT_FAILURE_THRESHOLD:
+            self.trip()
+
+    def trip(self) -> None:
+        if self.state != "open":
+            self.trips += 1
+            print(f"Circuit opened for {self.slug}")
+        self.state = "open"
+        self.opened_at = time.monotonic()
+
+    def probe_due(self) -> bool:
+        return self.state == "open" and time.monotonic() - self.opened_at >= self.open_seconds
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state":        self.state,
+            "failures":     self.failures,
+            "trips":        self.trips,
+            "open_seconds": self.open_seconds,
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def _circuit(model: str) -> CircuitBreaker:
+    if model not in _breakers:
+        _breakers[model] = CircuitBreaker(model)
+    return _breakers[model]
+
+
+def circuit_allows(model: str) -> bool:
+    """True if live traffic may be sent to this slug (its breaker is closed)."""
+    return _circuit(model).state == "closed"
+
+
+def seed_circuits(status: Dict[str, bool]) -> None:
+    """Open the breaker of every slug the bootstrap health check found offline."""
+    for slug, online in status.items():
+        if online:
+            _circuit(slug).record_success()
+        else:
+            _circuit(slug).trip()
+
+
+async def run_circuit_probes() -> None:
+    """Background loop: health-probe open slugs once their cool-down expires."""
+    while True:
+        await asyncio.sleep(CIRCUIT_PROBE_INTERVAL)
+        due = [breaker for breaker in _breakers.values() if breaker.probe_due()]
+        for breaker in due:
+            breaker.state = "half_open"
+        if due:
+            # health_check_model reports its outcome back to each breaker
+            with traffic("background", "probes"):
+                await asyncio.gather(*(health_check_model(breaker.slug) for breaker in due))
+            # A probe that failed without counting as a provider failure (a
+            # 4xx, say) would leave its breaker half-open for good
+            for breaker in due:
+                if breaker.state == "half_open":
+                    breaker.trip()
+
+
+def get_circuit_stats() -> Dict[str, Any]:
+    """Breaker state per slug."""
+    return {slug: breaker.stats() for slug, breaker in _breakers.items()}
+
+
+#  Token usage
+
+# Input/output token totals per slug, split by whether the provider served the
+# prompt from its prefix cache
+_usage_totals: Dict[str, Dict[str, int]] = {}
+
+
+def _parse_usage(usage: Optional[Dict[str, Any]]) -> Optional[Dict[str, int]]:
+    """Normalise an OpenRouter ``usage`` block into prompt/cached/uncached/completion tokens."""
+    if not usage:
+        return None
+    prompt_tokens = usage.get("prompt_tokens") or 0
+    cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+    return {
+        "prompt_tokens":     prompt_tokens,
+        "cached_tokens":     cached_tokens,
+        "uncached_tokens":   max(prompt_tokens - cached_tokens, 0),
+        "completion_tokens": usage.get("completion_tokens") or 0,
+    }
+
+
+def _record_usage(model: str, usage: Optional[Dict[str, int]]) -> None:
+    if not usage:
+        return
+    totals = _usage_totals.setdefault(model, {"requests": 0})
+    totals["requests"] += 1
+    for field, value in usage.items():
+        totals[field] = totals.get(field, 0) + value
+
+
+def get_usage_stats() -> Dict[str, Any]:
+    """Token totals per slug and overall, with the share of input served from provider caches."""
+    overall: Dict[str, int] = {}
+    for totals in _usage_totals.values():
+        for field, value in totals.items():
+            overall[field] = overall.get(field, 0) + value
+    prompt_tokens = overall.get("prompt_tokens", 0)
+    return {
+        **overall,
+        "cached_ratio": round(overall.get("cached_tokens", 0) / prompt_tokens, 3) if prompt_tokens else 0.0,
+        "models": _usage_totals,
+    }
+
+
+#  Requests
+
+# Default per-attempt timeout for a model request, in seconds
+ATTEMPT_TIMEOUT = 120.0
 
 
 async def query_model(
     model: str,
     messages: List[Dict[str, str]],
-    timeout: float = 120.0,
+    timeout: float = ATTEMPT_TIMEOUT,
     max_tokens: Optional[int] = None,
+    deadline: Optional[float] = None,
+    cache: bool = False,
 ) -> Optional[Dict[str, Any]]:
     """
-    Query a single model via OpenRouter API.
+    Query a single model via OpenRouter API, retrying transient failures.
 
     Args:
         model: OpenRouter model slug
         messages: List of message dicts with 'role' and 'content'
-        timeout: Request timeout in seconds
+        timeout: Per-attempt request timeout in seconds
         max_tokens: Hard token cap on output (enforced per TOKEN_CAPS)
+        deadline: Absolute time.monotonic() budget for all attempts
+        cache: Serve from / store into the response cache
 
     Returns:
-        Response dict with 'content' and optional 'reasoning_details', or None if failed
+        Response dict with 'content', optional 'reasoning_details' and 'usage'
+        (prompt/cached/uncached/completion tokens; absent on cache hits), or None if failed
     """
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-    }
+    key = cache_key(model, messages, max_tokens) if cache and RESPONSE_CACHE_ENABLED else None
+    if key is not None:
+        cached = await response_cache.get(key)
+        if cached is not None:
+            return {**cached, "cached": True}
 
     payload: Dict[str, Any] = {
         "model": model,
@@ -35,50 +794,356 @@ async def query_model(
     if max_tokens is not None:
         payload["max_tokens"] = max_tokens
 
+    async def attempt(attempt_timeout: float) -> Dict[str, Any]:
+        client = get_http_client()
+        _pool_counters["requests"] += 1
+        response = await client.post(
+            OPENROUTER_API_URL,
+            json=payload,
+            timeout=httpx.Timeout(attempt_timeout, connect=HTTP_CONNECT_TIMEOUT, pool=HTTP_POOL_TIMEOUT),
+            extensions={"trace": _trace},
+        )
+        response.raise_for_status()
+        return response.json()
+
+    started = time.monotonic()
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(
-                OPENROUTER_API_URL,
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
-
-            data = response.json()
-            message = data['choices'][0]['message']
-
-            return {
-                'content': message.get('content'),
-                'reasoning_details': message.get('reasoning_details')
-            }
+        data = await _with_retries(model, attempt, timeout, deadline)
+        message = data['choices'][0]['message']
+        _record_latency(model, "response", time.monotonic() - started)
+        _circuit(model).record_success()
+
+        result = {
+            'content': message.get('content'),
+            'reasoning_details': message.get('reasoning_details')
+        }
+        if key is not None and result['content']:
+            response_cache.put(key, dict(result))
+        result['usage'] = _parse_usage(data.get('usage'))
+        _record_usage(model, result['usage'])
+        return result
 
     except Exception as e:
         print(f"Error querying model {model}: {e}")
+        if _is_provider_failure(e):
+            _circuit(model).record_failure()
+        return None
+
+
+async def stream_model(
+    model: str,
+    messages: List[Dict[str, str]],
+    timeout: float = 120.0,
+    max_tokens: Optional[int] = None,
+    on_usage: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> AsyncIterator[str]:
+    """
+    Stream a single model's completion via OpenRouter's ``stream=True`` mode.
+
+    Args:
+        model: OpenRouter model slug
+        messages: List of message dicts with 'role' and 'content'
+        timeout: Per-read timeout in seconds
+        max_tokens: Hard token cap on output (enforced per TOKEN_CAPS)
+        on_usage: Called with the raw ``usage`` block of the final chunk
+
+    Yields:
+        Content deltas as they arrive. Raises on HTTP or upstream errors.
+    """
+    payload: Dict[str, Any] = {
+        "model": model,
+        "messages": messages,
+        "stream": True,
+        "usage": {"include": True},
+    }
+    if max_tokens is not None:
+        payload["max_tokens"] = max_tokens
+
+    client = get_http_client()
+    _pool_counters["requests"] += 1
+    async with client.stream(
+        "POST",
+        OPENROUTER_API_URL,
+        json=payload,
+        timeout=httpx.Timeout(timeout, connect=HTTP_CONNECT_TIMEOUT, pool=HTTP_POOL_TIMEOUT),
+        extensions={"trace": _trace},
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            # SSE: skip blank lines and ": OPENROUTER PROCESSING" keep-alive comments
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            chunk = json.loads(data)
+            if "error" in chunk:
+                raise RuntimeError(chunk["error"].get("message", chunk["error"]))
+            if chunk.get("usage") and on_usage is not None:
+                on_usage(chunk["usage"])
+            choices = chunk.get("choices") or []
+            if not choices:
+                continue
+            delta = (choices[0].get("delta") or {}).get("content")
+            if delta:
+                yield delta
+
+
+async def query_model_streaming(
+    model: str,
+    messages: List[Dict[str, str]],
+    on_delta: Callable[[str], None],
+    timeout: float = ATTEMPT_TIMEOUT,
+    max_tokens: Optional[int] = None,
+    deadline: Optional[float] = None,
+    cache: bool = False,
+) -> Optional[Dict[str, Any]]:
+    """
+    Like query_model, but streams the completion and reports each delta.
+    Failures are retried only until the first delta has been emitted.
+    A cache hit is reported as a single delta.
+
+    Args:
+        model: OpenRouter model slug
+        messages: List of message dicts with 'role' and 'content'
+        on_delta: Called with every content delta as it arrives
+        timeout: Per-read timeout in seconds
+        max_tokens: Hard token cap on output (enforced per TOKEN_CAPS)
+        deadline: Absolute time.monotonic() budget for all attempts
+        cache: Serve from / store into the response cache
+
+    Returns:
+        Response dict with the assembled 'content', or None if failed
+    """
+    key = cache_key(model, messages, max_tokens) if cache and RESPONSE_CACHE_ENABLED else None
+    if key is not None:
+        cached = await response_cache.get(key)
+        if cached is not None:
+            if cached.get("content"):
+                on_delta(cached["content"])
+            return {**cached, "cached": True}
+
+    parts: List[str] = []
+    usage: Dict[str, Any] = {}
+    started = time.monotonic()
+
+    async def attempt(attempt_timeout: float) -> None:
+        try:
+            async for delta in stream_model(
+                model, messages, timeout=attempt_timeout, max_tokens=max_tokens, on_usage=usage.update
+            ):
+                if not parts:
+                    _record_latency(model, "first_token", time.monotonic() - started)
+                parts.append(delta)
+                on_delta(delta)
+        except Exception as e:
+            if parts:
+                raise _NotRetryable() from e
+            raise
+
+    try:
+        await _with_retries(model, attempt, timeout, deadline)
+    except Exception as e:
+        print(f"Error streaming model {model}: {e}")
+        if _is_provider_failure(e):
+            _circuit(model).record_failure()
         return None
 
+    _circuit(model).record_success()
+    result = {
+        'content': "".join(parts),
+        'reasoning_details': None,
+    }
+    if key is not None and result['content']:
+        response_cache.put(key, dict(result))
+    result['usage'] = _parse_usage(usage)
+    _record_usage(model, result['usage'])
+    return result
+
+
+async def query_models_quorum(
+    models: List[str],
+    messages: List[Dict[str, str]],
+    max_tokens_per_model: Optional[Dict[str, int]] = None,
+    on_delta: Optional[Callable[[str, str, bool], None]] = None,
+    deadline: Optional[float] = None,
+    quorum: Optional[Dict[str, Any]] = None,
+    backups: Optional[Dict[str, str]] = None,
+    cache: bool = False,
+    messages_per_model: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+) -> Tuple[Dict[str, Optional[Dict[str, Any]]], Dict[str, str]]:
+    """
+    Query multiple models in parallel and return once a quorum policy is met.
+
+    Args:
+        models: List of OpenRouter model slugs
+        messages: List of message dicts to send to each model
+        max_tokens_per_model: Optional dict mapping slug -> max_tokens cap
+        on_delta: Optional callback (slug, delta, done); when given, every
+            model is queried in streaming mode and reports done=True once
+        deadline: Absolute time.monotonic() budget shared by every model's retries
+        quorum: Optional policy dict (see STAGE_QUORUM in config):
+            'quorum' - return as soon as this many models answered (None = all)
+            'min_responses' / 'soft_deadline' - after soft_deadline seconds,
+                return as soon as at least min_responses models answered
+            'late_policy' - 'cancel' stragglers, or let them finish as 'late'
+        backups: Optional dict mapping slug -> backup slug to hedge to when
+            the primary is slower than its tracked latency percentile
+        cache: Serve from / store into the response cache
+        messages_per_model: Optional dict mapping slug -> messages that
+            replace `messages` for that model
+
+    Returns:
+        Tuple of (slug -> response dict or None, slug -> cut reason) where the
+        reason is 'cancelled' or 'late' for members the stage did not wait for.
+        Responses not served from the cache carry their 'latency' in seconds.
+    """
+    policy = quorum or {}
+    caps = max_tokens_per_model or {}
+    backups = backups or {}
+    prompts = messages_per_model or {}
+    cut: Dict[str, str] = {}
+
+    def _emit(model: str, delta: str, done: bool) -> None:
+        # Members that were cut stop reporting tokens
+        if model not in cut:
+            on_delta(model, delta, done)
+
+    def _timed(response: Optional[Dict[str, Any]], started: float) -> Optional[Dict[str, Any]]:
+        if response is None or response.get("cached"):
+            return response
+        return {**response, "latency": round(time.monotonic() - started, 3)}
+
+    async def _breaker_aware(
+        model: str, slug: str, call: Awaitable[Optional[Dict[str, Any]]]
+    ) -> Optional[Dict[str, Any]]:
+        started = time.monotonic()
+        try:
+            return await call
+        except asyncio.CancelledError:
+            # Cut by the quorum (not a hedge loser or an abandoned run). A cut
+            # at a soft deadline only means the member was slower than the
+            # others; count it only once it ran past its own attempt timeout
+            if cut.get(model) == "cancelled" and time.monotonic() - started >= ATTEMPT_TIMEOUT:
+                _circuit(slug).record_failure()
+            raise
+
+    async def _query_one(model: str) -> Optional[Dict[str, Any]]:
+        async def start(slug: str, claim: Callable[[], bool]) -> Optional[Dict[str, Any]]:
+            return await _breaker_aware(model, slug, query_model(
+                slug, prompts.get(model, messages), max_tokens=caps.get(model), deadline=deadline, cache=cache
+            ))
+
+        started = time.monotonic()
+        return _timed(await _hedged_call(model, backups.get(model), start, "response"), started)
+
+    async def _stream_one(model: str) -> Optional[Dict[str, Any]]:
+        async def start(slug: str, claim: Callable[[], bool]) -> Optional[Dict[str, Any]]:
+            return await _breaker_aware(model, slug, query_model_streaming(
+                slug,
+                prompts.get(model, messages),
+                on_delta=lambda delta: claim() and _emit(model, delta, False),
+                max_tokens=caps.get(model),
+                deadline=deadline,
+                cache=cache,
+            ))
+
+        started = time.monotonic()
+        response = await _hedged_call(model, backups.get(model), start, "first_token")
+        _emit(model, "", True)
+        return _timed(response, started)
+
+    tasks: Dict[asyncio.Task, str] = {}
+    for model in models:
+        coro = _query_one(model) if on_delta is None else _stream_one(model)
+        tasks[asyncio.ensure_future(coro)] = model
+
+    responses: Dict[str, Optional[Dict[str, Any]]] = {model: None for model in models}
+    needed = policy.get("quorum") or len(models)
+    min_responses = policy.get("min_responses") or needed
+    soft_at = None
+    if policy.get("soft_deadline"):
+        soft_at = time.monotonic() + policy["soft_deadline"]
+
+    answered = 0
+    pending = set(tasks)
+    try:
+        while pending:
+            wait_for = None
+            if soft_at is not None:
+                wait_for = max(soft_at - time.monotonic(), 0)
+            done, pending = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                responses[tasks[task]] = task.result()
+                if responses[tasks[task]] is not None:
+                    answered += 1
+            if answered >= needed:
+                break
+            if soft_at is not None and time.monotonic() >= soft_at:
+                if answered >= min_responses:
+                    break
+                soft_at = None  # past the soft deadline: take the first min_responses
+                needed = min_responses
+    except asyncio.CancelledError:
+        for task in pending:
+            task.cancel()
+        raise
+
+    for task in pending:
+        model = tasks[task]
+        if policy.get("late_policy") == "record":
+            cut[model] = "late"
+            _quorum_counters["cut_late"] += 1
+            task.add_done_callback(lambda t, slug=model: _record_late_arrival(slug, t))
+        else:
+            cut[model] = "cancelled"
+            _quorum_counters["cut_cancelled"] += 1
+            task.cancel()
+        if on_delta is not None:
+            on_delta(model, "", True)
+
+    return responses, cut
+
+
+def _record_late_arrival(model: str, task: asyncio.Task) -> None:
+    if task.cancelled() or task.exception() is not None or task.result() is None:
+        return
+    _quorum_counters["late_arrivals"] += 1
+    print(f"Late arrival from {model} after its stage closed")
+
 
 async def query_models_parallel(
     models: List[str],
     messages: List[Dict[str, str]],
     max_tokens_per_model: Optional[Dict[str, int]] = None,
+    on_delta: Optional[Callable[[str, str, bool], None]] = None,
+    deadline: Optional[float] = None,
+    backups: Optional[Dict[str, str]] = None,
+    cache: bool = False,
 ) -> Dict[str, Optional[Dict[str, Any]]]:
     """
-    Query multiple models in parallel.
+    Query multiple models in parallel over the shared connection pool,
+    waiting for every one of them.
 
     Args:
         models: List of OpenRouter model slugs
         messages: List of message dicts to send to each model
         max_tokens_per_model: Optional dict mapping slug -> max_tokens cap
+        on_delta: Optional callback (slug, delta, done); when given, every
+            model is queried in streaming mode and reports done=True once
+        deadline: Absolute time.monotonic() budget shared by every model's retries
+        backups: Optional dict mapping slug -> backup slug for hedging
+        cache: Serve from / store into the response cache
 
     Returns:
         Dict mapping model slug to response dict (or None if failed)
     """
-    import asyncio
-
-    caps = max_tokens_per_model or {}
-    tasks = [query_model(model, messages, max_tokens=caps.get(model)) for model in models]
-    responses = await asyncio.gather(*tasks)
-    return {model: response for model, response in zip(models, responses)}
+    responses, _ = await query_models_quorum(
+        models, messages,
+        max_tokens_per_model=max_tokens_per_model, on_delta=on_delta, deadline=deadline,
+        backups=backups, cache=cache,
+    )
+    return responses
 
 
 async def health_check_model(slug: str) -> bool:
@@ -0,0 +1,194 @@
+"""Per-query council selection from each member's latency and peer-review record."""
+
+import hashlib
+from collections import deque
+from typing import List, Dict, Any, Optional, Tuple
+
+from . import storage
+from .config import (
+    COUNCIL_MODELS,
+    COUNCIL_MODE,
+    COUNCIL_PROFILES,
+    ROUTER_WINDOW,
+    ROUTER_MIN_SAMPLES,
+)
+from .openrouter import circuit_allows
+
+# Stage 2 needs someone to compare against
+MIN_MEMBERS = 2
+
+# Score given to members with no peer-review record yet, so they still get picked
+_PRIOR_SCORE = 0.5
+
+# Namespace for the all-templates history, used while a template has few samples
+_ALL = "*"
+
+# (namespace, slug) -> recent stage-1 latencies / Borda scores
+_latencies: Dict[Tuple[str, str], deque] = {}
+_scores: Dict[Tuple[str, str], deque] = {}
+
+
+def _template_key(system_prompt: str) -> str:
+    return hashlib.sha256((system_prompt or "").encode("utf-8")).hexdigest()[:16]
+
+
+def _add(samples: Dict[Tuple[str, str], deque], namespace: str, slug: str, value: float) -> None:
+    for key in ((namespace, slug), (_ALL, slug)):
+        samples.setdefault(key, deque(maxlen=ROUTER_WINDOW)).append(value)
+
+
+def _record_turn(turn: Dict[str, Any]) -> None:
+    """Add one stored turn's (see storage.iter_turns) stage-1 latencies and peer-review scores to the history."""
+    metadata = turn["message"].get("metadata") or {}
+    if metadata.get("answer_cache", {}).get("reused") or metadata.get("cancelled") or metadata.get("failed"):
+        return
+    namespace = _template_key(turn["system_prompt"])
+    for slug, seconds in (metadata.get("member_latency") or {}).get("stage1", {}).items():
+        _add(_latencies, namespace, slug, seconds)
+    slug_for = {m["alias"]: m["slug"] for m in COUNCIL_MODELS}
+    for entry in metadata.get("aggregate_rankings") or []:
+        slug = slug_for.get(entry["model"], entry["model"])
+        if entry.get("borda_score") is not None:
+            _add(_scores, namespace, slug, entry["borda_score"])
+
+
+def build_roster_history() -> int:
+    """(Re)build the history from every stored conversation. Returns the turn count."""
+    _latencies.clear()
+    _scores.clear()
+    turns = 0
+    for conversation_id in storage.list_conversation_ids():
+        conversation = storage.get_conversation(conversation_id)
+        if conversation is None:
+            continue
+        for turn in storage.iter_turns(conversation):
+            _record_turn(turn)
+            turns += 1
+    return turns
+
+
+# Keep the history current as new turns are written
+storage.on_assistant_message(_record_turn)
+
+
+def _samples(samples: Dict[Tuple[str, str], deque], namespace: str, slug: str) -> List[float]:
+    """The template's samples, or every template's while it has fewer than ROUTER_MIN_SAMPLES."""
+    own = samples.get((namespace, slug), ())
+    if len(own) >= ROUTER_MIN_SAMPLES:
+        return list(own)
+    return list(samples.get((_ALL, slug), ()))
+
+
+def _p75(values: List[float]) -> Optional[float]:
+    if len(values) < ROUTER_MIN_SAMPLES:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * 0.75), len(ordered) - 1)]
+
+
+def _record(latencies: List[float], scores: List[float]) -> Dict[str, Any]:
+    return {
+        "latency_p75":     _p75(latencies),
+        "peer_score":      round(sum(scores) / len(scores), 3) if len(scores) >= ROUTER_MIN_SAMPLES else None,
+        "latency_samples": len(latencies),
+        "score_samples":   len(scores),
+    }
+
+
+def member_stats(system_prompt: Optional[str] = "") -> Dict[str, Dict[str, Any]]:
+    """
+    Track record of every member under a template (None: across all templates).
+
+    Returns:
+        Dict mapping slug -> {'latency_p75', 'peer_score', 'latency_samples',
+        'score_samples'}; latency_p75 / peer_score are None until there are
+        ROUTER_MIN_SAMPLES samples
+    """
+    stats = {}
+    for member in COUNCIL_MODELS:
+        slug = member["slug"]
+        if system_prompt is None:
+            latencies, scores = list(_latencies.get((_ALL, slug), ())), list(_scores.get((_ALL, slug), ()))
+        else:
+            namespace = _template_key(system_prompt)
+            latencies, scores = _samples(_latencies, namespace, slug), _samples(_scores, namespace, slug)
+        stats[slug] = _record(latencies, scores)
+    return stats
+
+
+def select_council(system_prompt: str = "", mode: str = "full") -> Dict[str, Any]:
+    """
+    Pick the members for one query under a profile of COUNCIL_PROFILES.
+
+    Members with an open circuit and no healthy backup are left out. Of the
+    rest, those whose p75 stage-1 latency meets the profile's latency target
+    (or that have no record yet) are ranked by average peer-review Borda
+    score and the best max_members kept; if fewer than two qualify, the
+    fastest others fill in.
+
+    Returns:
+        Dict with 'mode', 'members' (slugs, in council order), 'reason',
+        'excluded' ({slug, reason} dicts) and the 'stats' the choice used
+    """
+    profile = COUNCIL_PROFILES.get(mode) or COUNCIL_PROFILES["full"]
+    stats = member_stats(system_prompt)
+    order = [m["slug"] for m in COUNCIL_MODELS]
+
+    backups = {m["slug"]: m.get("backup_slug") for m in COUNCIL_MODELS}
+
+    excluded: List[Dict[str, Any]] = []
+    candidates = []
+    for slug in order:
+        # Same rule as the stages: a member whose circuit is open still
+        # serves through a healthy backup
+        if circuit_allows(slug) or (backups[slug] and circuit_allows(backups[slug])):
+            candidates.append(slug)
+        else:
+            excluded.append({"slug": slug, "reason": "circuit_open"})
+    if len(candidates) < MIN_MEMBERS:
+        candidates, excluded = order, []  # let the stages' own fallbacks deal with it
+
+    target = profile["latency_target"]
+    limit = profile["max_members"] or len(candidates)
+
+    def latency(slug: str) -> float:
+        p75 = stats[slug]["latency_p75"]
+        return p75 if p75 is not None else 0.0
+
+    def score(slug: str) -> float:
+        peer = stats[slug]["peer_score"]
+        return peer if peer is not None else _PRIOR_SCORE
+
+    within = sorted(
+        (s for s in candidates if target is None or latency(s) <= target),
+        key=lambda s: (-score(s), latency(s)),
+    )
+    chosen = within[:limit]
+    for slug in within[limit:]:
+        excluded.append({"slug": slug, "reason": "profile_size"})
+    slow = sorted((s for s in candidates if s not in within), key=latency)
+    while len(chosen) < min(MIN_MEMBERS, limit) and slow:
+        chosen.append(slow.pop(0))
+    for slug in slow:
+        excluded.append({"slug": slug, "reason": "over_latency_target", "latency_p75": stats[slug]["latency_p75"]})
+
+    members = [slug for slug in order if slug in chosen]
+    reason = f"{mode}: {len(members)} of {len(order)} members"
+    if profile["max_members"] or target is not None:
+        reason += ", best peer-reviewed first"
+    if target is not None:
+        reason += f", p75 stage-1 latency <= {target:g}s"
+    open_circuits = sum(1 for entry in excluded if entry["reason"] == "circuit_open")
+    if open_circuits:
+        reason += f", {open_circuits} with an open circuit left out"
+    return {
+        "mode":     mode,
+        "members":  members,
+        "reason":   reason,
+        "excluded": excluded,
+        "stats":    {slug: stats[slug] for slug in order},
+    }
+
+
+def get_roster_stats() -> Dict[str, Any]:
+    return {"default_mode": COUNCIL_MODE, "profiles": COUNCIL_PROFILES, "members": member_stats(None)}
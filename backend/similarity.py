@@ -0,0 +1,236 @@
+"""Near-duplicate question index over stored council verdicts (MinHash + LSH)."""
+
+import hashlib
+import random
+import re
+from typing import List, Dict, Any, Optional, Tuple
+
+from . import async_storage, storage
+from .config import ANSWER_CACHE_THRESHOLD
+
+# Index entries point at (conversation_id, assistant message index)
+TurnRef = Tuple[str, int]
+
+_PRIME = (1 << 61) - 1
+
+
+def normalize(text: str) -> str:
+    """Lower-case, drop punctuation and collapse whitespace."""
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", text.lower()).split())
+
+
+def shingles(text: str, k: int = 4) -> List[str]:
+    """Character k-gram shingles of the normalized text."""
+    norm = normalize(text)
+    if len(norm) <= k:
+        return [norm]
+    return [norm[i:i + k] for i in range(len(norm) - k + 1)]
+
+
+def jaccard(a: str, b: str) -> float:
+    """Exact Jaccard similarity of two texts' shingle sets."""
+    sa, sb = set(shingles(a)), set(shingles(b))
+    if not sa and not sb:
+        return 1.0
+    return len(sa & sb) / len(sa | sb)
+
+
+def _similarity_matrix(texts: List[str]) -> List[List[float]]:
+    n = len(texts)
+    scores = [[1.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1, n):
+            scores[i][j] = scores[j][i] = jaccard(texts[i], texts[j])
+    return scores
+
+
+def pairwise_agreement(texts: List[str]) -> Tuple[float, int]:
+    """
+    How much a set of texts agree.
+
+    Returns:
+        Tuple of (lowest pairwise Jaccard similarity, index of the text most
+        similar on average to the others)
+    """
+    n = len(texts)
+    if n < 2:
+        return 0.0, 0
+    scores = _similarity_matrix(texts)
+    lowest = min(scores[i][j] for i in range(n) for j in range(i + 1, n))
+    central = max(range(n), key=lambda i: sum(scores[i]))
+    return lowest, central
+
+
+# Cues that flip a claim; "isn't" and friends normalise to "isn t"
+_NEGATION = re.compile(r"\b(?:no|not|never|none|nothing|neither|nor|cannot|without)\b|n['\u2019]t\b")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)?")
+
+
+def disagreement(a: str, b: str) -> Optional[str]:
+    """
+    Cheap check for two similar-looking texts that say opposite things:
+    "Yes, X is safe" and "No, X is not safe" share most of their shingles.
+
+    Returns:
+        'negation' if only one of them negates, 'numbers' if both cite
+        numbers but not the same ones, else None
+    """
+    a, b = a.lower(), b.lower()
+    if bool(_NEGATION.search(a)) != bool(_NEGATION.search(b)):
+        return "negation"
+    numbers_a, numbers_b = set(_NUMBER.findall(a)), set(_NUMBER.findall(b))
+    if numbers_a and numbers_b and numbers_a != numbers_b:
+        return "numbers"
+    return None
+
+
+def centrality_order(texts: List[str]) -> List[int]:
+    """Indices of the texts, most similar on average to the others first."""
+    scores = _similarity_matrix(texts)
+    return sorted(range(len(texts)), key=lambda i: sum(scores[i]), reverse=True)
+
+
+def _prompt_namespace(system_prompt: str) -> str:
+    return hashlib.sha256((system_prompt or "").encode("utf-8")).hexdigest()[:16]
+
+
+class MinHashIndex:
+    """
+    MinHash signatures bucketed by LSH bands.
+
+    Signatures have `num_perm` slots split into `bands` bands; any band that
+    collides makes a candidate, and candidates are then scored by the
+    fraction of matching slots (an estimate of Jaccard similarity).
+    Entries are namespaced (here: by system prompt) and never match across
+    namespaces.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, seed: int = 1):
+        assert num_perm % bands == 0
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        self._buckets: Dict[Tuple[str, int, Tuple[int, ...]], List[TurnRef]] = {}
+        self._entries: Dict[TurnRef, Tuple[str, Tuple[int, ...]]] = {}
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        hashes = [
+            int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+            for s in set(shingles(text))
+        ]
+        return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms)
+
+    def _bands(self, namespace: str, sig: Tuple[int, ...]):
+        for band in range(self.bands):
+            yield (namespace, band, sig[band * self.rows:(band + 1) * self.rows])
+
+    def add(self, ref: TurnRef, text: str, namespace: str) -> None:
+        if ref in self._entries:
+            self.remove(ref)
+        sig = self.signature(text)
+        self._entries[ref] = (namespace, sig)
+        for bucket in self._bands(namespace, sig):
+            self._buckets.setdefault(bucket, []).append(ref)
+
+    def remove(self, ref: TurnRef) -> None:
+        entry = self._entries.pop(ref, None)
+        if entry is None:
+            return
+        for bucket in self._bands(*entry):
+            refs = self._buckets.get(bucket, [])
+            if ref in refs:
+                refs.remove(ref)
+            if not refs:
+                self._buckets.pop(bucket, None)
+
+    def query(self, text: str, namespace: str) -> List[Tuple[TurnRef, float]]:
+        """Return candidate refs with their estimated similarity, best first."""
+        sig = self.signature(text)
+        candidates = set()
+        for bucket in self._bands(namespace, sig):
+            candidates.update(self._buckets.get(bucket, ()))
+        scored = []
+        for ref in candidates:
+            other = self._entries[ref][1]
+            score = sum(1 for x, y in zip(sig, other) if x == y) / self.num_perm
+            scored.append((ref, score))
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+answer_index = MinHashIndex()
+
+
+def _index_turn(turn: Dict[str, Any]) -> None:
+    """Index one assistant turn (see storage.iter_turns) under the user question that preceded it."""
+    message = turn["message"]
+    if not message.get("stage1") or not (message.get("stage3") or {}).get("response"):
+        return
+    if (message.get("metadata") or {}).get("answer_cache", {}).get("reused"):
+        return  # a copy of an indexed verdict
+    if (message.get("metadata") or {}).get("context"):
+        return  # a follow-up; its meaning depends on the earlier turns
+    if (message.get("metadata") or {}).get("cancelled") or (message.get("metadata") or {}).get("failed"):
+        return  # an unfinished verdict
+    answer_index.add(
+        (turn["conversation_id"], turn["message_index"]),
+        turn["question"],
+        _prompt_namespace(turn["system_prompt"]),
+    )
+
+
+def build_answer_index() -> int:
+    """(Re)build the index from every stored conversation. Returns the entry count."""
+    for conversation_id in storage.list_conversation_ids():
+        conversation = storage.get_conversation(conversation_id)
+        if conversation is None:
+            continue
+        for turn in storage.iter_turns(conversation):
+            _index_turn(turn)
+    return len(answer_index)
+
+
+# Keep the index current as new turns are written
+storage.on_assistant_message(_index_turn)
+
+
+async def find_similar_verdict(
+    user_query: str,
+    system_prompt: str = "",
+    threshold: float = ANSWER_CACHE_THRESHOLD,
+) -> Optional[Dict[str, Any]]:
+    """
+    Look up a previous council verdict for a near-duplicate question asked
+    under the same system prompt.
+
+    Returns:
+        Dict with 'conversation_id', 'message_index', 'similarity', 'query',
+        'stage1', 'stage2', 'stage3' and 'metadata', or None
+    """
+    for (conversation_id, message_index), score in answer_index.query(user_query, _prompt_namespace(system_prompt)):
+        if score < threshold:
+            break
+        conversation = await async_storage.get_conversation(conversation_id)
+        if conversation is None or message_index >= len(conversation["messages"]):
+            answer_index.remove((conversation_id, message_index))
+            continue
+        message = conversation["messages"][message_index]
+        return {
+            "conversation_id": conversation_id,
+            "message_index":   message_index,
+            "similarity":      round(score, 3),
+            "query":           conversation["messages"][message_index - 1]["content"],
+            "stage1":          message["stage1"],
+            "stage2":          message.get("stage2", []),
+            "stage3":          message["stage3"],
+            "metadata":        {
+                key: value for key, value in (message.get("metadata") or {}).items()
+                if key in ("label_to_model", "aggregate_rankings")
+            },
+        }
+    return None
@@ -0,0 +1,118 @@
+"""Single-flight coalescing: identical concurrent council runs share one execution."""
+
+import asyncio
+from typing import List, Dict, Any, Optional, AsyncIterator, Awaitable, Callable, Tuple
+
+EventCallback = Callable[[Dict[str, Any]], None]
+
+
+class Flight:
+    """
+    One in-flight run that any number of waiters can follow.
+
+    Every event the run publishes is kept, so a waiter that attaches late
+    first replays what it missed and then receives live events.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.events: List[Dict[str, Any]] = []
+        self.waiters = 0
+        self.task: Optional[asyncio.Task] = None
+        self._subscribers: List[asyncio.Queue] = []
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        self.events.append(event)
+        for queue in self._subscribers:
+            queue.put_nowait(event)
+
+    def _finish(self, _task: asyncio.Task) -> None:
+        for queue in self._subscribers:
+            queue.put_nowait(None)
+
+    async def follow(self) -> AsyncIterator[Dict[str, Any]]:
+        """Yield every event of the run (history first), until it finishes."""
+        queue: asyncio.Queue = asyncio.Queue()
+        history = list(self.events)
+        finished = self.task.done()
+        if not finished:
+            self._subscribers.append(queue)
+        try:
+            for event in history:
+                yield event
+            if finished:
+                return
+            while True:
+                event = await queue.get()
+                if event is None:
+                    return
+                yield event
+        finally:
+            if queue in self._subscribers:
+                self._subscribers.remove(queue)
+
+    async def result(self) -> Any:
+        """The run's result. A waiter giving up does not cancel the shared run."""
+        return await asyncio.shield(self.task)
+
+    def leave(self) -> bool:
+        """
+        Drop a waiter that no longer wants the result. The run is cancelled
+        once nobody is left waiting for it.
+
+        Returns:
+            True if this cancelled the run
+        """
+        self.waiters = max(self.waiters - 1, 0)
+        if self.waiters or self.task.done():
+            return False
+        self.task.cancel()
+        # Unlist it now: a caller arriving before the cancellation lands must
+        # start a fresh run rather than join one that is being torn down
+        self._unlist()
+        _counters["cancelled"] += 1
+        return True
+
+    def _unlist(self, _task: Optional[asyncio.Task] = None) -> None:
+        if _flights.get(self.key) is self:
+            del _flights[self.key]
+
+
+_flights: Dict[str, Flight] = {}
+
+_counters: Dict[str, int] = {
+    "started":   0,
+    "coalesced": 0,
+    "cancelled": 0,
+}
+
+
+def join_flight(key: str, start: Callable[[EventCallback], Awaitable[Any]]) -> Tuple[Flight, bool]:
+    """
+    Attach to the in-flight run for key, or start one with start(publish).
+
+    Returns:
+        Tuple of (flight, True if this caller started it)
+    """
+    flight = _flights.get(key)
+    if flight is not None:
+        flight.waiters += 1
+        _counters["coalesced"] += 1
+        return flight, False
+
+    flight = Flight(key)
+    flight.waiters = 1
+    flight.task = asyncio.ensure_future(start(flight.publish))
+    flight.task.add_done_callback(flight._finish)
+    flight.task.add_done_callback(flight._unlist)
+    _flights[key] = flight
+    _counters["started"] += 1
+    return flight, True
+
+
+def get_flight_stats() -> Dict[str, Any]:
+    return {
+        **_counters,
+        "in_flight": len(_flights),
+        "waiters":   sum(flight.waiters for flight in _flights.values()),
+    }
@@ -0,0 +1,316 @@
+"""SQLite (WAL mode) conversation store: conversations, messages and stage payloads in separate tables."""
+
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from .storage import ConversationStore, fsync_wanted, split_cursor
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id              TEXT PRIMARY KEY,
+    created_at      TEXT NOT NULL,
+    title           TEXT NOT NULL,
+    system_prompt   TEXT NOT NULL DEFAULT '',
+    context_summary TEXT,
+    message_count   INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS conversations_created_at ON conversations (created_at);
+CREATE INDEX IF NOT EXISTS conversations_title ON conversations (title);
+
+CREATE TABLE IF NOT EXISTS messages (
+    conversation_id TEXT NOT NULL REFERENCES conversations (id) ON DELETE CASCADE,
+    idx             INTEGER NOT NULL,
+    role            TEXT NOT NULL,
+    content         TEXT,
+    metadata        TEXT,
+    PRIMARY KEY (conversation_id, idx)
+);
+
+CREATE TABLE IF NOT EXISTS stages (
+    conversation_id TEXT NOT NULL,
+    idx             INTEGER NOT NULL,
+    stage           TEXT NOT NULL,
+    payload         TEXT NOT NULL,
+    PRIMARY KEY (conversation_id, idx, stage),
+    FOREIGN KEY (conversation_id, idx) REFERENCES messages (conversation_id, idx) ON DELETE CASCADE
+);
+"""
+
+# Message keys kept in the stages table, in the order they are rebuilt
+_STAGES = ("stage1", "stage2", "stage3")
+
+# WAL file layout: a 32-byte header (page size at 8, salts at 16), then
+# frames of a 24-byte header (salts at 8) and one page each
+_WAL_HEADER = 32
+_WAL_FRAME_HEADER = 24
+
+
+class SqliteStore(ConversationStore):
+    """
+    Conversations in one SQLite database in WAL mode. Writes share one
+    connection serialized with a lock, one transaction each; reads (the
+    sidebar list, context building) use a connection per thread, so under
+    WAL they do not wait on writes.
+    Writes that STORAGE_FSYNC wants durable run with synchronous=FULL (one
+    WAL fsync per commit), the rest with NORMAL (OFF when fsync is off).
+    Write amplification is WAL bytes written per byte of message content.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript(_SCHEMA)
+        self._synchronous = ""
+        self._readers = threading.local()
+        self._counters: Dict[str, int] = {
+            "transactions":      0,
+            "turn_commits":      0,
+            "fsyncs":            0,
+            "logical_bytes":     0,
+            "wal_bytes_written": 0,
+        }
+        self._wal_salt = b""
+        self._wal_end = _WAL_HEADER
+        self._wal_appended()  # frames already in the WAL are not ours
+
+    def _reader(self) -> sqlite3.Connection:
+        """This thread's read-only connection (autocommit; reads needing a snapshot open their own transaction)."""
+        db = getattr(self._readers, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA query_only=ON")
+            self._readers.db = db
+        return db
+
+    def _durability(self, kind: str) -> None:
+        """Set synchronous for the next transaction (outside one; the caller holds the lock)."""
+        if fsync_wanted(kind):
+            mode = "FULL"
+        else:
+            mode = "NORMAL" if fsync_wanted("turn") else "OFF"
+        if mode != self._synchronous:
+            self._db.execute(f"PRAGMA synchronous={mode}")
+            self._synchronous = mode
+
+    def _wal_appended(self) -> int:
+        """Bytes of WAL frames written since the last call (the caller holds the lock)."""
+        try:
+            wal = open(f"{self.path}-wal", "rb")
+        except FileNotFoundError:
+            return 0
+        with wal:
+            header = wal.read(_WAL_HEADER)
+            if len(header) < _WAL_HEADER:
+                return 0
+            frame_size = _WAL_FRAME_HEADER + int.from_bytes(header[8:12], "big")
+            salt = header[16:24]
+            # A checkpointed WAL restarts from the top with new salts; frames
+            # left over from the previous generation keep the old ones
+            start = self._wal_end if salt == self._wal_salt else _WAL_HEADER
+            end = start
+            while True:
+                wal.seek(end)
+                frame = wal.read(_WAL_FRAME_HEADER)
+                if len(frame) < _WAL_FRAME_HEADER or frame[8:16] != salt:
+                    break
+                end += frame_size
+        self._wal_salt, self._wal_end = salt, end
+        return end - start
+
+    def _committed(self) -> None:
+        """Count a committed write transaction (the caller holds the lock)."""
+        self._counters["transactions"] += 1
+        if self._synchronous == "FULL":
+            self._counters["fsyncs"] += 1
+        self._counters["wal_bytes_written"] += self._wal_appended()
+
+    def _insert_message(self, conversation_id: str, index: int, message: Dict[str, Any]) -> None:
+        metadata = json.dumps(message["metadata"]) if message.get("metadata") is not None else None
+        stages = [(conversation_id, index, stage, json.dumps(message[stage])) for stage in _STAGES if stage in message]
+        self._db.execute(
+            "INSERT INTO messages (conversation_id, idx, role, content, metadata) VALUES (?, ?, ?, ?, ?)",
+            (conversation_id, index, message["role"], message.get("content"), metadata),
+        )
+        self._db.executemany("INSERT INTO stages (conversation_id, idx, stage, payload) VALUES (?, ?, ?, ?)", stages)
+        self._counters["logical_bytes"] += (
+            len(message.get("content") or "") + len(metadata or "") + sum(len(row[3]) for row in stages)
+        )
+
+    def _write_conversation(self, conversation: Dict[str, Any]) -> None:
+        summary = conversation.get("context_summary")
+        self._db.execute(
+            "INSERT INTO conversations (id, created_at, title, system_prompt, context_summary, message_count) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET created_at = excluded.created_at, title = excluded.title, "
+            "system_prompt = excluded.system_prompt, context_summary = excluded.context_summary, "
+            "message_count = excluded.message_count",
+            (
+                conversation["id"], conversation["created_at"], conversation.get("title", "New Conversation"),
+                conversation.get("system_prompt", ""),
+                json.dumps(summary) if summary is not None else None,
+                len(conversation["messages"]),
+            ),
+        )
+        self._db.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation["id"],))
+        for index, message in enumerate(conversation["messages"]):
+            self._insert_message(conversation["id"], index, message)
+
+    def create(self, conversation: Dict[str, Any]) -> None:
+        self.save(conversation)
+
+    def save(self, conversation: Dict[str, Any]) -> None:
+        with self._lock:
+            self._durability("snapshot")
+            with self._db:
+                self._write_conversation(conversation)
+            self._committed()
+
+    def load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        db = self._reader()
+        # One read transaction, so the three queries see the same commit
+        db.execute("BEGIN")
+        try:
+            row = db.execute("SELECT * FROM conversations WHERE id = ?", (conversation_id,)).fetchone()
+            if row is None:
+                return None
+            message_rows = db.execute(
+                "SELECT idx, role, content, metadata FROM messages WHERE conversation_id = ? ORDER BY idx",
+                (conversation_id,),
+            ).fetchall()
+            stage_rows = db.execute(
+                "SELECT idx, stage, payload FROM stages WHERE conversation_id = ?", (conversation_id,)
+            ).fetchall()
+        finally:
+            db.execute("COMMIT")
+
+        stages: Dict[int, Dict[str, Any]] = {}
+        for stage_row in stage_rows:
+            stages.setdefault(stage_row["idx"], {})[stage_row["stage"]] = json.loads(stage_row["payload"])
+
+        messages = []
+        for message_row in message_rows:
+            message: Dict[str, Any] = {"role": message_row["role"]}
+            if message_row["content"] is not None:
+                message["content"] = message_row["content"]
+            payloads = stages.get(message_row["idx"], {})
+            for stage in _STAGES:
+                if stage in payloads:
+                    message[stage] = payloads[stage]
+            if message_row["metadata"] is not None:
+                message["metadata"] = json.loads(message_row["metadata"])
+            messages.append(message)
+
+        conversation = {
+            "id":            row["id"],
+            "created_at":    row["created_at"],
+            "title":         row["title"],
+            "system_prompt": row["system_prompt"],
+            "messages":      messages,
+        }
+        if row["context_summary"] is not None:
+            conversation["context_summary"] = json.loads(row["context_summary"])
+        return conversation
+
+    def _append(
+        self, conversation_id: str, messages: List[Dict[str, Any]], title: Optional[str], kind: str
+    ) -> Dict[str, Any]:
+        with self._lock:
+            self._durability(kind)
+            with self._db:
+                row = self._db.execute(
+                    "SELECT message_count, system_prompt FROM conversations WHERE id = ?", (conversation_id,)
+                ).fetchone()
+                if row is None:
+                    raise ValueError(f"Conversation {conversation_id} not found")
+                first = row["message_count"]
+                if len(messages) > 1:
+                    previous = messages[-2]
+                else:
+                    found = self._db.execute(
+                        "SELECT role, content FROM messages WHERE conversation_id = ? AND idx = ?",
+                        (conversation_id, first - 1),
+                    ).fetchone()
+                    previous = dict(found) if found is not None else {}
+                for offset, message in enumerate(messages):
+                    self._insert_message(conversation_id, first + offset, message)
+                self._db.execute(
+                    "UPDATE conversations SET message_count = ?, title = COALESCE(?, title) WHERE id = ?",
+                    (first + len(messages), title, conversation_id),
+                )
+            self._committed()
+        return {
+            "message_index": first + len(messages) - 1,
+            "system_prompt": row["system_prompt"],
+            "question":      previous.get("content") if previous.get("role") == "user" else None,
+        }
+
+    def append_message(self, conversation_id: str, message: Dict[str, Any]) -> Dict[str, Any]:
+        return self._append(conversation_id, [message], None, "other")
+
+    def commit(self, conversation_id: str, messages: List[Dict[str, Any]], title: Optional[str] = None) -> Dict[str, Any]:
+        position = self._append(conversation_id, messages, title, "turn")
+        self._counters["turn_commits"] += 1
+        return position
+
+    def _update(self, conversation_id: str, column: str, value: Any) -> None:
+        with self._lock:
+            self._durability("other")
+            with self._db:
+                cursor = self._db.execute(
+                    f"UPDATE conversations SET {column} = ? WHERE id = ?", (value, conversation_id)
+                )
+                if cursor.rowcount == 0:
+                    raise ValueError(f"Conversation {conversation_id} not found")
+            self._committed()
+
+    def set_title(self, conversation_id: str, title: str) -> None:
+        self._update(conversation_id, "title", title)
+
+    def set_context_summary(self, conversation_id: str, summary: Dict[str, Any]) -> None:
+        self._update(conversation_id, "context_summary", json.dumps(summary))
+
+    def list_ids(self) -> List[str]:
+        return [row["id"] for row in self._reader().execute("SELECT id FROM conversations")]
+
+    def list_metadata(self, limit: Optional[int] = None, before: Optional[str] = None) -> List[Dict[str, Any]]:
+        query = "SELECT id, created_at, title, message_count FROM conversations"
+        params: List[Any] = []
+        if before is not None:
+            created_at, conversation_id = split_cursor(before)
+            query += " WHERE created_at < ? OR (created_at = ? AND id < ?)"
+            params += [created_at, created_at, conversation_id]
+        query += " ORDER BY created_at DESC, id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [dict(row) for row in self._reader().execute(query, params).fetchall()]
+
+    def stats(self) -> Dict[str, Any]:
+        count = self._reader().execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+        def size(path: str) -> int:
+            return os.path.getsize(path) if os.path.exists(path) else 0
+
+        counters = dict(self._counters)
+        return {
+            **counters,
+            "write_amplification": (
+                round(counters["wal_bytes_written"] / counters["logical_bytes"], 2) if counters["logical_bytes"] else None
+            ),
+            "path":          self.path,
+            "conversations": count,
+            "db_bytes":      size(self.path),
+            "wal_bytes":     size(f"{self.path}-wal"),
+        }
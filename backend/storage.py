@@ -1,11 +1,34 @@
-"""JSON-based storage for conversations."""
+"""Storage for conversations (JSON snapshot + change log, or SQLite), batches and jobs."""
 
+import functools
 import json
 import os
+import threading
+import time
+import weakref
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Iterator, Tuple
 from pathlib import Path
-from .config import DATA_DIR
+from .config import (
+    DATA_DIR,
+    STORAGE_BACKEND,
+    STORAGE_COMPACT_RECORDS,
+    STORAGE_FSYNC,
+    STORAGE_INDEX_FLUSH_INTERVAL,
+    STORAGE_SQLITE_PATH,
+)
+
+
+# Called with a turn dict (see iter_turns) after an assistant turn is saved
+_turn_listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+
+def on_assistant_message(listener: Callable[[Dict[str, Any]], None]):
+    """Register a callback run with the new turn after every add_assistant_message / commit_turn write."""
+    _turn_listeners.append(listener)
 
 
 def ensure_data_dir():
@@ -14,10 +37,665 @@ def ensure_data_dir():
 
 
 def get_conversation_path(conversation_id: str) -> str:
-    """Get the file path for a conversation."""
+    """Get the file path for a conversation's snapshot."""
     return os.path.join(DATA_DIR, f"{conversation_id}.json")
 
 
+def get_log_path(conversation_id: str) -> str:
+    """Get the file path for a conversation's append-only change log."""
+    return os.path.join(DATA_DIR, f"{conversation_id}.log.jsonl")
+
+
+def get_index_path() -> str:
+    """Get the file path for the conversation metadata index."""
+    return os.path.join(DATA_DIR, ".conversations_index.json")
+
+
+def page_cursor(entry: Dict[str, Any]) -> str:
+    """Paging cursor that resumes right after this entry: "<created_at>|<id>"."""
+    return f"{entry['created_at']}|{entry['id']}"
+
+
+def split_cursor(before: str) -> Tuple[str, str]:
+    """
+    (created_at, id) of a paging cursor. A bare created_at timestamp is
+    accepted too and skips every entry created at that instant.
+    """
+    created_at, _, conversation_id = before.partition("|")
+    return created_at, conversation_id
+
+
+def _page(entries: List[Dict[str, Any]], limit: Optional[int], before: Optional[str]) -> List[Dict[str, Any]]:
+    """Entries (newest first) ordered strictly after the `before` cursor, at most `limit` of them."""
+    if before is not None:
+        cursor = split_cursor(before)
+        entries = [entry for entry in entries if (entry["created_at"], entry["id"]) < cursor]
+    return entries[:limit] if limit is not None else entries
+
+
+#  Durable writes
+
+def fsync_wanted(kind: str) -> bool:
+    """
+    Whether STORAGE_FSYNC asks for an fsync after a write of this kind:
+    'turn' (a committed turn), 'snapshot' (a replaced conversation file) or
+    'other' (single messages, titles, summaries, indexes, batches, jobs).
+    """
+    if STORAGE_FSYNC == "always":
+        return True
+    if STORAGE_FSYNC == "turn":
+        return kind in ("turn", "snapshot")
+    return False
+
+
+def _fsync_dir(path: str) -> None:
+    """Make a rename into the file's directory durable."""
+    try:
+        fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    except OSError:
+        return  # not supported here (e.g. Windows)
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_atomic(path: str, data: str, kind: str = "other") -> int:
+    """
+    Replace a file with `data`: written to a temp file, renamed over the
+    target, so readers and crashes see the old or the new content, never a
+    truncated mix. Fsynced according to STORAGE_FSYNC.
+
+    Returns:
+        Bytes written
+    """
+    fsync = fsync_wanted(kind)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+    if fsync:
+        _fsync_dir(path)
+    return len(data)
+
+
+#  Conversation stores
+
+class ConversationStore(ABC):
+    """
+    Where conversations live. The module-level conversation functions
+    delegate to one store, picked by STORAGE_BACKEND. Methods taking a
+    conversation id raise ValueError for an unknown conversation.
+    """
+
+    name = ""
+
+    @abstractmethod
+    def create(self, conversation: Dict[str, Any]) -> None:
+        """Store a new conversation dict."""
+
+    @abstractmethod
+    def load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """The full conversation dict, or None if not found."""
+
+    @abstractmethod
+    def save(self, conversation: Dict[str, Any]) -> None:
+        """Replace a whole conversation."""
+
+    @abstractmethod
+    def append_message(self, conversation_id: str, message: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Append one message.
+
+        Returns:
+            Dict with the new message's 'message_index', the conversation's
+            'system_prompt' and 'question' (the content of the message before
+            it if that is a user message, else None)
+        """
+
+    @abstractmethod
+    def commit(self, conversation_id: str, messages: List[Dict[str, Any]], title: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Append several messages (and optionally set the title) as one atomic
+        write: after a crash either all of it is stored or none.
+
+        Returns:
+            As append_message, for the last message
+        """
+
+    @abstractmethod
+    def set_title(self, conversation_id: str, title: str) -> None:
+        ...
+
+    @abstractmethod
+    def set_context_summary(self, conversation_id: str, summary: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    def list_ids(self) -> List[str]:
+        ...
+
+    @abstractmethod
+    def list_metadata(self, limit: Optional[int] = None, before: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        'id', 'created_at', 'title' and 'message_count' of the conversations
+        after the `before` cursor (all if None; see page_cursor), newest
+        first, at most `limit` of them.
+        """
+
+    def flush(self) -> None:
+        """Persist anything held back in memory (called on shutdown)."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+def _per_conversation(method):
+    """
+    Run a store method under the lock of the conversation it touches (its
+    first argument: an id or a conversation dict). Stores are called from
+    the I/O thread pool; different conversations proceed in parallel.
+    """
+    @functools.wraps(method)
+    def wrapper(self, target, *args, **kwargs):
+        conversation_id = target["id"] if isinstance(target, dict) else target
+        with self._conversation_lock(conversation_id):
+            return method(self, target, *args, **kwargs)
+    return wrapper
+
+
+#  Metadata index
+
+class MetadataIndex:
+    """
+    The sidebar's view of every conversation (id, created_at, title,
+    message_count), kept in memory, updated on every write and persisted to
+    a small JSON file at most every `flush_interval` seconds.
+
+    Each entry carries a fingerprint of the conversation's files (snapshot
+    mtime and size, log size). On load every fingerprint is checked with a
+    stat, and only conversations whose files changed since the last flush
+    (or that are new) are re-read, so a stale or missing index repairs
+    itself without a full scan.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: str, flush_interval: float = STORAGE_INDEX_FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._order: Optional[List[Dict[str, Any]]] = None
+        self._dirty = False
+        self._last_flush = 0.0
+        self._counters: Dict[str, int] = {"flushes": 0, "resynced": 0, "rebuilds": 0, "bytes": 0}
+
+    def load(self) -> bool:
+        """Read the persisted entries. Returns False if there are none or they are unreadable."""
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if data.get("version") != self.VERSION:
+                return False
+            self.entries = {entry["id"]: entry for entry in data["entries"]}
+            return True
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+
+    def put(self, entry: Dict[str, Any]) -> None:
+        previous = self.entries.get(entry["id"])
+        if previous is None or previous["created_at"] != entry["created_at"]:
+            self._order = None
+        self.entries[entry["id"]] = entry
+        self._dirty = True
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def discard(self, conversation_id: str) -> None:
+        if self.entries.pop(conversation_id, None) is not None:
+            self._order = None
+            self._dirty = True
+
+    def flush(self) -> None:
+        if not self._dirty:
+            return
+        ensure_data_dir()
+        data = json.dumps({"version": self.VERSION, "entries": list(self.entries.values())})
+        self._counters["bytes"] += _write_atomic(self.path, data)
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self._counters["flushes"] += 1
+
+    def page(self, limit: Optional[int] = None, before: Optional[str] = None) -> List[Dict[str, Any]]:
+        if self._order is None:
+            self._order = sorted(self.entries.values(), key=lambda e: (e["created_at"], e["id"]), reverse=True)
+        return [
+            {key: entry[key] for key in ("id", "created_at", "title", "message_count")}
+            for entry in _page(self._order, limit, before)
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._counters, "entries": len(self.entries), "dirty": self._dirty}
+
+
+class JsonLogStore(ConversationStore):
+    """
+    One JSON snapshot per conversation ({id}.json) plus an append-only
+    change log ({id}.log.jsonl) that reads fold in. Each log line is a
+    record with a CRC32 of its JSON, so a line torn by a crash is detected;
+    after STORAGE_COMPACT_RECORDS records the log is folded into a new
+    snapshot.
+
+    Locking: reads and writes of one conversation are serialized by its own
+    lock; `_lock` only guards the shared bookkeeping (heads, index,
+    counters) and is never held while taking a conversation lock.
+    """
+
+    name = "json"
+
+    def __init__(self, compact_after: int = STORAGE_COMPACT_RECORDS, max_heads: int = 1024):
+        self.compact_after = compact_after
+        self.max_heads = max_heads
+        # Per-conversation bookkeeping for O(1) appends: last log seq, snapshot seq,
+        # message count, system prompt, the latest user message and the last role
+        self._heads: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._counters: Dict[str, int] = {
+            "appends":        0,
+            "turn_commits":   0,
+            "compactions":    0,
+            "torn_tails":     0,
+            "fsyncs":         0,
+            "logical_bytes":  0,
+            "log_bytes":      0,
+            "snapshot_bytes": 0,
+        }
+        # Loaded (and checked against the files) on the first listing
+        self._index: Optional[MetadataIndex] = None
+        self._lock = threading.RLock()
+        self._index_build_lock = threading.Lock()
+        self._conversation_locks: "weakref.WeakValueDictionary[str, Any]" = weakref.WeakValueDictionary()
+
+    def _conversation_lock(self, conversation_id: str):
+        with self._lock:
+            lock = self._conversation_locks.get(conversation_id)
+            if lock is None:
+                lock = threading.RLock()
+                self._conversation_locks[conversation_id] = lock
+            return lock
+
+    def _count(self, **deltas: int) -> None:
+        with self._lock:
+            for key, delta in deltas.items():
+                self._counters[key] += delta
+
+    @staticmethod
+    def _encode(record: Dict[str, Any]) -> Tuple[str, int]:
+        """
+        One log line: the record plus a CRC32 of its JSON, so torn or garbled
+        lines are detected. Returns the line and the size of the record's JSON.
+        """
+        body = json.dumps(record, sort_keys=True)
+        return f'{{"crc": {zlib.crc32(body.encode("utf-8"))}, "record": {body}}}\n', len(body)
+
+    @staticmethod
+    def _decode(line: str) -> Optional[Dict[str, Any]]:
+        if not line.endswith("\n"):
+            return None
+        try:
+            entry = json.loads(line)
+            record = entry["record"]
+            if zlib.crc32(json.dumps(record, sort_keys=True).encode("utf-8")) != entry["crc"]:
+                return None
+            return record
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def _read_log(self, conversation_id: str) -> List[Dict[str, Any]]:
+        """
+        Every intact record of a conversation's log. The first bad line and
+        everything after it (a write cut short by a crash) are cut off the
+        file, so later appends start on a clean line.
+        """
+        path = get_log_path(conversation_id)
+        if not os.path.exists(path):
+            return []
+
+        records = []
+        good = 0
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            for line in f:
+                record = self._decode(line)
+                if record is None:
+                    break
+                records.append(record)
+                good += len(line.encode("utf-8"))
+
+        if good < os.path.getsize(path):
+            print(f"Storage: torn tail in {path}, keeping {len(records)} records")
+            self._count(torn_tails=1)
+            with open(path, 'r+b') as f:
+                f.truncate(good)
+        return records
+
+    @staticmethod
+    def _apply(conversation: Dict[str, Any], record: Dict[str, Any]) -> None:
+        """Fold one log record into a conversation dict."""
+        op = record["op"]
+        if op == "message":
+            conversation["messages"].append(record["message"])
+        elif op == "turn":
+            conversation["messages"].extend(record["messages"])
+            if record.get("title") is not None:
+                conversation["title"] = record["title"]
+        elif op == "title":
+            conversation["title"] = record["title"]
+        elif op == "context_summary":
+            conversation["context_summary"] = record["summary"]
+
+    def _remember(self, conversation: Dict[str, Any], seq: int, snapshot_seq: int) -> Dict[str, Any]:
+        user_messages = [m for m in conversation["messages"] if m.get("role") == "user"]
+        head = {
+            "seq":           seq,
+            "snapshot_seq":  snapshot_seq,
+            "message_count": len(conversation["messages"]),
+            "system_prompt": conversation.get("system_prompt", ""),
+            "last_user":     user_messages[-1]["content"] if user_messages else None,
+            "last_role":     conversation["messages"][-1].get("role") if conversation["messages"] else None,
+        }
+        with self._lock:
+            self._heads[conversation["id"]] = head
+            self._heads.move_to_end(conversation["id"])
+            while len(self._heads) > self.max_heads:
+                self._heads.popitem(last=False)
+        return head
+
+    def _load(self, conversation_id: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        path = get_conversation_path(conversation_id)
+
+        if not os.path.exists(path):
+            return None
+
+        with open(path, 'r') as f:
+            conversation = json.load(f)
+
+        snapshot_seq = conversation.pop("log_seq", 0)
+        seq = snapshot_seq
+        for record in self._read_log(conversation_id):
+            if record["seq"] <= snapshot_seq:
+                continue  # compacted, but the log was not removed before a crash
+            self._apply(conversation, record)
+            seq = record["seq"]
+
+        return conversation, self._remember(conversation, seq, snapshot_seq)
+
+    @_per_conversation
+    def load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Snapshot with the log folded in (records the snapshot already covers are skipped)."""
+        loaded = self._load(conversation_id)
+        return loaded[0] if loaded else None
+
+    def _head(self, conversation_id: str) -> Dict[str, Any]:
+        """The conversation's head; the caller holds the conversation's lock."""
+        with self._lock:
+            head = self._heads.get(conversation_id)
+            if head is not None:
+                self._heads.move_to_end(conversation_id)
+        if head is None:
+            loaded = self._load(conversation_id)
+            if loaded is None:
+                raise ValueError(f"Conversation {conversation_id} not found")
+            head = loaded[1]
+        return head
+
+    def _write_snapshot(self, conversation: Dict[str, Any], seq: int):
+        """Atomically replace the snapshot (write a temp file, then rename over it)."""
+        ensure_data_dir()
+
+        data = json.dumps({**conversation, "log_seq": seq}, indent=2)
+        written = _write_atomic(get_conversation_path(conversation['id']), data, "snapshot")
+        self._count(snapshot_bytes=written, fsyncs=int(fsync_wanted("snapshot")))
+
+    def _append(self, conversation_id: str, op: str, kind: str = "other", **fields: Any) -> Dict[str, Any]:
+        """
+        Append one record to the conversation's log, compacting once the log
+        holds `compact_after` records. The caller holds the conversation's lock.
+
+        Returns:
+            The conversation's head after the append
+        """
+        head = self._head(conversation_id)
+        record = {"seq": head["seq"] + 1, "op": op, **fields}
+        line, logical = self._encode(record)
+        fsync = fsync_wanted(kind)
+        with open(get_log_path(conversation_id), 'a', encoding='utf-8') as f:
+            f.write(line)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        head["seq"] = record["seq"]
+        self._count(appends=1, logical_bytes=logical, log_bytes=len(line), fsyncs=int(fsync))
+
+        for message in fields.get("messages") or ([fields["message"]] if "message" in fields else []):
+            head["message_count"] += 1
+            head["last_role"] = message.get("role")
+            if message.get("role") == "user":
+                head["last_user"] = message["content"]
+
+        if head["seq"] - head["snapshot_seq"] >= self.compact_after:
+            head = self.compact(conversation_id)
+
+        with self._lock:
+            entry = self._index.entries.get(conversation_id) if self._index is not None else None
+            if entry is not None:
+                changes = {"fingerprint": self._fingerprint(conversation_id), "message_count": head["message_count"]}
+                if fields.get("title") is not None:
+                    changes["title"] = fields["title"]
+                self._index.put({**entry, **changes})
+        return head
+
+    @_per_conversation
+    def compact(self, conversation_id: str) -> Dict[str, Any]:
+        """
+        Fold the log into a new snapshot and drop the log. The snapshot records
+        the last seq it covers, so a crash between the two steps is harmless.
+
+        Returns:
+            The conversation's head
+        """
+        loaded = self._load(conversation_id)
+        if loaded is None:
+            raise ValueError(f"Conversation {conversation_id} not found")
+        conversation, head = loaded
+
+        self._write_snapshot(conversation, head["seq"])
+        log_path = get_log_path(conversation_id)
+        if os.path.exists(log_path):
+            os.remove(log_path)
+        head["snapshot_seq"] = head["seq"]
+        self._count(compactions=1)
+        return head
+
+    @staticmethod
+    def _fingerprint(conversation_id: str) -> List[int]:
+        """Snapshot mtime and size plus log size: changes whenever the conversation is written."""
+        try:
+            snapshot = os.stat(get_conversation_path(conversation_id))
+        except FileNotFoundError:
+            return []
+        try:
+            log_size = os.stat(get_log_path(conversation_id)).st_size
+        except FileNotFoundError:
+            log_size = 0
+        return [snapshot.st_mtime_ns, snapshot.st_size, log_size]
+
+    def _index_entry(self, conversation: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": conversation["id"],
+            "created_at": conversation["created_at"],
+            "title": conversation.get("title", "New Conversation"),
+            "message_count": len(conversation["messages"]),
+            "fingerprint": self._fingerprint(conversation["id"]),
+        }
+
+    def _reindex(self, conversation: Dict[str, Any]) -> None:
+        with self._lock:
+            if self._index is not None:
+                self._index.put(self._index_entry(conversation))
+
+    def _resync(self, index: MetadataIndex, ids: List[str], check_fingerprints: bool) -> None:
+        """Drop entries without files and re-read conversations missing from the index (or changed)."""
+        with self._lock:
+            for conversation_id in set(index.entries) - set(ids):
+                index.discard(conversation_id)
+            stale = [
+                conversation_id for conversation_id in ids
+                if conversation_id not in index.entries or (
+                    check_fingerprints
+                    and index.entries[conversation_id].get("fingerprint") != self._fingerprint(conversation_id)
+                )
+            ]
+        for conversation_id in stale:
+            conversation = self.load(conversation_id)
+            if conversation is None:
+                continue
+            with self._lock:
+                index.put(self._index_entry(conversation))
+                index._counters["resynced"] += 1
+
+    def _metadata_index(self) -> MetadataIndex:
+        """
+        The metadata index. On first use it is loaded and every entry checked
+        against its files; after that each listing only compares the ids with
+        the directory, to pick up conversations added or removed behind the
+        store's back.
+        """
+        with self._index_build_lock:
+            ids = self.list_ids()
+            if self._index is None:
+                index = MetadataIndex(get_index_path())
+                if not index.load():
+                    index._counters["rebuilds"] += 1
+                self._resync(index, ids, check_fingerprints=True)
+                with self._lock:
+                    index.flush()
+                    self._index = index
+            elif len(ids) != len(self._index.entries) or not all(i in self._index.entries for i in ids):
+                self._resync(self._index, ids, check_fingerprints=False)
+            return self._index
+
+    @_per_conversation
+    def create(self, conversation: Dict[str, Any]) -> None:
+        self._write_snapshot(conversation, 0)
+        self._remember(conversation, 0, 0)
+        self._reindex(conversation)
+
+    @_per_conversation
+    def save(self, conversation: Dict[str, Any]) -> None:
+        with self._lock:
+            head = self._heads.get(conversation['id'])
+        seq = head["seq"] if head else 0
+        self._write_snapshot(conversation, seq)
+        log_path = get_log_path(conversation['id'])
+        if os.path.exists(log_path):
+            os.remove(log_path)
+        self._remember(conversation, seq, seq)
+        self._reindex(conversation)
+
+    def _position(self, head: Dict[str, Any], answers_user: bool) -> Dict[str, Any]:
+        return {
+            "message_index": head["message_count"] - 1,
+            "system_prompt": head["system_prompt"],
+            "question":      head["last_user"] if answers_user else None,
+        }
+
+    @_per_conversation
+    def append_message(self, conversation_id: str, message: Dict[str, Any]) -> Dict[str, Any]:
+        answers_user = self._head(conversation_id)["last_role"] == "user"
+        return self._position(self._append(conversation_id, "message", message=message), answers_user)
+
+    @_per_conversation
+    def commit(self, conversation_id: str, messages: List[Dict[str, Any]], title: Optional[str] = None) -> Dict[str, Any]:
+        previous_role = messages[-2].get("role") if len(messages) > 1 else self._head(conversation_id)["last_role"]
+        fields: Dict[str, Any] = {"messages": messages}
+        if title is not None:
+            fields["title"] = title
+        head = self._append(conversation_id, "turn", "turn", **fields)
+        self._count(turn_commits=1)
+        return self._position(head, previous_role == "user")
+
+    @_per_conversation
+    def set_title(self, conversation_id: str, title: str) -> None:
+        self._append(conversation_id, "title", title=title)
+
+    @_per_conversation
+    def set_context_summary(self, conversation_id: str, summary: Dict[str, Any]) -> None:
+        self._append(conversation_id, "context_summary", summary=summary)
+
+    def list_ids(self) -> List[str]:
+        ensure_data_dir()
+        return [
+            filename[:-5] for filename in os.listdir(DATA_DIR)
+            if filename.endswith('.json') and not filename.startswith('.')
+        ]
+
+    def list_metadata(self, limit: Optional[int] = None, before: Optional[str] = None) -> List[Dict[str, Any]]:
+        index = self._metadata_index()
+        with self._lock:
+            return index.page(limit, before)
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._index is not None:
+                self._index.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            index = self._index.stats() if self._index is not None else None
+        physical = counters["log_bytes"] + counters["snapshot_bytes"] + (index["bytes"] if index else 0)
+        return {
+            **counters,
+            "write_amplification": round(physical / counters["logical_bytes"], 2) if counters["logical_bytes"] else None,
+            "cached_heads": len(self._heads),
+            "compact_after_records": self.compact_after,
+            "metadata_index": index,
+        }
+
+
+def open_store(backend: str = STORAGE_BACKEND) -> ConversationStore:
+    """A conversation store by STORAGE_BACKEND name ('json' or 'sqlite')."""
+    if backend == "sqlite":
+        from .sqlite_store import SqliteStore
+        return SqliteStore(STORAGE_SQLITE_PATH)
+    if backend != "json":
+        raise ValueError(f"Unknown storage backend: {backend}")
+    return JsonLogStore()
+
+
+_store = open_store()
+
+
+def get_storage_stats() -> Dict[str, Any]:
+    return {"backend": _store.name, **_store.stats()}
+
+
+def flush_storage():
+    """Persist anything the store holds back in memory."""
+    _store.flush()
+
+
+#  Conversations
+
+def list_conversation_ids() -> List[str]:
+    """Ids of every stored conversation."""
+    return _store.list_ids()
+
+
 def create_conversation(conversation_id: str, system_prompt: str = "") -> Dict[str, Any]:
     """
     Create a new conversation.
@@ -29,8 +707,6 @@ def create_conversation(conversation_id: str, system_prompt: str = "") -> Dict[s
     Returns:
         New conversation dict
     """
-    ensure_data_dir()
-
     conversation = {
         "id": conversation_id,
         "created_at": datetime.utcnow().isoformat(),
@@ -39,10 +715,7 @@ def create_conversation(conversation_id: str, system_prompt: str = "") -> Dict[s
         "messages": []
     }
 
-    # Save to file
-    path = get_conversation_path(conversation_id)
-    with open(path, 'w') as f:
-        json.dump(conversation, f, indent=2)
+    _store.create(conversation)
 
     return conversation
 
@@ -57,56 +730,62 @@ def get_conversation(conversation_id: str) -> Optional[Dict[str, Any]]:
     Returns:
         Conversation dict or None if not found
     """
-    path = get_conversation_path(conversation_id)
-
-    if not os.path.exists(path):
-        return None
-
-    with open(path, 'r') as f:
-        return json.load(f)
+    return _store.load(conversation_id)
 
 
 def save_conversation(conversation: Dict[str, Any]):
     """
-    Save a conversation to storage.
+    Save a whole conversation to storage, replacing what is stored.
 
     Args:
         conversation: Conversation dict to save
     """
-    ensure_data_dir()
-
-    path = get_conversation_path(conversation['id'])
-    with open(path, 'w') as f:
-        json.dump(conversation, f, indent=2)
+    _store.save(conversation)
 
 
-def list_conversations() -> List[Dict[str, Any]]:
+def list_conversations(limit: Optional[int] = None, before: Optional[str] = None) -> List[Dict[str, Any]]:
     """
-    List all conversations (metadata only).
+    List conversations (metadata only), newest first.
+
+    Args:
+        limit: Maximum number of conversations to return (None: all)
+        before: Only conversations after this cursor (see page_cursor)
 
     Returns:
         List of conversation metadata dicts
     """
-    ensure_data_dir()
+    return _store.list_metadata(limit, before)
 
-    conversations = []
-    for filename in os.listdir(DATA_DIR):
-        if filename.endswith('.json'):
-            path = os.path.join(DATA_DIR, filename)
-            with open(path, 'r') as f:
-                data = json.load(f)
-                # Return metadata only
-                conversations.append({
-                    "id": data["id"],
-                    "created_at": data["created_at"],
-                    "title": data.get("title", "New Conversation"),
-                    "message_count": len(data["messages"])
-                })
 
-    # Sort by creation time, newest first
-    conversations.sort(key=lambda x: x["created_at"], reverse=True)
+def _turn_view(
+    conversation_id: str,
+    system_prompt: str,
+    message_index: int,
+    question: Optional[str],
+    message: Dict[str, Any],
+) -> Dict[str, Any]:
+    return {
+        "conversation_id": conversation_id,
+        "system_prompt":   system_prompt,
+        "message_index":   message_index,
+        "question":        question,
+        "message":         message,
+    }
+
 
-    return conversations
+def iter_turns(conversation: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Every assistant turn that answers a user message, as the dicts passed to
+    on_assistant_message listeners: 'conversation_id', 'system_prompt',
+    'message_index', 'question' and the assistant 'message'.
+    """
+    messages = conversation["messages"]
+    for index, message in enumerate(messages):
+        if message.get("role") == "assistant" and index > 0 and messages[index - 1].get("role") == "user":
+            yield _turn_view(
+                conversation["id"], conversation.get("system_prompt", ""), index,
+                messages[index - 1]["content"], message,
+            )
 
 
 def add_user_message(conversation_id: str, content: str):
@@ -117,24 +796,20 @@ def add_user_message(conversation_id: str, content: str):
         conversation_id: Conversation identifier
         content: User message content
     """
-    conversation = get_conversation(conversation_id)
-    if conversation is None:
-        raise ValueError(f"Conversation {conversation_id} not found")
-
-    conversation["messages"].append({
+    _store.append_message(conversation_id, {
         "role": "user",
         "content": content
     })
 
-    save_conversation(conversation)
-
 
 def add_assistant_message(
     conversation_id: str,
     stage1: List[Dict[str, Any]],
     stage2: List[Dict[str, Any]],
-    stage3: Dict[str, Any]
-):
+    stage3: Optional[Dict[str, Any]],
+    metadata: Optional[Dict[str, Any]] = None,
+    notify: bool = True,
+) -> Optional[Dict[str, Any]]:
     """
     Add an assistant message with all 3 stages to a conversation.
 
@@ -142,20 +817,86 @@ def add_assistant_message(
         conversation_id: Conversation identifier
         stage1: List of individual model responses
         stage2: List of model rankings
-        stage3: Final synthesized response
+        stage3: Final synthesized response (None for a turn cancelled before it)
+        metadata: Optional turn metadata (rankings, members cut, ...)
+        notify: Run the on_assistant_message listeners (False: the caller
+            passes the returned turn to notify_turn itself)
+
+    Returns:
+        The turn dict (see iter_turns), or None if the message does not
+        answer a user message
+    """
+    message = _assistant_message(stage1, stage2, stage3, metadata)
+    position = _store.append_message(conversation_id, message)
+    return _stored_turn(conversation_id, position, message, notify)
+
+
+def commit_turn(
+    conversation_id: str,
+    content: str,
+    stage1: List[Dict[str, Any]],
+    stage2: List[Dict[str, Any]],
+    stage3: Optional[Dict[str, Any]],
+    metadata: Optional[Dict[str, Any]] = None,
+    title: Optional[str] = None,
+    notify: bool = True,
+) -> Optional[Dict[str, Any]]:
+    """
+    Store a whole turn (the user message, the assistant message and, for a
+    first turn, the title) as one atomic write.
+
+    Args:
+        conversation_id: Conversation identifier
+        content: User message content
+        stage1: List of individual model responses
+        stage2: List of model rankings
+        stage3: Final synthesized response (None for a turn cancelled before it)
+        metadata: Optional turn metadata
+        title: New conversation title, if the turn produced one
+        notify: As for add_assistant_message
+
+    Returns:
+        The turn dict (see iter_turns)
     """
-    conversation = get_conversation(conversation_id)
-    if conversation is None:
-        raise ValueError(f"Conversation {conversation_id} not found")
+    message = _assistant_message(stage1, stage2, stage3, metadata)
+    position = _store.commit(conversation_id, [{"role": "user", "content": content}, message], title)
+    return _stored_turn(conversation_id, position, message, notify)
 
-    conversation["messages"].append({
+
+def _assistant_message(
+    stage1: List[Dict[str, Any]],
+    stage2: List[Dict[str, Any]],
+    stage3: Optional[Dict[str, Any]],
+    metadata: Optional[Dict[str, Any]],
+) -> Dict[str, Any]:
+    message = {
         "role": "assistant",
         "stage1": stage1,
         "stage2": stage2,
         "stage3": stage3
-    })
+    }
+    if metadata:
+        message["metadata"] = metadata
+    return message
+
+
+def _stored_turn(
+    conversation_id: str, position: Dict[str, Any], message: Dict[str, Any], notify: bool
+) -> Optional[Dict[str, Any]]:
+    if position["question"] is None:
+        return None
+    turn = _turn_view(
+        conversation_id, position["system_prompt"], position["message_index"], position["question"], message
+    )
+    if notify:
+        notify_turn(turn)
+    return turn
+
 
-    save_conversation(conversation)
+def notify_turn(turn: Dict[str, Any]):
+    """Run the on_assistant_message listeners for a stored turn."""
+    for listener in _turn_listeners:
+        listener(turn)
 
 
 def update_conversation_title(conversation_id: str, title: str):
@@ -166,9 +907,272 @@ def update_conversation_title(conversation_id: str, title: str):
         conversation_id: Conversation identifier
         title: New title for the conversation
     """
-    conversation = get_conversation(conversation_id)
-    if conversation is None:
-        raise ValueError(f"Conversation {conversation_id} not found")
+    _store.set_title(conversation_id, title)
+
+
+def update_context_summary(conversation_id: str, summary: Dict[str, Any]):
+    """
+    Store the rolling summary of a conversation's older turns.
+
+    Args:
+        conversation_id: Conversation identifier
+        summary: Dict with the summary 'text' and the number of 'turns' it covers
+    """
+    _store.set_context_summary(conversation_id, summary)
+
+
+#  Batches and jobs
+
+# Items of a batch finish concurrently and append to its item log; one lock
+# per batch keeps their lines whole
+_batch_locks: "weakref.WeakValueDictionary[str, Any]" = weakref.WeakValueDictionary()
+_batch_locks_guard = threading.Lock()
+
+
+def _batch_lock(batch_id: str):
+    with _batch_locks_guard:
+        lock = _batch_locks.get(batch_id)
+        if lock is None:
+            lock = threading.Lock()
+            _batch_locks[batch_id] = lock
+        return lock
+
+
+def get_batch_path(batch_id: str) -> str:
+    """Get the file path for a batch run (its header: items and their initial status)."""
+    return os.path.join(DATA_DIR, "batches", f"{batch_id}.json")
+
+
+def get_batch_items_path(batch_id: str) -> str:
+    """Get the file path of a batch's item log (one JSON line per finished item)."""
+    return os.path.join(DATA_DIR, "batches", f"{batch_id}.items.ndjson")
+
+
+def create_batch(batch_id: str, items: List[Dict[str, str]], use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Create a batch run with every item pending.
+
+    Args:
+        batch_id: Unique identifier for the batch
+        items: List of dicts with 'query' and 'template_id'
+        use_cache: Whether the batch's council runs may use the response cache
+
+    Returns:
+        New batch dict
+    """
+    Path(DATA_DIR, "batches").mkdir(parents=True, exist_ok=True)
+
+    batch = {
+        "id": batch_id,
+        "created_at": datetime.utcnow().isoformat(),
+        "use_cache": use_cache,
+        "items": [
+            {
+                "query": item["query"],
+                "template_id": item["template_id"],
+                "status": "pending",
+            }
+            for item in items
+        ]
+    }
+
+    save_batch(batch)
+    return batch
+
+
+def get_batch(batch_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Load a batch run from storage: the header with every item's latest
+    outcome from the item log folded in.
+
+    Args:
+        batch_id: Unique identifier for the batch
+
+    Returns:
+        Batch dict or None if not found
+    """
+    path = get_batch_path(batch_id)
+
+    if not os.path.exists(path):
+        return None
 
-    conversation["title"] = title
-    save_conversation(conversation)
+    with open(path, 'r') as f:
+        batch = json.load(f)
+
+    items_path = get_batch_items_path(batch_id)
+    if os.path.exists(items_path):
+        with open(items_path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn by a crash: the item stays pending and reruns
+                item = batch["items"][record["index"]]
+                item["status"] = record["status"]
+                item["result"] = record.get("result")
+                if record.get("error") is not None:
+                    item["error"] = record["error"]
+                else:
+                    item.pop("error", None)
+    return batch
+
+
+def save_batch(batch: Dict[str, Any]):
+    """
+    Save a batch run to storage.
+
+    Args:
+        batch: Batch dict to save
+    """
+    Path(DATA_DIR, "batches").mkdir(parents=True, exist_ok=True)
+
+    _write_atomic(get_batch_path(batch['id']), json.dumps(batch, indent=2))
+
+
+def update_batch_item(
+    batch_id: str,
+    index: int,
+    status: str,
+    result: Optional[Dict[str, Any]] = None,
+    error: Optional[str] = None,
+):
+    """
+    Record the outcome of one batch item by appending it to the batch's
+    item log; the header and earlier results are not rewritten.
+
+    Args:
+        batch_id: Batch identifier
+        index: Position of the item in the batch
+        status: 'done' or 'error'
+        result: Council result (stage1, stage2, stage3, metadata) when done
+        error: Error message when the item failed
+    """
+    if not os.path.exists(get_batch_path(batch_id)):
+        raise ValueError(f"Batch {batch_id} not found")
+
+    record: Dict[str, Any] = {"index": index, "status": status, "result": result}
+    if error is not None:
+        record["error"] = error
+    line = json.dumps(record) + "\n"
+    path = get_batch_items_path(batch_id)
+    with _batch_lock(batch_id):
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    line = "\n" + line  # after a line torn by a crash
+        with open(path, 'a') as f:
+            f.write(line)
+            if fsync_wanted("other"):
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def get_job_dir(conversation_id: str) -> str:
+    """Get the directory holding a conversation's council jobs."""
+    return os.path.join(DATA_DIR, "jobs", conversation_id)
+
+
+def save_job(job: Dict[str, Any]):
+    """
+    Save a council job record (status and bookkeeping, not its events).
+
+    Args:
+        job: Job dict with at least 'id' and 'conversation_id'
+    """
+    job_dir = get_job_dir(job["conversation_id"])
+    Path(job_dir).mkdir(parents=True, exist_ok=True)
+
+    _write_atomic(os.path.join(job_dir, f"{job['id']}.json"), json.dumps(job, indent=2))
+
+
+def get_job(conversation_id: str, job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Load a council job record.
+
+    Args:
+        conversation_id: Conversation the job belongs to
+        job_id: Job identifier
+
+    Returns:
+        Job dict or None if not found
+    """
+    path = os.path.join(get_job_dir(conversation_id), f"{job_id}.json")
+
+    if not os.path.exists(path):
+        return None
+
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def list_jobs(conversation_id: str) -> List[Dict[str, Any]]:
+    """
+    List the job records of a conversation, newest first.
+
+    Args:
+        conversation_id: Conversation identifier
+
+    Returns:
+        List of job dicts
+    """
+    job_dir = get_job_dir(conversation_id)
+    if not os.path.isdir(job_dir):
+        return []
+
+    jobs = []
+    for filename in os.listdir(job_dir):
+        if filename.endswith('.json'):
+            with open(os.path.join(job_dir, filename), 'r') as f:
+                jobs.append(json.load(f))
+
+    jobs.sort(key=lambda x: x["created_at"], reverse=True)
+    return jobs
+
+
+def append_job_events(conversation_id: str, job_id: str, entries: List[Dict[str, Any]]):
+    """
+    Append events to a job's on-disk event log (one JSON line per event).
+
+    Args:
+        conversation_id: Conversation the job belongs to
+        job_id: Job identifier
+        entries: List of {'id', 'event'} dicts, in id order
+    """
+    job_dir = get_job_dir(conversation_id)
+    Path(job_dir).mkdir(parents=True, exist_ok=True)
+
+    path = os.path.join(job_dir, f"{job_id}.events.ndjson")
+    with open(path, 'a') as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+
+
+def read_job_events(conversation_id: str, job_id: str, after: int = 0) -> List[Dict[str, Any]]:
+    """
+    Read a job's spilled events with an id greater than `after`.
+
+    Args:
+        conversation_id: Conversation the job belongs to
+        job_id: Job identifier
+        after: Last event id the reader already has
+
+    Returns:
+        List of {'id', 'event'} dicts, in id order
+    """
+    path = os.path.join(get_job_dir(conversation_id), f"{job_id}.events.ndjson")
+    if not os.path.exists(path):
+        return []
+
+    entries = []
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # the tail of a write torn by a crash
+            if entry["id"] > after:
+                entries.append(entry)
+    return entries
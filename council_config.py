@@ -16,30 +16,36 @@ OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 OPENROUTER_API_URL  = f"{OPENROUTER_BASE_URL}/chat/completions"
 
 # ── COUNCIL MEMBERS (LOCKED) ─────────────────────────────────
+# Optional "backup_slug": a stand-in model that gets a hedged duplicate
+# request when the primary is slow; the first answer wins. None = no hedge.
 COUNCIL_MODELS = [
     {
         "slug":              "anthropic/claude-sonnet-4.6",
         "alias":             "B.A. — Strategist",
         "max_tokens_phase1": 600,
         "max_tokens_phase2": 300,
+        "backup_slug":       None,
     },
     {
         "slug":              "openai/gpt-5.2",
         "alias":             "Face — Analyst",
         "max_tokens_phase1": 600,
         "max_tokens_phase2": 300,
+        "backup_slug":       None,
     },
     {
         "slug":              "x-ai/grok-4.1-fast",
         "alias":             "Murdock — Intel",
         "max_tokens_phase1": 600,
         "max_tokens_phase2": 300,
+        "backup_slug":       None,
     },
     {
         "slug":              "moonshotai/kimi-k2-thinking",
         "alias":             "H.M. — Specialist",
         "max_tokens_phase1": 600,
         "max_tokens_phase2": 300,
+        "backup_slug":       None,
     },
 ]
 
@@ -105,6 +105,16 @@ function App() {
             return { ...prev, messages: msgs };
           });
           break;
+        case 'similar_answer':
+          setCurrentConversation((prev) => {
+            if (!prev?.messages?.length) return prev;
+            const msgs = [...prev.messages];
+            const last = msgs[msgs.length - 1];
+            if (!last) return prev;
+            msgs[msgs.length - 1] = { ...last, metadata: { ...(last.metadata || {}), answer_cache: event.data } };
+            return { ...prev, messages: msgs };
+          });
+          break;
         case 'stage1_complete':
           setCurrentConversation((prev) => {
             if (!prev?.messages?.length) return prev;
@@ -155,6 +165,21 @@ function App() {
             return { ...prev, messages: msgs };
           });
           break;
+        case 'token':
+          // Append the delta to the live draft for this stage/model
+          setCurrentConversation((prev) => {
+            if (!prev?.messages?.length) return prev;
+            const msgs = [...prev.messages];
+            const last = msgs[msgs.length - 1];
+            if (!last?.loading) return prev;
+            const drafts = { ...(last.drafts || {}) };
+            const stageDrafts = { ...(drafts[event.stage] || {}) };
+            stageDrafts[event.model] = (stageDrafts[event.model] || '') + event.delta;
+            drafts[event.stage] = stageDrafts;
+            msgs[msgs.length - 1] = { ...last, drafts };
+            return { ...prev, messages: msgs };
+          });
+          break;
         case 'title_complete':
           loadConversations();
           break;
@@ -162,8 +187,36 @@ function App() {
           loadConversations();
           setIsLoading(false);
           break;
+        case 'cancelled':
+          setCurrentConversation((prev) => {
+            if (!prev?.messages?.length) return prev;
+            const msgs = [...prev.messages];
+            const last = msgs[msgs.length - 1];
+            if (!last) return prev;
+            msgs[msgs.length - 1] = {
+              ...last,
+              metadata: { ...(last.metadata || {}), cancelled: { reason: event.reason, stage: event.stage } },
+              loading: { stage1: false, stage2: false, stage3: false },
+            };
+            return { ...prev, messages: msgs };
+          });
+          loadConversations();
+          setIsLoading(false);
+          break;
         case 'error':
           console.error('Stream error:', event.message);
+          setCurrentConversation((prev) => {
+            if (!prev?.messages?.length) return prev;
+            const msgs = [...prev.messages];
+            const last = msgs[msgs.length - 1];
+            if (!last?.loading) return prev;
+            msgs[msgs.length - 1] = {
+              ...last,
+              metadata: { ...(last.metadata || {}), failed: { error: event.message } },
+              loading: { stage1: false, stage2: false, stage3: false },
+            };
+            return { ...prev, messages: msgs };
+          });
           setIsLoading(false);
           break;
         default:
@@ -172,6 +225,15 @@ function App() {
     });
   };
 
+  const handleCancel = async () => {
+    if (!currentConversationId) return;
+    try {
+      await api.cancelRun(currentConversationId);
+    } catch (error) {
+      console.error('Failed to cancel run:', error);
+    }
+  };
+
   const handleSendMessage = async (content) => {
     if (!currentConversationId || isLoading) return;
     setIsLoading(true);
@@ -236,6 +298,7 @@ function App() {
         <ChatInterface
           conversation={currentConversation}
           onSendMessage={handleSendMessage}
+          onCancel={handleCancel}
           isLoading={isLoading}
           starterQuestions={starterQuestions}
           onStarterQuestion={handleStarterQuestion}
@@ -111,6 +111,19 @@ export const api = {
     return response.json();
   },
 
+  /**
+   * Cancel the council run in progress for a conversation.
+   */
+  async cancelRun(conversationId) {
+    const response = await fetch(
+      `${API_BASE}/api/conversations/${conversationId}/run`,
+      { method: 'DELETE' }
+    );
+    if (!response.ok && response.status !== 404) {
+      throw new Error('Failed to cancel run');
+    }
+  },
+
   /**
    * Send a message and receive streaming updates.
    * @param {string} conversationId - The conversation ID
@@ -134,21 +147,55 @@ export const api = {
       throw new Error('Failed to send message');
     }
 
+    // The turn runs as a server-side job: if the connection drops, reattach
+    // and resume after the last event id we saw.
+    const state = { jobId: null, lastEventId: 0, finished: false };
+    try {
+      await this._readEvents(response, state, onEvent);
+    } catch (e) {
+      if (!state.jobId) throw e;
+    }
+    for (let attempt = 0; !state.finished && state.jobId && attempt < 5; attempt++) {
+      await new Promise((resolve) => setTimeout(resolve, 1000 * (attempt + 1)));
+      try {
+        const resumed = await fetch(
+          `${API_BASE}/api/conversations/${conversationId}/jobs/${state.jobId}/events`,
+          { headers: { 'Last-Event-ID': String(state.lastEventId) } }
+        );
+        if (resumed.ok) await this._readEvents(resumed, state, onEvent);
+      } catch (e) {
+        console.error('Stream dropped, reattaching:', e);
+      }
+    }
+  },
+
+  /**
+   * Read an SSE response, tracking the job id and last event id in state.
+   */
+  async _readEvents(response, state, onEvent) {
     const reader = response.body.getReader();
     const decoder = new TextDecoder();
+    // Token events are small and frequent, so a read can end mid-line:
+    // keep the trailing partial line until the next chunk arrives.
+    let buffer = '';
 
     while (true) {
       const { done, value } = await reader.read();
       if (done) break;
 
-      const chunk = decoder.decode(value);
-      const lines = chunk.split('\n');
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split('\n');
+      buffer = lines.pop();
 
       for (const line of lines) {
-        if (line.startsWith('data: ')) {
+        if (line.startsWith('id: ')) {
+          state.lastEventId = Number(line.slice(4));
+        } else if (line.startsWith('data: ')) {
           const data = line.slice(6);
           try {
             const event = JSON.parse(data);
+            if (event.type === 'job') state.jobId = event.job_id;
+            if (['complete', 'error', 'cancelled'].includes(event.type)) state.finished = true;
             onEvent(event.type, event);
           } catch (e) {
             console.error('Failed to parse SSE event:', e);
@@ -6,9 +6,14 @@ import Stage3 from './Stage3';
 import StarterQuestions from './StarterQuestions';
 import './ChatInterface.css';
 
+// Turn streamed {model: text} drafts into the shape Stage1/Stage3 render
+const draftResponses = (drafts) =>
+  Object.entries(drafts).map(([model, response]) => ({ model, response }));
+
 export default function ChatInterface({
   conversation,
   onSendMessage,
+  onCancel,
   isLoading,
   starterQuestions,
   onStarterQuestion,
@@ -87,6 +92,24 @@ export default function ChatInterface({
                 <div className="assistant-message">
                   <div className="message-label">LLM Council</div>
 
+                  {/* Answer cache */}
+                  {msg.metadata?.answer_cache && !msg.metadata.answer_cache.reused && (
+                    <details className="similar-answer">
+                      <summary>
+                        A similar question was answered before
+                        (similarity {msg.metadata.answer_cache.similarity}): “{msg.metadata.answer_cache.matched_query}”
+                      </summary>
+                      <div className="markdown-content">
+                        <ReactMarkdown>{msg.metadata.answer_cache.stage3?.response || ''}</ReactMarkdown>
+                      </div>
+                    </details>
+                  )}
+                  {msg.metadata?.answer_cache?.reused && (
+                    <div className="stage-skipped">
+                      Reused the council's verdict on an earlier, identical question.
+                    </div>
+                  )}
+
                   {/* Stage 1 */}
                   {msg.loading?.stage1 && (
                     <div className="stage-loading">
@@ -95,6 +118,9 @@ export default function ChatInterface({
                     </div>
                   )}
                   {msg.stage1 && <Stage1 responses={msg.stage1} />}
+                  {!msg.stage1 && msg.drafts?.stage1 && (
+                    <Stage1 responses={draftResponses(msg.drafts.stage1)} />
+                  )}
 
                   {/* Stage 2 */}
                   {msg.loading?.stage2 && (
@@ -103,6 +129,12 @@ export default function ChatInterface({
                       <span>Running Stage 2: Peer rankings...</span>
                     </div>
                   )}
+                  {msg.metadata?.skipped_stages?.stage2 && (
+                    <div className="stage-skipped">
+                      Stage 2 skipped: the individual responses agree
+                      (similarity {msg.metadata.skipped_stages.stage2.agreement}).
+                    </div>
+                  )}
                   {msg.stage2 && (
                     <Stage2
                       rankings={msg.stage2}
@@ -118,7 +150,20 @@ export default function ChatInterface({
                       <span>Running Stage 3: Final synthesis...</span>
                     </div>
                   )}
+                  {msg.metadata?.cancelled && (
+                    <div className="stage-skipped">
+                      Run cancelled during {msg.metadata.cancelled.stage}; the results below are partial.
+                    </div>
+                  )}
+                  {msg.metadata?.failed && (
+                    <div className="stage-skipped">
+                      Run failed{msg.metadata.failed.stage ? ` during ${msg.metadata.failed.stage}` : ''}: {msg.metadata.failed.error}
+                    </div>
+                  )}
                   {msg.stage3 && <Stage3 finalResponse={msg.stage3} />}
+                  {!msg.stage3 && msg.drafts?.stage3 && (
+                    <Stage3 finalResponse={draftResponses(msg.drafts.stage3)[0]} />
+                  )}
                 </div>
               )}
             </div>
@@ -129,6 +174,11 @@ export default function ChatInterface({
           <div className="loading-indicator">
             <div className="spinner"></div>
             <span>Consulting the council...</span>
+            {onCancel && (
+              <button type="button" className="cancel-button" onClick={onCancel}>
+                Stop
+              </button>
+            )}
           </div>
         )}
 
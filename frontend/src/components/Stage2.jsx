@@ -47,6 +47,14 @@ export default function Stage2({ rankings, labelToModel, aggregateRankings }) {
         <div className="ranking-model">
           {rankings[activeTab].model}
         </div>
+        {rankings[activeTab].reviewed && (
+          <p className="stage-description">
+            Reviewed a shard of {rankings[activeTab].reviewed.length} responses:{' '}
+            {rankings[activeTab].reviewed
+              .map((label) => (labelToModel && labelToModel[label]) || label)
+              .join(', ')}
+          </p>
+        )}
         <div className="ranking-content markdown-content">
           <ReactMarkdown>
             {deAnonymizeText(rankings[activeTab].ranking, labelToModel)}
@@ -0,0 +1,36 @@
+"""Consensus short-circuit: paraphrases collapse, contradictions do not."""
+
+import unittest
+
+from backend.council import check_consensus
+from backend.similarity import disagreement, jaccard
+
+
+def _stage1(*answers):
+    return [{"model": f"m{i}", "response": answer} for i, answer in enumerate(answers)]
+
+
+class ConsensusTest(unittest.TestCase):
+    def test_contradicting_pair_does_not_collapse(self):
+        yes = "Yes, X is safe to use in production."
+        no = "No, X is not safe to use in production."
+        self.assertGreater(jaccard(yes, no), 0.55)
+        self.assertEqual(disagreement(yes, no), "negation")
+        self.assertIsNone(check_consensus(_stage1(yes, no), "skip_review"))
+
+    def test_numeric_mismatch_does_not_collapse(self):
+        a = "The answer is 42, as the guide says."
+        b = "The answer is 24, as the guide says."
+        self.assertEqual(disagreement(a, b), "numbers")
+        self.assertIsNone(check_consensus(_stage1(a, b), "representative"))
+
+    def test_paraphrases_collapse(self):
+        a = "The capital of Australia is Canberra, not Sydney; Canberra was chosen as a compromise between Sydney and Melbourne."
+        b = "Canberra is the capital of Australia (not Sydney). It was picked as a compromise between Sydney and Melbourne."
+        consensus = check_consensus(_stage1(a, b), "skip_review")
+        self.assertIsNotNone(consensus)
+        self.assertEqual(consensus["mode"], "skip_review")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""Job event log: replay plus live events while spill writes are slow."""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from backend import jobs, storage
+
+
+class JobFollowTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.data_dir.cleanup)
+        append = storage.append_job_events
+
+        def slow_append(*args):
+            time.sleep(0.05)
+            append(*args)
+
+        for patch in (
+            mock.patch.object(storage, "DATA_DIR", self.data_dir.name),
+            mock.patch.object(storage, "append_job_events", slow_append),
+            mock.patch.object(jobs, "JOB_MEMORY_EVENTS", 4),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    async def test_follow_yields_strictly_increasing_ids(self):
+        job = jobs.Job("job", "conversation", "q")
+        job.task = asyncio.get_running_loop().create_future()
+        for n in range(10):
+            job.publish({"type": "token", "n": n})
+
+        async def collect(after):
+            return [entry[0] async for entry in job.follow(after)]
+
+        followers = [asyncio.ensure_future(collect(after)) for after in (0, 3)]
+        # Publish (and spill) while the followers wait on the slow writes
+        for n in range(10, 30):
+            await asyncio.sleep(0.01)
+            job.publish({"type": "token", "n": n})
+        job.task.set_result(None)
+        job._finish(job.task)
+
+        for after, ids in zip((0, 3), await asyncio.gather(*followers)):
+            self.assertEqual(ids, list(range(after + 1, 31)))
+        await job._drain()
+
+
+class ReadJobEventsTest(unittest.TestCase):
+    def test_torn_tail_line_is_skipped(self):
+        with tempfile.TemporaryDirectory() as data_dir, mock.patch.object(storage, "DATA_DIR", data_dir):
+            storage.append_job_events("conversation", "job", [{"id": 1, "event": {}}, {"id": 2, "event": {}}])
+            path = os.path.join(storage.get_job_dir("conversation"), "job.events.ndjson")
+            with open(path, "a") as f:
+                f.write(json.dumps({"id": 3, "event": {}})[:8])
+            self.assertEqual([entry["id"] for entry in storage.read_job_events("conversation", "job")], [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()